@@ -0,0 +1,341 @@
+"""
+API Format Validator Module for ComfyUI Workflows
+Version 2.0 - Validates API-format (prompt) workflows directly and converts them to UI format
+
+API format is the compact form submitted to ComfyUI's /prompt endpoint:
+    {"3": {"class_type": "KSampler", "inputs": {"model": ["4", 0], "seed": 42}}, ...}
+Inputs that are [node_id, slot] pairs are links; everything else is a widget value.
+"""
+
+import copy
+from typing import Dict, List, Any, Tuple, Optional
+
+from json_validator import (ValidationRule, IssueArgs, strongly_connected_components, is_output_node,
+                            _replace_graph)
+
+PromptT = Dict[str, Dict[str, Any]]
+WorkflowT = Dict[str, Any]
+SCS = Dict[str, Any]
+
+
+def _reported_inline(validator: Any, target: Any, index: int):
+    # API rules are evaluated inside APIFormatValidator.validate's single pass
+    return None
+
+
+# Message templates (rendered lazily, like JSONValidator rules)
+API_RULES: Dict[str, ValidationRule] = {rule.name: rule for rule in (
+    ValidationRule('api_node_structure', 'api_node', 'error', 'node_{0}',
+                   "Node {0} is not an object with 'class_type' and 'inputs' - cannot auto-fix",
+                   _reported_inline),
+    ValidationRule('api_link_node_id', 'api_node', 'error', 'node_{0}_input_{1}',
+                   "Node {0} input '{1}' references node {2} by number - changed to string", _reported_inline,
+                   fix_applied=True),
+    ValidationRule('api_missing_source', 'api_node', 'error', 'node_{0}_input_{1}',
+                   "Node {0} input '{1}' references missing node {2} - cannot auto-fix", _reported_inline),
+    ValidationRule('api_bad_slot', 'api_node', 'error', 'node_{0}_input_{1}',
+                   "Node {0} input '{1}' has invalid output slot {2} - cannot auto-fix", _reported_inline),
+    ValidationRule('api_cycles', 'workflow', 'error', 'node_{0}',
+                   "Nodes {1} form a cycle - cannot auto-fix", _reported_inline),
+    ValidationRule('api_missing_output_node', 'workflow', 'error', 'workflow',
+                   "Prompt has no output node - nothing would execute", _reported_inline),
+    ValidationRule('api_orphan_outputs', 'workflow', 'warning', 'node_{0}',
+                   "Node {0} ({1}) output does not reach any output node", _reported_inline),
+)}
+
+
+def is_link_ref(value: Any) -> bool:
+    """An API-format input is a link when it is a [node_id, slot] pair"""
+    return (isinstance(value, list) and len(value) == 2
+            and isinstance(value[0], (str, int)) and not isinstance(value[0], bool))
+
+
+def is_api_format(workflow: Any) -> bool:
+    """
+    Detect an API-format prompt (as opposed to UI format with nodes/links).
+
+    One node with a class_type is enough, so a prompt with malformed entries is
+    still validated as a prompt (and the entries reported) instead of passing
+    as an empty UI workflow.
+    """
+    if not isinstance(workflow, dict) or not workflow or 'nodes' in workflow or 'links' in workflow:
+        return False
+    return any(isinstance(node, dict) and 'class_type' in node for node in workflow.values())
+
+
+class APIFormatValidator:
+    """Validates and auto-fixes API-format (prompt) workflows without converting them"""
+
+    def __init__(self, disabled_rules: Optional[List[str]] = None):
+        self.disabled_rules = set(disabled_rules or ())
+        self.errors: List[Dict[str, Any]] = []
+        self.warnings: List[Dict[str, Any]] = []
+        self.auto_fixes: List[Dict[str, Any]] = []
+        self.validation_summary: Dict[str, Any] = {}
+        self._issues: List[Tuple[ValidationRule, IssueArgs]] = []
+
+    def _record(self, name: str, args: IssueArgs) -> None:
+        if name not in self.disabled_rules:
+            self._issues.append((API_RULES[name], args))
+
+    def validate(self, prompt: PromptT, include_messages: bool = True) -> Dict[str, Any]:
+        """
+        Validate (and fix in place) an API-format prompt.
+
+        Args:
+            prompt: API-format prompt keyed by node id
+            include_messages: Render issue messages; when False only counts are reported
+
+        Returns:
+            Validation results in the same shape as JSONValidator.validate_and_fix
+        """
+        self._issues = []
+        self.errors = []
+        self.warnings = []
+        self.auto_fixes = []
+
+        # 1. Node structure and input references (single pass over all inputs)
+        successors: Dict[str, List[str]] = {}
+        predecessors: Dict[str, List[str]] = {}
+        total_links = 0
+        valid_links = 0
+        nodes_fixed = 0
+        for node_id, node in prompt.items():
+            if not isinstance(node, dict) or not isinstance(node.get('class_type'), str) \
+                    or not isinstance(node.get('inputs', {}), dict):
+                self._record('api_node_structure', (node_id,))
+                continue
+
+            fixed = False
+            for name, value in node.get('inputs', {}).items():
+                if not is_link_ref(value):
+                    continue
+                total_links += 1
+                source_id, slot = value
+                if isinstance(source_id, int):
+                    # ComfyUI looks inputs up by string key
+                    source_id = value[0] = str(source_id)
+                    self._record('api_link_node_id', (node_id, name, source_id))
+                    fixed = True
+                if source_id not in prompt:
+                    self._record('api_missing_source', (node_id, name, source_id))
+                    continue
+                if not isinstance(slot, int) or isinstance(slot, bool) or slot < 0:
+                    self._record('api_bad_slot', (node_id, name, slot))
+                    continue
+                valid_links += 1
+                successors.setdefault(source_id, []).append(node_id)
+                predecessors.setdefault(node_id, []).append(source_id)
+            if fixed:
+                nodes_fixed += 1
+
+        # 2. Cycles
+        for component in strongly_connected_components(prompt, successors):
+            if len(component) > 1 or component[0] in successors.get(component[0], ()):
+                self._record('api_cycles', (component[-1], component[::-1]))
+
+        # 3. Output reachability
+        sinks = [node_id for node_id, node in prompt.items()
+                 if isinstance(node, dict) and is_output_node(str(node.get('class_type', '')))]
+        if not sinks:
+            if prompt:
+                self._record('api_missing_output_node', ())
+        else:
+            reached = set(sinks)
+            frontier = list(sinks)
+            while frontier:
+                for source_id in predecessors.get(frontier.pop(), ()):
+                    if source_id not in reached:
+                        reached.add(source_id)
+                        frontier.append(source_id)
+            for node_id, node in prompt.items():
+                if node_id not in reached and isinstance(node, dict):
+                    self._record('api_orphan_outputs', (node_id, node.get('class_type', '')))
+
+        errors_count = warnings_count = fixes_count = 0
+        for rule, args in self._issues:
+            if rule.severity == 'error':
+                errors_count += 1
+            elif rule.severity == 'warning':
+                warnings_count += 1
+            if rule.fix_applied:
+                fixes_count += 1
+            if include_messages:
+                entry = rule.render(args)
+                if rule.severity == 'error':
+                    self.errors.append(entry)
+                else:
+                    self.warnings.append(entry)
+                if rule.fix_applied:
+                    self.auto_fixes.append(entry)
+
+        is_valid = errors_count == 0
+        self.validation_summary = {
+            'format': 'api',
+            'total_nodes': len(prompt),
+            'total_links': total_links,
+            'total_groups': 0,
+            'errors_count': errors_count,
+            'warnings_count': warnings_count,
+            'auto_fixes_count': fixes_count,
+            'nodes_fixed': nodes_fixed,
+            'groups_fixed': 0,
+            'valid_links': valid_links,
+            'is_valid': is_valid
+        }
+
+        return {
+            'success': True,
+            'validation_summary': self.validation_summary,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'auto_fixes': self.auto_fixes,
+            'is_valid': is_valid,
+            'fixed_workflow': prompt
+        }
+
+
+def api_to_ui(prompt: PromptT, column_width: int = 400, row_height: int = 200) -> WorkflowT:
+    """
+    Convert an API-format prompt to a UI-format workflow.
+
+    API format carries no layout or socket type information, so nodes are placed
+    in columns by dependency depth and link / output types are set to '*'.
+    Widget values keep the order of the prompt's inputs. Entries that are not
+    node objects are skipped.
+    """
+    prompt = {node_id: node for node_id, node in prompt.items() if isinstance(node, dict)}
+
+    def ui_id(node_id: str) -> Any:
+        return int(node_id) if str(node_id).isdigit() else node_id
+
+    nodes: Dict[str, Dict[str, Any]] = {}
+    links: List[List[Any]] = []
+    depth: Dict[str, int] = {}
+
+    for node_id, node in prompt.items():
+        ui_node = {
+            'id': ui_id(node_id),
+            'type': node.get('class_type', ''),
+            'pos': [0, 0],
+            'size': [315, 100],
+            'flags': {},
+            'order': 0,
+            'mode': 0,
+            'inputs': [],
+            'outputs': [],
+            'properties': {'Node name for S&R': node.get('class_type', '')},
+            'widgets_values': []
+        }
+        title = node.get('_meta', {}).get('title')
+        if title and title != ui_node['type']:
+            ui_node['title'] = title
+        nodes[node_id] = ui_node
+
+    for node_id, node in prompt.items():
+        ui_node = nodes[node_id]
+        for name, value in node.get('inputs', {}).items():
+            if not (is_link_ref(value) and str(value[0]) in nodes and isinstance(value[1], int)):
+                ui_node['widgets_values'].append(copy.deepcopy(value))
+                continue
+            source = nodes[str(value[0])]
+            slot = value[1]
+            link_id = len(links) + 1
+            links.append([link_id, source['id'], slot, ui_node['id'], len(ui_node['inputs']), '*'])
+            ui_node['inputs'].append({'name': name, 'type': '*', 'link': link_id})
+            while len(source['outputs']) <= slot:
+                index = len(source['outputs'])
+                source['outputs'].append({'name': f'output_{index}', 'type': '*', 'links': [],
+                                          'slot_index': index})
+            source['outputs'][slot]['links'].append(link_id)
+
+    # Column = longest path from a source (cycles are cut at the first revisit)
+    def node_depth(start: str) -> int:
+        stack = [(start, False)]
+        visiting = set()
+        while stack:
+            node_id, expanded = stack.pop()
+            if node_id in depth:
+                continue
+            sources = [str(v[0]) for v in prompt[node_id].get('inputs', {}).values()
+                       if is_link_ref(v) and str(v[0]) in prompt]
+            if expanded:
+                visiting.discard(node_id)
+                depth[node_id] = 1 + max((depth.get(s, 0) for s in sources), default=-1)
+                continue
+            visiting.add(node_id)
+            stack.append((node_id, True))
+            stack.extend((s, False) for s in sources if s not in depth and s not in visiting)
+        return depth[start]
+
+    rows: Dict[int, int] = {}
+    for order, node_id in enumerate(prompt):
+        column = node_depth(node_id)
+        row = rows.get(column, 0)
+        rows[column] = row + 1
+        nodes[node_id]['pos'] = [column * column_width, row * row_height]
+        nodes[node_id]['order'] = order
+
+    ui_ids = [ui_node['id'] for ui_node in nodes.values()]
+    numeric_ids = [i for i in ui_ids if isinstance(i, int)]
+    return {
+        'last_node_id': max(numeric_ids, default=0),
+        'last_link_id': len(links),
+        'nodes': list(nodes.values()),
+        'links': links,
+        'groups': [],
+        'config': {},
+        'extra': {},
+        'version': 0.4
+    }
+
+
+def main(scs_data: SCS) -> Dict[str, Any]:
+    """
+    Entry point for MCP code execution.
+    Validates the API-format prompt in workflow_state.api_prompt (or current_graph).
+    """
+    try:
+        workflow_state = scs_data.get('workflow_state', {})
+        key = 'api_prompt' if workflow_state.get('api_prompt') else 'current_graph'
+        prompt = workflow_state.get(key, {})
+        if not is_api_format(prompt):
+            raise ValueError('No API-format prompt found in SCS data')
+
+        # Fixes go into a copy; the caller's SCS is left untouched
+        prompt = copy.deepcopy(prompt)
+        validator = APIFormatValidator()
+        result = validator.validate(prompt)
+        validation_summary = result['validation_summary']
+
+        return {
+            'success': True,
+            'is_valid': result['is_valid'],
+            'validation_summary': validation_summary,
+            'errors': result['errors'],
+            'warnings': result['warnings'],
+            'auto_fixes': result['auto_fixes'],
+            'total_issues_fixed': validation_summary.get('auto_fixes_count', 0),
+            'scs_data': _replace_graph(scs_data, prompt, key)
+        }
+
+    except Exception as e:
+        # On failure, return consistent shape
+        return {
+            'success': False,
+            'error': str(e),
+            'is_valid': False,
+            'validation_summary': {
+                'total_nodes': 0,
+                'total_links': 0,
+                'total_groups': 0,
+                'errors_count': 0,
+                'warnings_count': 0,
+                'auto_fixes_count': 0
+            },
+            'errors': [],
+            'warnings': [],
+            'auto_fixes': [],
+            'total_issues_fixed': 0,
+            'scs_data': scs_data
+        }
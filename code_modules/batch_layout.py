@@ -0,0 +1,223 @@
+"""
+Batch Layout Module for ComfyUI Workflow Layout
+Version 2.0 - Re-lays out whole workflow directories in parallel worker processes
+
+Inputs are files, directories (searched recursively for *.json) or glob
+patterns. Each file is laid out with a layout_engine strategy in a process
+pool. A file is skipped when the manifest from an earlier run records the same
+input hash, strategy and layout-rules fingerprint, and its output still exists.
+Outputs mirror the input tree relative to --root (default: the current
+directory), so output paths and manifest keys do not depend on which inputs a
+run is given.
+The manifest (manifest.json in the output directory) keeps per-file timings
+and the totals of the latest run.
+"""
+
+import argparse
+import glob
+import hashlib
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Any, Optional, Sequence
+
+from layout_engine import LayoutEngine, STRATEGIES
+from workflow_serializer import dump, load, loads, source_fingerprint
+
+MANIFEST_NAME = 'manifest.json'
+
+# Modules whose code decides the layout; editing any of them (e.g. spacing rules)
+# changes the fingerprint and invalidates earlier outputs
+LAYOUT_MODULES = ('layout_engine', 'graph_analysis', 'workflow_reorganizer', 'zigzag_workflow_reorganizer',
+                  'layered_layout', 'node_patterns', 'spatial_index', 'workflow_graph', 'workflow_serializer')
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 hex digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def layout_fingerprint(modules: Sequence[str] = LAYOUT_MODULES) -> str:
+    """Hash of the layout module sources (or of the given modules')"""
+    return source_fingerprint(modules)
+
+
+def expand_inputs(patterns: Sequence[str], output_dir: Optional[str] = None) -> List[str]:
+    """Files matched by paths, directories and glob patterns (sorted, de-duplicated)"""
+    skip = os.path.abspath(output_dir) if output_dir else None
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = glob.glob(os.path.join(pattern, '**', '*.json'), recursive=True)
+        else:
+            matches = glob.glob(pattern, recursive=True)
+        for path in matches:
+            path = os.path.abspath(path)
+            if not os.path.isfile(path) or os.path.basename(path) == MANIFEST_NAME:
+                continue
+            # Never feed earlier outputs back in
+            if skip and os.path.commonpath([path, skip]) == skip:
+                continue
+            found.add(path)
+    return sorted(found)
+
+
+def output_path_for(input_path: str, root: str, output_dir: str, strategy: str) -> str:
+    """Mirror input_path (relative to root) under output_dir, tagged with the strategy"""
+    relative = os.path.relpath(input_path, root)
+    stem, ext = os.path.splitext(relative)
+    return os.path.join(output_dir, f"{stem}.{strategy}{ext or '.json'}")
+
+
+def layout_file(input_path: str, output_path: str, strategy: str) -> Dict[str, Any]:
+    """Lay out one file (runs in a worker process); returns timings or an error"""
+    result = {'input': input_path, 'output': output_path}
+    try:
+        start = time.perf_counter()
+        workflow = load(input_path)
+        loaded = time.perf_counter()
+        laid_out = LayoutEngine(workflow).layout(strategy)
+        done = time.perf_counter()
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        result['bytes'] = dump(laid_out, output_path)
+        written = time.perf_counter()
+        result.update({
+            'success': True,
+            'nodes': len(laid_out.get('nodes', [])),
+            'load_ms': round((loaded - start) * 1000, 3),
+            'layout_ms': round((done - loaded) * 1000, 3),
+            'write_ms': round((written - done) * 1000, 3),
+            'total_ms': round((written - start) * 1000, 3)
+        })
+    except Exception as e:
+        result.update({'success': False, 'error': f"{type(e).__name__}: {e}"})
+    return result
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """Previous manifest, or an empty one if missing or unreadable"""
+    try:
+        with open(path, 'rb') as f:
+            manifest = loads(f.read())
+        if isinstance(manifest.get('files'), dict):
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {'files': {}}
+
+
+def run_batch(patterns: Sequence[str], output_dir: str, strategy: str = 'engineering',
+              workers: Optional[int] = None, force: bool = False,
+              root: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Lay out every matched workflow into output_dir and write the manifest.
+
+    Args:
+        patterns: Files, directories or glob patterns
+        output_dir: Destination root; outputs mirror the input tree
+        strategy: layout_engine strategy name
+        workers: Worker processes (default: CPU count; 1 runs in this process)
+        force: Re-lay out files even if the manifest says they are up to date
+        root: Directory the input tree is mirrored from (default: the current directory);
+            every input must be inside it
+
+    Returns:
+        The manifest dict
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown layout strategy: {strategy}")
+    inputs = expand_inputs(patterns, output_dir)
+    root = os.path.abspath(root or os.getcwd())
+    outside = [p for p in inputs if os.path.commonpath([p, root]) != root]
+    if outside:
+        raise ValueError(f"{outside[0]} is not inside the root directory {root}; pass a wider --root")
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = load_manifest(manifest_path)['files']
+    fingerprint = layout_fingerprint()
+
+    start = time.perf_counter()
+    entries: Dict[str, Dict[str, Any]] = {}
+    jobs = []
+    skipped = 0
+    for input_path in inputs:
+        output_path = output_path_for(input_path, root, output_dir, strategy)
+        key = os.path.relpath(output_path, output_dir)
+        input_hash = file_hash(input_path)
+        old = previous.get(key)
+        if (not force and old and old.get('success') and old.get('input_hash') == input_hash
+                and old.get('strategy') == strategy and old.get('fingerprint') == fingerprint
+                and os.path.exists(output_path)):
+            entries[key] = dict(old, skipped=True)
+            skipped += 1
+            continue
+        entries[key] = {'input_hash': input_hash, 'strategy': strategy, 'fingerprint': fingerprint}
+        jobs.append((key, input_path, output_path))
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs) or 1))
+    if workers == 1:
+        for key, input_path, output_path in jobs:
+            entries[key].update(layout_file(input_path, output_path, strategy), skipped=False)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(layout_file, input_path, output_path, strategy): key
+                       for key, input_path, output_path in jobs}
+            for future in as_completed(futures):
+                entries[futures[future]].update(future.result(), skipped=False)
+
+    # Entries from earlier runs over other files or strategies are kept
+    files = {key: entry for key, entry in previous.items() if key not in entries}
+    files.update(entries)
+    laid_out = [entry for entry in entries.values() if not entry.get('skipped')]
+    failed = sum(1 for entry in laid_out if not entry.get('success'))
+    manifest = {
+        'strategy': strategy,
+        'fingerprint': fingerprint,
+        'workers': workers,
+        'generated': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'totals': {
+            'files': len(entries),
+            'laid_out': len(laid_out) - failed,
+            'skipped': skipped,
+            'failed': failed,
+            'layout_ms': round(sum(entry.get('layout_ms', 0) for entry in laid_out), 3),
+            'wall_ms': round((time.perf_counter() - start) * 1000, 3)
+        },
+        'files': dict(sorted(files.items()))
+    }
+    os.makedirs(output_dir, exist_ok=True)
+    dump(manifest, manifest_path, compact=False, precision=None)
+    return manifest
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Re-lay out many ComfyUI workflows in parallel')
+    parser.add_argument('inputs', nargs='+', help='Workflow files, directories or glob patterns')
+    parser.add_argument('-o', '--output-dir', required=True, help='Output directory (manifest.json goes here)')
+    parser.add_argument('-s', '--strategy', default='engineering',
+                        help=f"Layout strategy ({', '.join(STRATEGIES)})")
+    parser.add_argument('-j', '--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and redo every file')
+    parser.add_argument('--root', help='Directory whose tree the outputs mirror (default: current directory)')
+    args = parser.parse_args(argv)
+
+    try:
+        manifest = run_batch(args.inputs, args.output_dir, args.strategy, args.workers, args.force, args.root)
+    except ValueError as e:
+        parser.error(str(e))
+    totals = manifest['totals']
+    print(f"{totals['files']} files: {totals['laid_out']} laid out, {totals['skipped']} skipped, "
+          f"{totals['failed']} failed in {totals['wall_ms']:.0f} ms")
+    for key, entry in manifest['files'].items():
+        if entry.get('skipped') is False and not entry.get('success'):
+            print(f"  [ERROR] {key}: {entry.get('error')}")
+    return 1 if totals['failed'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
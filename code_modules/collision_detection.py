@@ -3,9 +3,11 @@ AABB Collision Detection Module for ComfyUI Workflow Layout
 Version 2.0 - Implements proper Axis-Aligned Bounding Box collision detection
 """
 
-from typing import Dict, List, Tuple, Any, Union
+from typing import Dict, List, Tuple, Any
 import math
 
+from workflow_graph import WorkflowGraph
+
 NodeT = Dict[str, Any]
 GroupT = Dict[str, Any]
 SCS = Dict[str, Any]
@@ -27,6 +29,7 @@ class AABBCollisionDetector:
         self.grid_size = grid_size
         self.max_iterations = max_iterations
         self._refinements: List[Dict[str, Any]] = []
+        self._graph: WorkflowGraph = None
 
     # ---------- Bounds helpers ----------
 
@@ -81,13 +84,13 @@ class AABBCollisionDetector:
 
     def _entity_bounds(self, ent: Dict[str, Any]) -> Tuple[float, float, float, float]:
         if ent["type"] == "node":
-            return self.get_node_bounds(ent["data"])
+            # Parsed once into the graph's geometry arrays
+            return self._graph.bounds(ent["index"])
         return self.get_group_bounds(ent["data"])
 
     def _move_entity(self, ent: Dict[str, Any], dx: float, dy: float):
         if ent["type"] == "node":
-            ent["data"]["pos"][0] += dx
-            ent["data"]["pos"][1] += dy
+            self._graph.move(ent["index"], dx, dy)
         else:
             # group
             ent["data"]["bounding"][0] += dx
@@ -120,12 +123,12 @@ class AABBCollisionDetector:
         before_pos = None
         after_pos = None
         if b["type"] == "node":
-            before_pos = list(b["data"]["pos"])
+            before_pos = self._graph.pos(b["index"])
 
         self._move_entity(b, dx, dy)
 
         if b["type"] == "node":
-            after_pos = list(b["data"]["pos"])
+            after_pos = self._graph.pos(b["index"])
             self._refinements.append({
                 "node_id": str(b["id"]),
                 "original_position": [self.snap(before_pos[0]), self.snap(before_pos[1])],
@@ -136,31 +139,16 @@ class AABBCollisionDetector:
     def resolve_collisions(self, scs: SCS) -> Dict[str, Any]:
         """
         Mutates scs workflow positions to resolve collisions; returns metrics + refinements.
+        current_graph may be a workflow dict or an already parsed WorkflowGraph.
         """
         graph = scs.get("workflow_state", {}).get("current_graph", {})
-        nodes_raw: Union[List[NodeT], Dict[str, NodeT]] = graph.get("nodes", [])
-        groups: List[GroupT] = graph.get("groups", [])
-
-        # Normalize nodes to dict keyed by id → node
-        nodes_dict: Dict[str, NodeT] = {}
-        if isinstance(nodes_raw, dict):
-            nodes_dict = nodes_raw
-        elif isinstance(nodes_raw, list):
-            for nd in nodes_raw:
-                nid = str(nd.get("id"))
-                if nid is None:
-                    continue
-                # Ensure pos exists
-                if "pos" not in nd or not isinstance(nd["pos"], list) or len(nd["pos"]) < 2:
-                    nd["pos"] = [0.0, 0.0]
-                nodes_dict[nid] = nd
-        else:
-            nodes_dict = {}
+        self._graph = WorkflowGraph.ensure(graph)
+        groups: List[GroupT] = self._graph.groups
 
-        # Build entity list
+        # Build entity list (node geometry is read from the graph arrays)
         entities: List[Dict[str, Any]] = []
-        for nid, nd in nodes_dict.items():
-            entities.append({"id": nid, "type": "node", "data": nd})
+        for record in self._graph:
+            entities.append({"id": record.key, "type": "node", "index": record.index})
         for i, gp in enumerate(groups or []):
             # Ensure group bounding exists
             if "bounding" not in gp or not isinstance(gp["bounding"], list) or len(gp["bounding"]) < 4:
@@ -184,8 +172,8 @@ class AABBCollisionDetector:
         # Snap everything to the grid
         for ent in entities:
             if ent["type"] == "node":
-                ent["data"]["pos"][0] = self.snap(ent["data"]["pos"][0])
-                ent["data"]["pos"][1] = self.snap(ent["data"]["pos"][1])
+                x, y = self._graph.pos(ent["index"])
+                self._graph.set_pos(ent["index"], self.snap(x), self.snap(y))
             else:
                 ent["data"]["bounding"][0] = self.snap(ent["data"]["bounding"][0])
                 ent["data"]["bounding"][1] = self.snap(ent["data"]["bounding"][1])
@@ -203,14 +191,17 @@ class AABBCollisionDetector:
         # Node total area
         total_node_area = 0.0
         aligned = 0
-        count_nodes = len(nodes_dict)
-        for nd in nodes_dict.values():
-            w, h = self._get_node_size(nd)
+        count_nodes = len(self._graph)
+        for i in range(count_nodes):
+            w, h = self._graph.size(i)
             total_node_area += w * h
-            px, py = nd["pos"]
+            px, py = self._graph.pos(i)
             if (px % self.grid_size == 0) and (py % self.grid_size == 0):
                 aligned += 1
 
+        # Write moved positions back into the workflow's node dicts
+        self._graph.sync()
+
         node_density = round(total_node_area / canvas_area, 3)
         alignment_score = round((aligned / count_nodes) if count_nodes else 0.0, 3)
 
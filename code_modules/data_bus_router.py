@@ -7,6 +7,8 @@ import json
 import math
 from typing import Dict, List, Tuple, Any, Optional, Union
 
+from workflow_graph import WorkflowGraph
+
 NodeT = Dict[str, Any]
 LinkT = List[Any]  # [id, from_node, from_slot, to_node, to_slot, type]
 SCS = Dict[str, Any]
@@ -29,6 +31,7 @@ class DataBusRouter:
     def __init__(self, grid_size: int = 50):
         self.grid_size = grid_size
         self.reroute_counter = 0
+        self.next_node_id = 1
         self.created_reroutes: List[NodeT] = []
         self.updated_links: List[LinkT] = []
         self.bus_utilization: Dict[str, Dict[str, Any]] = {}
@@ -51,6 +54,14 @@ class DataBusRouter:
         # Input is on the left side, middle height
         return pos[0], pos[1] + size[1] // 2
     
+    def _graph_output_pos(self, graph: WorkflowGraph, index: int) -> Tuple[float, float]:
+        """Output connection point from the graph's geometry arrays"""
+        return graph.x[index] + graph.w[index], graph.y[index] + graph.h[index] // 2
+    
+    def _graph_input_pos(self, graph: WorkflowGraph, index: int) -> Tuple[float, float]:
+        """Input connection point from the graph's geometry arrays"""
+        return graph.x[index], graph.y[index] + graph.h[index] // 2
+    
     def _identify_link_type(self, link: LinkT, nodes_dict: Dict[str, NodeT]) -> str:
         """Identify the data type of a connection link"""
         # Extract link components
@@ -71,23 +82,24 @@ class DataBusRouter:
                     return bus_type
         return "UNKNOWN"
     
-    def analyze_connections(self, nodes: Union[List[NodeT], Dict[str, NodeT]], 
+    def analyze_connections(self, nodes: Union[List[NodeT], Dict[str, NodeT], WorkflowGraph], 
                           links: List[LinkT]) -> Dict[str, Any]:
         """
         Analyze all connections to identify data types and routing needs
         
         Args:
-            nodes: List or dict of workflow nodes
+            nodes: List or dict of workflow nodes, or a parsed WorkflowGraph
             links: List of connection links
         
         Returns:
             Analysis of connections requiring data bus routing
         """
-        # Normalize nodes to dict
-        if isinstance(nodes, list):
-            nodes_dict = {str(node.get('id', i)): node for i, node in enumerate(nodes)}
+        # Parse nodes once (positions / sizes come from the graph arrays)
+        if isinstance(nodes, WorkflowGraph):
+            graph = nodes
         else:
-            nodes_dict = nodes
+            graph = WorkflowGraph({'nodes': nodes, 'links': links})
+        nodes_dict = graph.by_key
             
         routing_analysis = []
         type_counts = {}
@@ -113,11 +125,11 @@ class DataBusRouter:
             
             # Check if this connection should use data bus
             if data_type in self.DATA_BUS_TYPES:
-                from_node = nodes_dict[from_node_id]
-                to_node = nodes_dict[to_node_id]
+                from_index = nodes_dict[from_node_id].index
+                to_index = nodes_dict[to_node_id].index
                 
-                from_x, from_y = self._get_node_output_pos(from_node)
-                to_x, to_y = self._get_node_input_pos(to_node)
+                from_x, from_y = self._graph_output_pos(graph, from_index)
+                to_x, to_y = self._graph_input_pos(graph, to_index)
                 
                 # Determine if bus routing is beneficial
                 distance = abs(to_x - from_x) + abs(to_y - from_y)  # Manhattan distance
@@ -164,7 +176,8 @@ class DataBusRouter:
     def _create_reroute_node(self, x: float, y: float, data_type: str = "UNKNOWN") -> NodeT:
         """Create a reroute node at specified position"""
         self.reroute_counter += 1
-        node_id = f"reroute_{self.reroute_counter}"
+        node_id = self.next_node_id
+        self.next_node_id += 1
         
         reroute = {
             "id": node_id,
@@ -244,6 +257,30 @@ class DataBusRouter:
         
         return reroutes
     
+    def _rewire_slots(self, graph: WorkflowGraph, old_link_id: Any, chain: List[LinkT]) -> None:
+        """Replace old_link_id in the slot fields with the chain of segments that replaced it"""
+        first, last = chain[0], chain[-1]
+        
+        source = graph.node(first[1]).data
+        outputs = source.get('outputs') or []
+        if first[2] < len(outputs):
+            slot_links = outputs[first[2]].get('links') or []
+            outputs[first[2]]['links'] = [first[0] if link_id == old_link_id else link_id for link_id in slot_links]
+        
+        target = graph.node(last[3]).data
+        inputs = target.get('inputs') or []
+        matching = [slot for slot in inputs if slot.get('link') == old_link_id]
+        if matching:
+            matching[0]['link'] = last[0]
+        elif last[4] < len(inputs):
+            inputs[last[4]]['link'] = last[0]
+        
+        # Segment i enters reroute i; segment i + 1 leaves it
+        for incoming, outgoing in zip(chain, chain[1:]):
+            reroute = graph.node(incoming[3]).data
+            reroute['inputs'][0]['link'] = incoming[0]
+            reroute['outputs'][0]['links'] = [outgoing[0]]
+    
     def route_connections(self, scs_data: SCS) -> SCS:
         """
         Main routing function that adds reroute nodes to the workflow
@@ -254,25 +291,21 @@ class DataBusRouter:
         Returns:
             Updated SCS data with reroute nodes added
         """
-        # Extract workflow data
-        graph = scs_data.get("workflow_state", {}).get("current_graph", {})
-        nodes_raw = graph.get("nodes", [])
-        links = graph.get("links", [])
-        
-        # Normalize nodes to list and dict formats
-        if isinstance(nodes_raw, dict):
-            nodes_list = list(nodes_raw.values())
-            nodes_dict = nodes_raw
-        else:
-            nodes_list = nodes_raw
-            nodes_dict = {str(node.get('id', i)): node for i, node in enumerate(nodes_list)}
+        # Extract workflow data (a workflow dict or an already parsed WorkflowGraph)
+        graph = WorkflowGraph.ensure(scs_data.get("workflow_state", {}).get("current_graph", {}))
+        links = graph.links
         
         # Analyze connections
-        analysis = self.analyze_connections(nodes_dict, links)
+        analysis = self.analyze_connections(graph, links)
         
         # Generate reroute nodes for each connection needing routing
+        workflow = graph.workflow
         link_id_mapping = {}  # Maps old link IDs to new link configurations
-        next_link_id = max([link[0] for link in links if link[0] is not None], default=0) + 1
+        next_link_id = max([link[0] for link in links if isinstance(link[0], int)]
+                           + [workflow.get('last_link_id') or 0]) + 1
+        # Reroutes get integer ids above every existing node id
+        self.next_node_id = max([int(record.key) for record in graph if record.key.isdigit()]
+                                + [workflow.get('last_node_id') or 0]) + 1
         
         for routing_info in analysis['routing_analysis']:
             # Create orthogonal path with reroute nodes
@@ -332,12 +365,8 @@ class DataBusRouter:
         # Update the workflow with new nodes and links
         if self.created_reroutes:
             # Add reroute nodes to the workflow
-            if isinstance(nodes_raw, dict):
-                for reroute in self.created_reroutes:
-                    nodes_dict[reroute['id']] = reroute
-                graph['nodes'] = nodes_dict
-            else:
-                graph['nodes'] = nodes_list + self.created_reroutes
+            for reroute in self.created_reroutes:
+                graph.add_node(reroute)
             
             # Replace old links with new routed links
             new_links_list = []
@@ -349,7 +378,13 @@ class DataBusRouter:
                     # Keep original link
                     new_links_list.append(link)
             
-            graph['links'] = new_links_list
+            graph.set_links(new_links_list)
+            
+            # Point the slots of the endpoints and reroutes at the new segments
+            for old_link_id, chain in link_id_mapping.items():
+                self._rewire_slots(graph, old_link_id, chain)
+            workflow['last_node_id'] = self.next_node_id - 1
+            workflow['last_link_id'] = next_link_id - 1
         
         # Update layout parameters with bus utilization
         layout_params = scs_data.setdefault("layout_parameters", {})
@@ -0,0 +1,147 @@
+"""
+Graph Analysis Module for ComfyUI Workflow Layout
+Version 2.0 - Precomputed connection maps, staging and categorisation shared by layout strategies
+
+A GraphAnalysis is built once per workflow; the engineering, layered, zigzag
+and WAN2.1 layouts all read the same connection map, SCC-condensed
+topological order and per-matcher category tables from it.
+"""
+
+import heapq
+from typing import Dict, List, Any, Callable, Optional, Set, Union
+
+from workflow_graph import WorkflowGraph, as_workflow, condensation
+
+Connections = Dict[Any, Dict[str, Set[Any]]]
+Categorizer = Callable[[str], Optional[str]]
+
+
+def snap_to_grid(value: float, grid_size: int = 20) -> int:
+    """Snap a value to the nearest grid point"""
+    return int(round(value / grid_size) * grid_size)
+
+
+def build_connections(nodes: Dict[Any, Dict[str, Any]], links: List[List[Any]],
+                      graph: Optional[WorkflowGraph] = None) -> Connections:
+    """Map node id -> {'inputs': set of source ids, 'outputs': set of target ids}"""
+    connections = {node_id: {'inputs': set(), 'outputs': set()} for node_id in nodes}
+
+    if graph is not None:
+        # Prebuilt adjacency from the shared graph
+        records = graph.records
+        for record in records:
+            if record.id in connections:
+                connections[record.id]['inputs'].update(
+                    records[i].id for i in record.in_nodes if records[i].id in connections)
+                connections[record.id]['outputs'].update(
+                    records[i].id for i in record.out_nodes if records[i].id in connections)
+        return connections
+
+    for link in links:
+        if len(link) >= 4:
+            source_node = link[1]
+            target_node = link[3]
+            if source_node in connections and target_node in connections:
+                connections[source_node]['outputs'].add(target_node)
+                connections[target_node]['inputs'].add(source_node)
+    return connections
+
+
+def _condense(connections: Connections):
+    successors = {node_id: conn['outputs'] for node_id, conn in connections.items()}
+    components, _, component_outputs = condensation(connections, successors)
+    in_degree = [0] * len(components)
+    for outputs in component_outputs:
+        for target in outputs:
+            in_degree[target] += 1
+    return components, component_outputs, in_degree
+
+
+def stage_levels(connections: Connections) -> List[List[Any]]:
+    """
+    Topological levels (Kahn) over the SCC condensation.
+    Each cycle (e.g. looping nodes) is placed in one level as a contiguous block.
+    """
+    components, component_outputs, in_degree = _condense(connections)
+    queue = [c for c, degree in enumerate(in_degree) if degree == 0]
+    stages = []
+    while queue:
+        current_stage = []
+        next_queue = []
+        for c in queue:
+            current_stage.extend(components[c])
+            for target in component_outputs[c]:
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    next_queue.append(target)
+        stages.append(current_stage)
+        queue = next_queue
+    return stages
+
+
+def execution_order(connections: Connections) -> List[Any]:
+    """Flat topological order over the SCC condensation; the smallest ready id goes first"""
+    components, component_outputs, in_degree = _condense(connections)
+    queue = [(min(components[c]), c) for c, degree in enumerate(in_degree) if degree == 0]
+    heapq.heapify(queue)
+    sorted_nodes = []
+    while queue:
+        _, c = heapq.heappop(queue)
+        sorted_nodes.extend(components[c])
+        for target in component_outputs[c]:
+            in_degree[target] -= 1
+            if in_degree[target] == 0:
+                heapq.heappush(queue, (min(components[target]), target))
+    return sorted_nodes
+
+
+class GraphAnalysis:
+    """Connection map, staging and categorisation computed once per workflow"""
+
+    def __init__(self, workflow_data: Union[dict, WorkflowGraph]):
+        self.graph = workflow_data if isinstance(workflow_data, WorkflowGraph) else None
+        self.workflow = as_workflow(workflow_data)
+        self.nodes: Dict[Any, Dict[str, Any]] = {node['id']: node for node in self.workflow['nodes']}
+        self.links: List[List[Any]] = self.workflow['links']
+        self.connections = build_connections(self.nodes, self.links, self.graph)
+        self._stages: Optional[List[List[Any]]] = None
+        self._order: Optional[List[Any]] = None
+        self._categories: Dict[Categorizer, Dict[str, List[Any]]] = {}
+
+    @property
+    def stages(self) -> List[List[Any]]:
+        """Topological levels (see stage_levels)"""
+        if self._stages is None:
+            self._stages = stage_levels(self.connections)
+        return self._stages
+
+    @property
+    def order(self) -> List[Any]:
+        """Flat execution order (see execution_order)"""
+        if self._order is None:
+            self._order = execution_order(self.connections)
+        return self._order
+
+    def categorize(self, categorizer: Categorizer) -> Dict[str, List[Any]]:
+        """Category -> node ids for a type categorizer; nodes it maps to None are left out"""
+        categories = self._categories.get(categorizer)
+        if categories is None:
+            categories = {}
+            for node_id, node in self.nodes.items():
+                category = categorizer(node.get('type', ''))
+                if category is not None:
+                    categories.setdefault(category, []).append(node_id)
+            self._categories[categorizer] = categories
+        return categories
+
+    def category_of(self, categorizer: Categorizer) -> Dict[Any, str]:
+        """Node id -> category for a type categorizer"""
+        return {node_id: category for category, node_ids in self.categorize(categorizer).items()
+                for node_id in node_ids}
+
+    def finish(self) -> Dict[str, Any]:
+        """Write node positions back (and refresh a shared WorkflowGraph); returns the workflow"""
+        self.workflow['nodes'] = list(self.nodes.values())
+        if self.graph is not None:
+            self.graph.reload_geometry()
+        return self.workflow
@@ -3,8 +3,12 @@ JSON Validator Module for ComfyUI Workflow Layout
 Version 2.0 - Validates and auto-fixes ComfyUI workflow JSON structure
 """
 
+import copy
 import json
-from typing import Dict, List, Any, Tuple, Optional, Union
+from functools import lru_cache
+from typing import Dict, List, Any, Tuple, Optional, Union, Callable, Iterable, Set, FrozenSet, Container
+
+from workflow_graph import WorkflowGraph, as_workflow, strongly_connected_components
 
 # Type aliases for clarity
 NodeT = Dict[str, Any]
@@ -12,6 +16,777 @@ LinkT = List[Any]  # [id, from_node, from_slot, to_node, to_slot, type]
 GroupT = Dict[str, Any]
 WorkflowT = Dict[str, Any]
 SCS = Dict[str, Any]
+GraphT = Union[WorkflowT, WorkflowGraph]
+
+# A rule check yields one argument tuple per issue found (or returns None)
+IssueArgs = Tuple[Any, ...]
+RuleCheck = Callable[['JSONValidator', Any, int], Optional[Iterable[IssueArgs]]]
+Issue = Tuple['ValidationRule', IssueArgs]
+
+# Title keyword -> group color, checked in order (first match wins)
+GROUP_TITLE_COLORS: Tuple[Tuple[Tuple[str, ...], str], ...] = (
+    (('loader', 'model'), '#355335'),
+    (('condition', 'prompt'), '#353553'),
+    (('sampl',), '#533535'),
+    (('latent',), '#535335'),
+    (('post', 'process'), '#453553'),
+    (('control',), '#534535'),
+    (('image', 'input', 'output'), '#355353'),
+)
+DEFAULT_GROUP_COLOR = '#444444'  # Utility color
+
+
+@lru_cache(maxsize=1024)
+def infer_group_color(title: str) -> str:
+    """Infer a COLOR_SCHEME.md color from a group title"""
+    title_lower = title.lower()
+    for keywords, color in GROUP_TITLE_COLORS:
+        for keyword in keywords:
+            if keyword in title_lower:
+                return color
+    return DEFAULT_GROUP_COLOR
+
+
+# Output (sink) node types; any type containing one of the markers also counts
+OUTPUT_NODE_TYPES = frozenset({
+    'SaveImage', 'PreviewImage', 'SaveLatent', 'SaveAnimatedWEBP',
+    'SaveAnimatedPNG', 'VHS_VideoCombine', 'Image Save', 'SaveVideo'
+})
+OUTPUT_TYPE_MARKERS = ('Save', 'Preview', 'VideoCombine')
+# Frontend-only node types that never execute
+VIRTUAL_TYPE_MARKERS = ('Note', 'Reroute')
+# Node modes that do not execute (2 = never/muted, 4 = bypass)
+INACTIVE_MODES = (2, 4)
+
+# Link inputs that core ComfyUI nodes require. The UI format does not say which
+# inputs are required (custom context / pipe nodes leave most of theirs empty),
+# so only these are reported when unconnected.
+REQUIRED_INPUTS: Dict[str, FrozenSet[str]] = {
+    node_type: frozenset(names) for node_type, names in {
+        'KSampler': ('model', 'positive', 'negative', 'latent_image'),
+        'KSamplerAdvanced': ('model', 'positive', 'negative', 'latent_image'),
+        'SamplerCustom': ('model', 'positive', 'negative', 'sampler', 'sigmas', 'latent_image'),
+        'SamplerCustomAdvanced': ('noise', 'guider', 'sampler', 'sigmas', 'latent_image'),
+        'CFGGuider': ('model', 'positive', 'negative'),
+        'BasicGuider': ('model', 'conditioning'),
+        'BasicScheduler': ('model',),
+        'CLIPTextEncode': ('clip',),
+        'CLIPSetLastLayer': ('clip',),
+        'CLIPVisionEncode': ('clip_vision', 'image'),
+        'ConditioningCombine': ('conditioning_1', 'conditioning_2'),
+        'FluxGuidance': ('conditioning',),
+        'ControlNetApply': ('conditioning', 'control_net', 'image'),
+        'ControlNetApplyAdvanced': ('positive', 'negative', 'control_net', 'image'),
+        'InpaintModelConditioning': ('positive', 'negative', 'vae', 'pixels', 'mask'),
+        'LoraLoader': ('model', 'clip'),
+        'LoraLoaderModelOnly': ('model',),
+        'ModelSamplingSD3': ('model',),
+        'ModelSamplingFlux': ('model',),
+        'ModelSamplingDiscrete': ('model',),
+        'VAEDecode': ('samples', 'vae'),
+        'VAEDecodeTiled': ('samples', 'vae'),
+        'VAEEncode': ('pixels', 'vae'),
+        'VAEEncodeForInpaint': ('pixels', 'vae', 'mask'),
+        'SetLatentNoiseMask': ('samples', 'mask'),
+        'LatentUpscale': ('samples',),
+        'LatentUpscaleBy': ('samples',),
+        'ImageScale': ('image',),
+        'ImageScaleBy': ('image',),
+        'ImageUpscaleWithModel': ('upscale_model', 'image'),
+        'SaveImage': ('images',),
+        'PreviewImage': ('images',),
+        'SaveAnimatedWEBP': ('images',),
+        'SaveAnimatedPNG': ('images',),
+        'VHS_VideoCombine': ('images',),
+    }.items()
+}
+
+
+def is_output_node(node_type: str) -> bool:
+    if node_type in OUTPUT_NODE_TYPES:
+        return True
+    return any(marker in node_type for marker in OUTPUT_TYPE_MARKERS)
+
+
+def is_virtual_node(node_type: str) -> bool:
+    return any(marker in node_type for marker in VIRTUAL_TYPE_MARKERS)
+
+
+class GraphIndex:
+    """
+    Adjacency index over a UI-format workflow.
+
+    Built once per validation pass and shared by every graph-level rule; the
+    analyses below are each linear in nodes + links and cached on first use.
+    """
+
+    def __init__(self, workflow: WorkflowT):
+        self.workflow = workflow
+        self.nodes: Dict[Any, NodeT] = {}
+        for node in workflow.get('nodes', []):
+            self.nodes.setdefault(node.get('id'), node)
+        
+        # Link table, endpoints of every link (even to unknown nodes) and adjacency between known nodes
+        self.link_ids: Set[Any] = set()
+        self.link_sources: Set[Any] = set()
+        self.link_targets: Set[Any] = set()
+        self.successors: Dict[Any, List[Any]] = {}
+        self.predecessors: Dict[Any, List[Any]] = {}
+        for link in workflow.get('links', []):
+            if link:
+                self.link_ids.add(link[0])
+            if len(link) < 4:
+                continue
+            source, target = link[1], link[3]
+            self.link_sources.add(source)
+            self.link_targets.add(target)
+            if source in self.nodes and target in self.nodes:
+                self.successors.setdefault(source, []).append(target)
+                self.predecessors.setdefault(target, []).append(source)
+        
+        self._cycles: Optional[List[List[Any]]] = None
+        self._sinks: Optional[List[Any]] = None
+        self._orphans: Optional[List[Any]] = None
+    
+    def cycles(self) -> List[List[Any]]:
+        """Strongly connected components that contain a cycle"""
+        if self._cycles is None:
+            self._cycles = [
+                component for component in strongly_connected_components(self.nodes, self.successors)
+                if len(component) > 1 or component[0] in self.successors.get(component[0], ())
+            ]
+        return self._cycles
+    
+    def sinks(self) -> List[Any]:
+        """Active output nodes"""
+        if self._sinks is None:
+            self._sinks = [
+                node_id for node_id, node in self.nodes.items()
+                if is_output_node(node.get('type', '')) and node.get('mode', 0) not in INACTIVE_MODES
+            ]
+        return self._sinks
+    
+    def orphans(self) -> List[Any]:
+        """Active nodes with outputs from which no output node is reachable"""
+        if self._orphans is None:
+            reached = set(self.sinks())
+            frontier = list(reached)
+            while frontier:
+                node_id = frontier.pop()
+                for source in self.predecessors.get(node_id, ()):
+                    if source not in reached:
+                        reached.add(source)
+                        frontier.append(source)
+            self._orphans = [
+                node_id for node_id, node in self.nodes.items()
+                if node_id not in reached
+                and node.get('outputs')
+                and node.get('mode', 0) not in INACTIVE_MODES
+                and not is_virtual_node(node.get('type', ''))
+            ]
+        return self._orphans
+
+
+def is_active_sink(node: NodeT) -> bool:
+    return is_output_node(node.get('type', '')) and node.get('mode', 0) not in INACTIVE_MODES
+
+
+class GraphState:
+    """
+    Cycle and output-reachability state of a workflow, maintained edge by edge.
+
+    Incremental validation keeps one of these instead of re-running Tarjan and
+    the reachability pass over the whole graph. A new link only searches
+    forward from its target when its source has predecessors (otherwise it
+    cannot close a cycle), and only marks the not-yet-reaching upstream of its
+    source. A removed link re-splits the component it was inside, if any, and
+    re-derives reachability for the upstream of its source only when the
+    source may have lost its last path to an output node.
+    """
+
+    def __init__(self, index: GraphIndex):
+        self.nodes: Dict[Any, NodeT] = dict(index.nodes)
+        # (source, target) -> number of links, including links to unknown nodes
+        self.edges: Dict[Tuple[Any, Any], int] = {}
+        self.incident: Dict[Any, Set[Tuple[Any, Any]]] = {}
+        # Adjacency between known nodes
+        self.succ: Dict[Any, Set[Any]] = {node_id: set() for node_id in self.nodes}
+        self.pred: Dict[Any, Set[Any]] = {node_id: set() for node_id in self.nodes}
+        for link in index.workflow.get('links', []):
+            if len(link) >= 4:
+                self._count_edge(link[1], link[3])
+        for (source, target) in self.edges:
+            if source in self.nodes and target in self.nodes:
+                self.succ[source].add(target)
+                self.pred[target].add(source)
+        
+        # Cyclic strongly connected components
+        self.components: Dict[int, List[Any]] = {}
+        self.component_of: Dict[Any, int] = {}
+        self._next_component = 0
+        for component in index.cycles():
+            self._add_component(component)
+        
+        self.sinks: Set[Any] = {node_id for node_id, node in self.nodes.items() if is_active_sink(node)}
+        self.real_nodes = sum(1 for node in self.nodes.values() if not is_virtual_node(node.get('type', '')))
+        self.reached: Set[Any] = set()
+        self.orphans: Set[Any] = set()
+        for sink in self.sinks:
+            self._mark_reached(sink)
+        for node_id in self.nodes:
+            self._refresh_orphan(node_id)
+    
+    # Edges
+    
+    def _count_edge(self, source: Any, target: Any) -> int:
+        key = (source, target)
+        count = self.edges.get(key, 0) + 1
+        self.edges[key] = count
+        self.incident.setdefault(source, set()).add(key)
+        self.incident.setdefault(target, set()).add(key)
+        return count
+    
+    def add_edge(self, source: Any, target: Any) -> None:
+        if self._count_edge(source, target) == 1 and source in self.nodes and target in self.nodes:
+            self._link(source, target)
+    
+    def remove_edge(self, source: Any, target: Any) -> None:
+        key = (source, target)
+        count = self.edges.get(key, 0) - 1
+        if count > 0:
+            self.edges[key] = count
+            return
+        self.edges.pop(key, None)
+        for node_id in key:
+            incident = self.incident.get(node_id)
+            if incident is not None:
+                incident.discard(key)
+                if not incident:
+                    del self.incident[node_id]
+        if source in self.nodes and target in self.nodes:
+            self._unlink(source, target)
+    
+    def _link(self, source: Any, target: Any) -> None:
+        self.succ[source].add(target)
+        self.pred[target].add(source)
+        self._close_cycle(source, target)
+        if target in self.reached:
+            self._mark_reached(source)
+    
+    def _unlink(self, source: Any, target: Any) -> None:
+        self.succ[source].discard(target)
+        self.pred[target].discard(source)
+        component = self.component_of.get(source)
+        if component is not None and self.component_of.get(target) == component:
+            self._split_component(component)
+        if source in self.reached:
+            self._recheck_reached(source)
+    
+    # Nodes
+    
+    def add_node(self, node: NodeT) -> None:
+        node_id = node.get('id')
+        if node_id in self.nodes:
+            return  # duplicate ID; the first node keeps it
+        self.nodes[node_id] = node
+        self.succ[node_id] = set()
+        self.pred[node_id] = set()
+        if not is_virtual_node(node.get('type', '')):
+            self.real_nodes += 1
+        if is_active_sink(node):
+            self.sinks.add(node_id)
+            self._mark_reached(node_id)
+        for source, target in list(self.incident.get(node_id, ())):
+            if source in self.nodes and target in self.nodes:
+                self._link(source, target)
+        self._refresh_orphan(node_id)
+    
+    def update_node(self, node: NodeT) -> None:
+        node_id = node.get('id')
+        old = self.nodes.get(node_id)
+        if old is None:
+            self.add_node(node)
+            return
+        self.nodes[node_id] = node
+        self.real_nodes += (is_virtual_node(old.get('type', '')) - is_virtual_node(node.get('type', '')))
+        was_sink, is_sink = node_id in self.sinks, is_active_sink(node)
+        if is_sink and not was_sink:
+            self.sinks.add(node_id)
+            self._mark_reached(node_id)
+        elif was_sink and not is_sink:
+            self.sinks.discard(node_id)
+            self._recheck_reached(node_id)
+        self._refresh_orphan(node_id)
+    
+    def remove_node(self, node_id: Any) -> None:
+        node = self.nodes.get(node_id)
+        if node is None:
+            return
+        self.sinks.discard(node_id)
+        for source, target in list(self.incident.get(node_id, ())):
+            if source in self.nodes and target in self.nodes:
+                self._unlink(source, target)
+        if node_id in self.reached:
+            self._recheck_reached(node_id)
+        if not is_virtual_node(node.get('type', '')):
+            self.real_nodes -= 1
+        del self.nodes[node_id]
+        del self.succ[node_id]
+        del self.pred[node_id]
+        self.reached.discard(node_id)
+        self.orphans.discard(node_id)
+    
+    # Cycles
+    
+    def _add_component(self, members: List[Any]) -> None:
+        component = self._next_component
+        self._next_component += 1
+        self.components[component] = members
+        for node_id in members:
+            self.component_of[node_id] = component
+    
+    def _close_cycle(self, source: Any, target: Any) -> None:
+        """Merge the components joined by a new edge source -> target into one cycle"""
+        if source == target:
+            if source not in self.component_of:
+                self._add_component([source])
+            return
+        component = self.component_of.get(source)
+        if component is not None and self.component_of.get(target) == component:
+            return
+        # Only a path target -> ... -> source closes a cycle
+        if not self.pred[source] or not self.succ[target]:
+            return
+        forward = {target}
+        stack = [target]
+        while stack:
+            for successor in self.succ[stack.pop()]:
+                if successor not in forward:
+                    forward.add(successor)
+                    stack.append(successor)
+        if source not in forward:
+            return
+        # The new component: nodes reachable from target that reach source
+        members = [source]
+        seen = {source}
+        stack = [source]
+        while stack:
+            for predecessor in self.pred[stack.pop()]:
+                if predecessor in forward and predecessor not in seen:
+                    seen.add(predecessor)
+                    members.append(predecessor)
+                    stack.append(predecessor)
+        for node_id in members:
+            old = self.component_of.pop(node_id, None)
+            if old is not None:
+                self.components.pop(old, None)
+        self._add_component(members)
+    
+    def _split_component(self, component: int) -> None:
+        """Recompute the cycles inside a component that lost an edge"""
+        members = self.components.pop(component)
+        member_set = set(members)
+        for node_id in members:
+            del self.component_of[node_id]
+        successors = {node_id: [s for s in self.succ[node_id] if s in member_set] for node_id in members}
+        for part in strongly_connected_components(members, successors):
+            if len(part) > 1 or part[0] in self.succ[part[0]]:
+                self._add_component(part)
+    
+    # Output reachability
+    
+    def _mark_reached(self, node_id: Any) -> None:
+        """Mark node_id and its not yet reaching upstream as reaching an output node"""
+        if node_id in self.reached:
+            return
+        self.reached.add(node_id)
+        self.orphans.discard(node_id)
+        stack = [node_id]
+        while stack:
+            for predecessor in self.pred[stack.pop()]:
+                if predecessor not in self.reached:
+                    self.reached.add(predecessor)
+                    self.orphans.discard(predecessor)
+                    stack.append(predecessor)
+    
+    def _recheck_reached(self, node_id: Any) -> None:
+        """Re-derive reachability after node_id may have lost its path to an output node"""
+        if node_id in self.sinks:
+            return
+        if node_id not in self.component_of and any(s in self.reached for s in self.succ[node_id]):
+            # Outside a cycle no successor's path can run back through node_id
+            return
+        # Everything upstream may have depended on node_id; recompute that region only
+        candidates = [node_id]
+        self.reached.discard(node_id)
+        stack = [node_id]
+        while stack:
+            for predecessor in self.pred[stack.pop()]:
+                if predecessor in self.reached:
+                    self.reached.discard(predecessor)
+                    candidates.append(predecessor)
+                    stack.append(predecessor)
+        for candidate in candidates:
+            if candidate in self.sinks or any(s in self.reached for s in self.succ[candidate]):
+                self._mark_reached(candidate)
+        for candidate in candidates:
+            self._refresh_orphan(candidate)
+    
+    def _refresh_orphan(self, node_id: Any) -> None:
+        node = self.nodes.get(node_id)
+        if (node is not None and node_id not in self.reached and node.get('outputs')
+                and node.get('mode', 0) not in INACTIVE_MODES
+                and not is_virtual_node(node.get('type', ''))):
+            self.orphans.add(node_id)
+        else:
+            self.orphans.discard(node_id)
+    
+    def issues(self, rules: Iterable['ValidationRule'], node_slots: Dict[Any, int]) -> List['Issue']:
+        """Issues of the graph rules, in the shape the full validation reports them"""
+        issues: List[Issue] = []
+        for rule in rules:
+            if rule.name == 'graph_cycles':
+                issues.extend((rule, (members[-1], members[::-1])) for members in self.components.values())
+            elif rule.name == 'missing_output_node':
+                if not self.sinks and self.real_nodes:
+                    issues.append((rule, ()))
+            elif rule.name == 'orphan_outputs' and self.sinks:
+                for node_id in sorted(self.orphans, key=lambda n: node_slots.get(n, 0)):
+                    issues.append((rule, (node_id, self.nodes[node_id].get('type', ''))))
+        return issues
+
+
+class ValidationRule:
+    """
+    Declarative validation rule.
+
+    `check(validator, target, index)` inspects (and, for fixing rules, repairs)
+    a node, group, link or whole workflow and returns an iterable of argument
+    tuples, one per issue. `location` and `message` are format templates that
+    are only rendered when the caller asks for issue messages.
+    """
+
+    __slots__ = ('name', 'target', 'severity', 'location', 'message',
+                 'check', 'fix_applied', 'node_types')
+
+    def __init__(self, name: str, target: str, severity: str, location: str,
+                 message: str, check: RuleCheck, fix_applied: bool = False,
+                 node_types: Optional[Iterable[str]] = None):
+        self.name = name
+        self.target = target  # 'node', 'group', 'link' or 'workflow'
+        self.severity = severity
+        self.location = location
+        self.message = message
+        self.check = check
+        self.fix_applied = fix_applied
+        # Restrict a node rule to specific node types (None = all nodes)
+        self.node_types = frozenset(node_types) if node_types is not None else None
+
+    def render(self, args: IssueArgs) -> Dict[str, Any]:
+        """Build the issue entry reported to callers"""
+        return {
+            'severity': self.severity,
+            'location': self.location.format(*args) if args else self.location,
+            'message': self.message.format(*args) if args else self.message,
+            'fix_applied': self.fix_applied
+        }
+
+
+# ---------- Rule checks ----------
+
+def _check_none(validator: 'JSONValidator', target: Any, index: int):
+    return None
+
+
+def _check_node_flags(validator: 'JSONValidator', node: NodeT, index: int):
+    if 'flags' not in node:
+        node['flags'] = {}
+        return ((node.get('id', 'unknown'),),)
+    return None
+
+
+def _check_node_order(validator: 'JSONValidator', node: NodeT, index: int):
+    if 'order' not in node:
+        node['order'] = 0
+        return ((node.get('id', 'unknown'),),)
+    return None
+
+
+def _check_node_mode(validator: 'JSONValidator', node: NodeT, index: int):
+    if 'mode' not in node:
+        node['mode'] = 0
+        return ((node.get('id', 'unknown'),),)
+    return None
+
+
+def _check_node_properties(validator: 'JSONValidator', node: NodeT, index: int):
+    if 'properties' not in node:
+        node['properties'] = {}
+        # Try to set Node name for S&R if possible
+        if 'type' in node:
+            node['properties']['Node name for S&R'] = node['type']
+        return ((node.get('id', 'unknown'),),)
+    return None
+
+
+def _check_output_slot_index(validator: 'JSONValidator', node: NodeT, index: int):
+    outputs = node.get('outputs')
+    if not outputs:
+        return None
+    issues = None
+    for i, output in enumerate(outputs):
+        if 'slot_index' not in output:
+            output['slot_index'] = i
+            if issues is None:
+                issues = []
+            issues.append((node.get('id', 'unknown'), i))
+    return issues
+
+
+def _check_group_bounding_box(validator: 'JSONValidator', group: GroupT, index: int):
+    # Fix bounding_box -> bounding
+    if 'bounding_box' in group and 'bounding' not in group:
+        group['bounding'] = group.pop('bounding_box')
+        return ((index, group.get('title', f'Group_{index}')),)
+    return None
+
+
+def _check_group_bounding(validator: 'JSONValidator', group: GroupT, index: int):
+    if 'bounding' not in group:
+        # Add default bounding if missing
+        group['bounding'] = [0, 0, 400, 300]
+        return ((index, group.get('title', f'Group_{index}')),)
+    return None
+
+
+def _check_group_color(validator: 'JSONValidator', group: GroupT, index: int):
+    color = group.get('color')
+    if color and color not in validator.VALID_COLORS:
+        # Infer color from title or fall back to the utility color
+        group_title = group.get('title', f'Group_{index}')
+        new_color = infer_group_color(group_title)
+        group['color'] = new_color
+        return ((index, group_title, color, new_color),)
+    return None
+
+
+def _check_link_structure(validator: 'JSONValidator', link: LinkT, index: int):
+    if len(link) != 6:
+        return ((index, len(link)),)
+    return None
+
+
+def _check_dangling_inputs(validator: 'JSONValidator', node: NodeT, index: int):
+    inputs = node.get('inputs')
+    required = REQUIRED_INPUTS.get(node.get('type', ''))
+    if not inputs or not required or node.get('mode', 0) in INACTIVE_MODES:
+        return None
+    issues = None
+    for slot, node_input in enumerate(inputs):
+        # Widget-backed and optional (shape 7) inputs may stay unconnected
+        if (node_input.get('link') is None and node_input.get('name') in required
+                and 'widget' not in node_input and node_input.get('shape') != 7):
+            if issues is None:
+                issues = []
+            issues.append((node.get('id', 'unknown'), slot, node_input.get('name', '')))
+    return issues
+
+
+def _check_missing_input_links(validator: 'JSONValidator', node: NodeT, index: int):
+    # Link table of the workflow being validated (None outside a validation pass)
+    known_links = validator._link_table
+    inputs = node.get('inputs')
+    if known_links is None or not inputs:
+        return None
+    issues = None
+    for slot, node_input in enumerate(inputs):
+        link_id = node_input.get('link')
+        if link_id is not None and link_id not in known_links:
+            if issues is None:
+                issues = []
+            issues.append((node.get('id', 'unknown'), slot, node_input.get('name', ''), link_id))
+    return issues
+
+
+def _check_reroute_connections(validator: 'JSONValidator', workflow: WorkflowT, index: int):
+    graph = validator.graph_index(workflow)
+    has_input = graph.link_targets
+    has_output = graph.link_sources
+
+    issues = []
+    for node in workflow.get('nodes', []):
+        if node.get('type') == 'Reroute':
+            node_id = node.get('id')
+            if node_id not in has_input:
+                issues.append((node_id, 'input'))
+            if node_id not in has_output:
+                issues.append((node_id, 'output'))
+    return issues
+
+
+def _check_duplicate_ids(validator: 'JSONValidator', workflow: WorkflowT, index: int):
+    seen = set()
+    for node in workflow.get('nodes', []):
+        node_id = node.get('id')
+        if node_id is None:
+            continue
+        if node_id in seen:
+            return ((),)
+        seen.add(node_id)
+    return None
+
+
+def _check_graph_cycles(validator: 'JSONValidator', workflow: WorkflowT, index: int):
+    return [(component[-1], component[::-1]) for component in validator.graph_index(workflow).cycles()]
+
+
+def _check_missing_output_node(validator: 'JSONValidator', workflow: WorkflowT, index: int):
+    graph = validator.graph_index(workflow)
+    if graph.sinks():
+        return None
+    if any(not is_virtual_node(node.get('type', '')) for node in graph.nodes.values()):
+        return ((),)
+    return None
+
+
+def _check_orphan_outputs(validator: 'JSONValidator', workflow: WorkflowT, index: int):
+    graph = validator.graph_index(workflow)
+    if not graph.sinks():
+        # Reported once by missing_output_node instead of once per node
+        return None
+    return [(node_id, graph.nodes[node_id].get('type', '')) for node_id in graph.orphans()]
+
+
+# Registry of built-in rules, applied in this order
+DEFAULT_RULES: Tuple[ValidationRule, ...] = (
+    ValidationRule('node_flags', 'node', 'error', 'node_{0}',
+                   "Node {0} missing 'flags' property - added empty flags",
+                   _check_node_flags, fix_applied=True),
+    ValidationRule('node_order', 'node', 'error', 'node_{0}',
+                   "Node {0} missing 'order' property - set to 0",
+                   _check_node_order, fix_applied=True),
+    ValidationRule('node_mode', 'node', 'error', 'node_{0}',
+                   "Node {0} missing 'mode' property - set to 0",
+                   _check_node_mode, fix_applied=True),
+    ValidationRule('node_properties', 'node', 'error', 'node_{0}',
+                   "Node {0} missing 'properties' property - added default",
+                   _check_node_properties, fix_applied=True),
+    ValidationRule('output_slot_index', 'node', 'error', 'node_{0}_output_{1}',
+                   "Node {0} output missing 'slot_index' - set to {1}",
+                   _check_output_slot_index, fix_applied=True),
+    ValidationRule('dangling_inputs', 'node', 'warning', 'node_{0}_input_{1}',
+                   "Node {0} input '{2}' is not connected",
+                   _check_dangling_inputs),
+    ValidationRule('missing_input_links', 'node', 'warning', 'node_{0}_input_{1}',
+                   "Node {0} input '{2}' references missing link {3}",
+                   _check_missing_input_links),
+    ValidationRule('group_bounding_box', 'group', 'error', 'group_{0}',
+                   "Group '{1}' uses 'bounding_box' - changed to 'bounding'",
+                   _check_group_bounding_box, fix_applied=True),
+    ValidationRule('group_bounding', 'group', 'error', 'group_{0}',
+                   "Group '{1}' missing 'bounding' - added default",
+                   _check_group_bounding, fix_applied=True),
+    ValidationRule('group_color', 'group', 'warning', 'group_{0}',
+                   "Group '{1}' invalid color '{2}' - changed to '{3}'",
+                   _check_group_color, fix_applied=True),
+    ValidationRule('link_structure', 'link', 'error', 'link_{0}',
+                   "Link {0} has {1} elements instead of 6 - cannot auto-fix",
+                   _check_link_structure),
+    ValidationRule('reroute_connections', 'workflow', 'warning', 'reroute_{0}',
+                   "Reroute node {0} has no {1} connections",
+                   _check_reroute_connections),
+    ValidationRule('duplicate_ids', 'workflow', 'error', 'workflow',
+                   "Duplicate node IDs detected - cannot auto-fix",
+                   _check_duplicate_ids),
+    ValidationRule('graph_cycles', 'workflow', 'error', 'node_{0}',
+                   "Nodes {1} form a cycle - cannot auto-fix",
+                   _check_graph_cycles),
+    ValidationRule('missing_output_node', 'workflow', 'warning', 'workflow',
+                   "Workflow has no active output node - nothing would execute",
+                   _check_missing_output_node),
+    ValidationRule('orphan_outputs', 'workflow', 'warning', 'node_{0}',
+                   "Node {0} ({1}) output does not reach any output node",
+                   _check_orphan_outputs),
+)
+
+# Workflow rules computed from the GraphIndex (kept up to date by GraphState when validating incrementally)
+GRAPH_RULES = frozenset({'graph_cycles', 'missing_output_node', 'orphan_outputs'})
+
+
+class ValidationState:
+    """
+    Per-entity validation results kept between incremental validation runs.
+
+    Built by `JSONValidator.create_state` and updated in place by
+    `JSONValidator.validate_incremental`. `workflow` is the (fixed) workflow
+    the state describes; the ID counts and link degrees are maintained so a
+    diff only re-checks the entities it touches. Group and link issue args
+    start with the entity's list index and are renumbered when entries are
+    removed. Nodes are keyed by ID, so while duplicate IDs exist (itself an
+    error) the per-node results of the duplicates are merged.
+    """
+
+    def __init__(self, workflow: WorkflowT):
+        self.workflow = workflow
+        self.node_issues: Dict[Any, List[Issue]] = {}
+        self.group_issues: List[List[Issue]] = []
+        self.link_issues: Dict[Any, List[Issue]] = {}
+        self.reroute_issues: Dict[Any, List[Issue]] = {}
+        self.graph_issues: List[Issue] = []
+        self.graph: Optional[GraphState] = None
+        self.id_counts: Dict[Any, int] = {}
+        self.duplicate_ids: Set[Any] = set()
+        self.in_degree: Dict[Any, int] = {}
+        self.out_degree: Dict[Any, int] = {}
+        self.node_slots: Dict[Any, int] = {}
+        self.link_slots: Dict[Any, int] = {}
+
+    def add_node_id(self, node_id: Any) -> None:
+        if node_id is None:
+            return
+        count = self.id_counts.get(node_id, 0) + 1
+        self.id_counts[node_id] = count
+        if count > 1:
+            self.duplicate_ids.add(node_id)
+
+    def remove_node_id(self, node_id: Any) -> None:
+        count = self.id_counts.get(node_id, 0) - 1
+        if count <= 0:
+            self.id_counts.pop(node_id, None)
+        else:
+            self.id_counts[node_id] = count
+        if count <= 1:
+            self.duplicate_ids.discard(node_id)
+
+    def add_link(self, link: LinkT) -> None:
+        if len(link) >= 4:
+            self.out_degree[link[1]] = self.out_degree.get(link[1], 0) + 1
+            self.in_degree[link[3]] = self.in_degree.get(link[3], 0) + 1
+
+    def remove_link(self, link: LinkT) -> None:
+        if len(link) >= 4:
+            for degree, node_id in ((self.out_degree, link[1]), (self.in_degree, link[3])):
+                count = degree.get(node_id, 0) - 1
+                if count <= 0:
+                    degree.pop(node_id, None)
+                else:
+                    degree[node_id] = count
+
+    def reindex_nodes(self) -> None:
+        self.node_slots = {}
+        for i, node in enumerate(self.workflow.get('nodes', [])):
+            self.node_slots.setdefault(node.get('id'), i)
+
+    def reindex_links(self) -> None:
+        self.link_slots = {}
+        for i, link in enumerate(self.workflow.get('links', [])):
+            if link:
+                self.link_slots.setdefault(link[0], i)
+        # Link issues carry the list index as their first arg
+        for link_id, issues in self.link_issues.items():
+            slot = self.link_slots.get(link_id)
+            if slot is not None:
+                self.link_issues[link_id] = [(rule, (slot,) + args[1:]) for rule, args in issues]
 
 
 class JSONValidator:
@@ -60,182 +835,171 @@ class JSONValidator:
         'PreviewImage': '#355353'
     }
     
-    def __init__(self):
+    def __init__(self, disabled_rules: Optional[Iterable[str]] = None):
         self.errors: List[Dict[str, Any]] = []
         self.warnings: List[Dict[str, Any]] = []
         self.auto_fixes: List[Dict[str, Any]] = []
         self.validation_summary: Dict[str, Any] = {}
+        
+        # Rule registry (per instance so rules can be toggled independently)
+        self.rules: Dict[str, ValidationRule] = {rule.name: rule for rule in DEFAULT_RULES}
+        self.disabled_rules = set()
+        for name in disabled_rules or ():
+            self.disable_rule(name)
+        
+        # Raw issues as (rule, args); messages are rendered on demand
+        self._issues: List[Tuple[ValidationRule, IssueArgs]] = []
+        self._compiled: Optional[Dict[str, Tuple[ValidationRule, ...]]] = None
+        self._node_dispatch: Dict[str, Tuple[ValidationRule, ...]] = {}
+        self._graph_index: Optional[GraphIndex] = None
+        # Link IDs of the workflow being validated, for node rules that check link references
+        self._link_table: Optional[Container[Any]] = None
     
-    def _add_error(self, severity: str, location: str, message: str, fix_applied: bool = False):
-        """Add an error or warning to the tracking lists"""
-        entry = {
-            'severity': severity,
-            'location': location,
-            'message': message,
-            'fix_applied': fix_applied
+    # ---------- Rule registry ----------
+    
+    def register_rule(self, rule: ValidationRule) -> None:
+        """Add (or replace) a rule; it runs after the built-in rules"""
+        self.rules[rule.name] = rule
+        self._invalidate()
+    
+    def enable_rule(self, name: str) -> None:
+        if name not in self.rules:
+            raise KeyError(f"Unknown validation rule: {name}")
+        self.disabled_rules.discard(name)
+        self._invalidate()
+    
+    def disable_rule(self, name: str) -> None:
+        if name not in self.rules:
+            raise KeyError(f"Unknown validation rule: {name}")
+        self.disabled_rules.add(name)
+        self._invalidate()
+    
+    def _invalidate(self) -> None:
+        self._compiled = None
+        self._node_dispatch = {}
+    
+    def _compile(self) -> Dict[str, Tuple[ValidationRule, ...]]:
+        """Group enabled rules by target so each target type has one dispatch tuple"""
+        if self._compiled is None:
+            compiled: Dict[str, List[ValidationRule]] = {
+                'node': [], 'group': [], 'link': [], 'workflow': []
+            }
+            for rule in self.rules.values():
+                if rule.name not in self.disabled_rules:
+                    compiled.setdefault(rule.target, []).append(rule)
+            self._compiled = {target: tuple(rules) for target, rules in compiled.items()}
+        return self._compiled
+    
+    def _rules_for_node(self, node_type: str) -> Tuple[ValidationRule, ...]:
+        """Enabled node rules applicable to a node type (compiled once per type)"""
+        rules = self._node_dispatch.get(node_type)
+        if rules is None:
+            rules = tuple(
+                rule for rule in self._compile()['node']
+                if rule.node_types is None or node_type in rule.node_types
+            )
+            self._node_dispatch[node_type] = rules
+        return rules
+    
+    def _run_rules(self, rules: Tuple[ValidationRule, ...], target: Any, index: int) -> Tuple[bool, bool]:
+        """Run rules against one target; returns (any issue recorded, any fix applied)"""
+        found = fixed = False
+        issues = self._issues
+        for rule in rules:
+            results = rule.check(self, target, index)
+            if results:
+                for args in results:
+                    issues.append((rule, args))
+                found = True
+                fixed = fixed or rule.fix_applied
+        return found, fixed
+    
+    # ---------- Graph analysis ----------
+    
+    def graph_index(self, workflow: WorkflowT) -> GraphIndex:
+        """Adjacency index for the workflow being validated (built once per pass)"""
+        index = self._graph_index
+        if index is None or index.workflow is not workflow:
+            index = self._graph_index = GraphIndex(workflow)
+        return index
+    
+    def analyze_graph(self, workflow: GraphT) -> Dict[str, Any]:
+        """Run the graph-level analyses without validating or fixing anything"""
+        workflow = as_workflow(workflow)
+        graph = GraphIndex(workflow)
+        dangling = []
+        self._link_table = graph.link_ids
+        try:
+            for node in workflow.get('nodes', []):
+                for node_id, slot, name in _check_dangling_inputs(self, node, 0) or ():
+                    dangling.append({'node_id': node_id, 'slot': slot, 'name': name})
+                for node_id, slot, name, link_id in _check_missing_input_links(self, node, 0) or ():
+                    dangling.append({'node_id': node_id, 'slot': slot, 'name': name, 'link': link_id})
+        finally:
+            self._link_table = None
+        return {
+            'cycles': graph.cycles(),
+            'output_nodes': graph.sinks(),
+            'orphan_nodes': graph.orphans() if graph.sinks() else [],
+            'dangling_inputs': dangling
         }
-        
-        if severity == 'error':
-            self.errors.append(entry)
-        elif severity == 'warning':
-            self.warnings.append(entry)
-            
-        if fix_applied:
-            self.auto_fixes.append(entry)
+    
+    # ---------- Issue tracking ----------
+    
+    def _add_error(self, severity: str, location: str, message: str, fix_applied: bool = False):
+        """Add a pre-formatted error or warning to the tracked issues"""
+        rule = ValidationRule('custom', 'workflow', severity, location, message,
+                              _check_none, fix_applied)
+        self._issues.append((rule, ()))
+    
+    def _summarize_issues(self, issues: List[Tuple[ValidationRule, IssueArgs]]) -> Tuple[int, int, int]:
+        """Count (errors, warnings, auto_fixes) without rendering messages"""
+        errors_count = warnings_count = fixes_count = 0
+        for rule, _ in issues:
+            if rule.severity == 'error':
+                errors_count += 1
+            elif rule.severity == 'warning':
+                warnings_count += 1
+            if rule.fix_applied:
+                fixes_count += 1
+        return errors_count, warnings_count, fixes_count
+    
+    def _render_issues(self, issues: List[Tuple[ValidationRule, IssueArgs]]) -> None:
+        """Render tracked issues into the errors / warnings / auto_fixes lists"""
+        self.errors = []
+        self.warnings = []
+        self.auto_fixes = []
+        for rule, args in issues:
+            entry = rule.render(args)
+            if rule.severity == 'error':
+                self.errors.append(entry)
+            elif rule.severity == 'warning':
+                self.warnings.append(entry)
+            if rule.fix_applied:
+                self.auto_fixes.append(entry)
+    
+    # ---------- Checks ----------
     
     def _fix_node_properties(self, node: NodeT) -> bool:
         """Fix missing required node properties"""
-        fixed = False
-        node_id = node.get('id', 'unknown')
-        
-        # Check and fix required properties
-        if 'flags' not in node:
-            node['flags'] = {}
-            self._add_error('error', f'node_{node_id}', 
-                          f"Node {node_id} missing 'flags' property - added empty flags", True)
-            fixed = True
-            
-        if 'order' not in node:
-            node['order'] = 0
-            self._add_error('error', f'node_{node_id}', 
-                          f"Node {node_id} missing 'order' property - set to 0", True)
-            fixed = True
-            
-        if 'mode' not in node:
-            node['mode'] = 0
-            self._add_error('error', f'node_{node_id}', 
-                          f"Node {node_id} missing 'mode' property - set to 0", True)
-            fixed = True
-            
-        if 'properties' not in node:
-            node['properties'] = {}
-            # Try to set Node name for S&R if possible
-            if 'type' in node:
-                node['properties']['Node name for S&R'] = node['type']
-            self._add_error('error', f'node_{node_id}', 
-                          f"Node {node_id} missing 'properties' property - added default", True)
-            fixed = True
-            
-        # Fix outputs slot_index
-        if 'outputs' in node:
-            for i, output in enumerate(node['outputs']):
-                if 'slot_index' not in output:
-                    output['slot_index'] = i
-                    self._add_error('error', f'node_{node_id}_output_{i}', 
-                                  f"Node {node_id} output missing 'slot_index' - set to {i}", True)
-                    fixed = True
-                    
-        return fixed
+        return self._run_rules(self._rules_for_node(node.get('type', '')), node, 0)[1]
     
     def _fix_group_properties(self, group: GroupT, index: int) -> bool:
         """Fix group property issues"""
-        fixed = False
-        group_title = group.get('title', f'Group_{index}')
-        
-        # Fix bounding_box -> bounding
-        if 'bounding_box' in group and 'bounding' not in group:
-            group['bounding'] = group['bounding_box']
-            del group['bounding_box']
-            self._add_error('error', f'group_{index}', 
-                          f"Group '{group_title}' uses 'bounding_box' - changed to 'bounding'", True)
-            fixed = True
-        elif 'bounding' not in group:
-            # Add default bounding if missing
-            group['bounding'] = [0, 0, 400, 300]
-            self._add_error('error', f'group_{index}', 
-                          f"Group '{group_title}' missing 'bounding' - added default", True)
-            fixed = True
-            
-        # Validate and fix color
-        color = group.get('color')
-        if color:
-            if color not in self.VALID_COLORS:
-                # Try to infer color from title or set default
-                new_color = '#444444'  # Default to utility color
-                title_lower = group_title.lower()
-                
-                if 'loader' in title_lower or 'model' in title_lower:
-                    new_color = '#355335'
-                elif 'condition' in title_lower or 'prompt' in title_lower:
-                    new_color = '#353553'
-                elif 'sampl' in title_lower:
-                    new_color = '#533535'
-                elif 'latent' in title_lower:
-                    new_color = '#535335'
-                elif 'post' in title_lower or 'process' in title_lower:
-                    new_color = '#453553'
-                elif 'control' in title_lower:
-                    new_color = '#534535'
-                elif 'image' in title_lower or 'input' in title_lower or 'output' in title_lower:
-                    new_color = '#355353'
-                    
-                group['color'] = new_color
-                self._add_error('warning', f'group_{index}', 
-                              f"Group '{group_title}' invalid color '{color}' - changed to '{new_color}'", True)
-                fixed = True
-        
-        return fixed
+        return self._run_rules(self._compile()['group'], group, index)[1]
     
     def _validate_link_structure(self, link: LinkT, index: int) -> bool:
         """Validate link has correct structure"""
-        if len(link) != 6:
-            self._add_error('error', f'link_{index}', 
-                          f"Link {index} has {len(link)} elements instead of 6 - cannot auto-fix", False)
-            return False
-        return True
+        return not self._run_rules(self._compile()['link'], link, index)[0]
     
-    def _check_reroute_connections(self, workflow: WorkflowT) -> None:
-        """Check for disconnected reroute nodes"""
-        # Build connection maps
-        input_connections = {}  # node_id -> list of incoming links
-        output_connections = {}  # node_id -> list of outgoing links
-        
-        for link in workflow.get('links', []):
-            if len(link) >= 4:
-                source_node = link[1]
-                target_node = link[3]
-                
-                if source_node not in output_connections:
-                    output_connections[source_node] = []
-                output_connections[source_node].append(link)
-                
-                if target_node not in input_connections:
-                    input_connections[target_node] = []
-                input_connections[target_node].append(link)
-        
-        # Check reroute nodes
-        for node in workflow.get('nodes', []):
-            if node.get('type') == 'Reroute':
-                node_id = node.get('id')
-                
-                if node_id not in input_connections:
-                    self._add_error('warning', f'reroute_{node_id}', 
-                                  f"Reroute node {node_id} has no input connections", False)
-                    
-                if node_id not in output_connections:
-                    self._add_error('warning', f'reroute_{node_id}', 
-                                  f"Reroute node {node_id} has no output connections", False)
-    
-    def _check_duplicate_ids(self, workflow: WorkflowT) -> bool:
-        """Check for duplicate node IDs"""
-        node_ids = []
-        for node in workflow.get('nodes', []):
-            node_id = node.get('id')
-            if node_id is not None:
-                node_ids.append(node_id)
-                
-        if len(node_ids) != len(set(node_ids)):
-            self._add_error('error', 'workflow', 
-                          "Duplicate node IDs detected - cannot auto-fix", False)
-            return False
-        return True
-    
-    def validate_and_fix(self, scs_data: SCS) -> Dict[str, Any]:
+    def validate_and_fix(self, scs_data: SCS, include_messages: bool = True) -> Dict[str, Any]:
         """
         Main validation and auto-fix function
         
         Args:
             scs_data: Shared Context System data containing workflow
+            include_messages: Render issue messages; when False only counts are
+                reported and the errors / warnings / auto_fixes lists stay empty
             
         Returns:
             Validation results with auto-fixed issues and final JSON
@@ -244,9 +1008,11 @@ class JSONValidator:
         self.errors = []
         self.warnings = []
         self.auto_fixes = []
+        self._issues = []
         
-        # Extract workflow from SCS
-        workflow = scs_data.get('workflow_state', {}).get('current_graph', {})
+        # Extract workflow from SCS (a workflow dict or a parsed WorkflowGraph)
+        current_graph = scs_data.get('workflow_state', {}).get('current_graph', {})
+        workflow = as_workflow(current_graph)
         if not workflow:
             return {
                 'success': False,
@@ -259,58 +1025,81 @@ class JSONValidator:
             }
         
         # Make a deep copy for fixing
-        import copy
         fixed_workflow = copy.deepcopy(workflow)
         
-        # Track statistics
-        total_nodes = len(fixed_workflow.get('nodes', []))
-        total_links = len(fixed_workflow.get('links', []))
-        total_groups = len(fixed_workflow.get('groups', []))
+        # API-format (prompt) workflows are validated directly, without UI conversion
+        from api_format_validator import APIFormatValidator, is_api_format
+        if is_api_format(fixed_workflow):
+            api_validator = APIFormatValidator(disabled_rules=self.disabled_rules)
+            result = api_validator.validate(fixed_workflow, include_messages)
+            self.errors = result['errors']
+            self.warnings = result['warnings']
+            self.auto_fixes = result['auto_fixes']
+            self.validation_summary = result['validation_summary']
+            result['scs_data'] = _replace_graph(scs_data, fixed_workflow)
+            return result
+        
+        nodes = fixed_workflow.get('nodes', [])
+        links = fixed_workflow.get('links', [])
+        groups = fixed_workflow.get('groups', [])
+        compiled = self._compile()
+        
+        # One adjacency index per pass; node fixes never change the topology
+        self._graph_index = GraphIndex(fixed_workflow)
+        self._link_table = self._graph_index.link_ids
         
         # 1. Validate and fix nodes
         nodes_fixed = 0
-        for node in fixed_workflow.get('nodes', []):
-            if self._fix_node_properties(node):
+        dispatch = self._rules_for_node
+        run = self._run_rules
+        for node in nodes:
+            if run(dispatch(node.get('type', '')), node, 0)[1]:
                 nodes_fixed += 1
         
         # 2. Validate and fix groups
         groups_fixed = 0
-        for i, group in enumerate(fixed_workflow.get('groups', [])):
-            if self._fix_group_properties(group, i):
+        group_rules = compiled['group']
+        for i, group in enumerate(groups):
+            if run(group_rules, group, i)[1]:
                 groups_fixed += 1
         
         # 3. Validate links (cannot auto-fix structural issues)
         valid_links = 0
-        for i, link in enumerate(fixed_workflow.get('links', [])):
-            if self._validate_link_structure(link, i):
+        link_rules = compiled['link']
+        for i, link in enumerate(links):
+            if not run(link_rules, link, i)[0]:
                 valid_links += 1
         
-        # 4. Check for disconnected reroutes
-        self._check_reroute_connections(fixed_workflow)
-        
-        # 5. Check for duplicate IDs
-        has_unique_ids = self._check_duplicate_ids(fixed_workflow)
+        # 4. Workflow-level checks (reroutes, duplicate IDs, cycles, unreachable outputs)
+        run(compiled['workflow'], fixed_workflow, 0)
+        self._graph_index = None
+        self._link_table = None
         
         # Determine overall validity
-        is_valid = len(self.errors) == 0
+        errors_count, warnings_count, fixes_count = self._summarize_issues(self._issues)
+        is_valid = errors_count == 0
+        if include_messages:
+            self._render_issues(self._issues)
         
         # Create validation summary
         self.validation_summary = {
-            'total_nodes': total_nodes,
-            'total_links': total_links,
-            'total_groups': total_groups,
-            'errors_count': len(self.errors),
-            'warnings_count': len(self.warnings),
-            'auto_fixes_count': len(self.auto_fixes),
+            'total_nodes': len(nodes),
+            'total_links': len(links),
+            'total_groups': len(groups),
+            'errors_count': errors_count,
+            'warnings_count': warnings_count,
+            'auto_fixes_count': fixes_count,
             'nodes_fixed': nodes_fixed,
             'groups_fixed': groups_fixed,
             'valid_links': valid_links,
             'is_valid': is_valid
         }
         
-        # Update SCS with fixed workflow
-        updated_scs = copy.deepcopy(scs_data)
-        updated_scs['workflow_state']['current_graph'] = fixed_workflow
+        # Update SCS with fixed workflow (kept as a WorkflowGraph if one was passed in)
+        if isinstance(current_graph, WorkflowGraph):
+            updated_scs = _replace_graph(scs_data, WorkflowGraph(fixed_workflow))
+        else:
+            updated_scs = _replace_graph(scs_data, fixed_workflow)
         
         return {
             'success': True,
@@ -323,6 +1112,338 @@ class JSONValidator:
             'scs_data': updated_scs
         }
 
+    # ---------- Incremental validation ----------
+    
+    def _collect(self, rules: Tuple[ValidationRule, ...], target: Any, index: int) -> List[Issue]:
+        """Run rules against one target and return its issues"""
+        saved = self._issues
+        self._issues = []
+        try:
+            self._run_rules(rules, target, index)
+            return self._issues
+        finally:
+            self._issues = saved
+    
+    def _enabled_rule(self, name: str) -> Optional[ValidationRule]:
+        rule = self.rules.get(name)
+        if rule is None or name in self.disabled_rules:
+            return None
+        return rule
+    
+    def _check_node_incremental(self, state: ValidationState, node: NodeT) -> bool:
+        issues = self._collect(self._rules_for_node(node.get('type', '')), node, 0)
+        if issues:
+            state.node_issues.setdefault(node.get('id'), []).extend(issues)
+        return any(rule.fix_applied for rule, _ in issues)
+    
+    def _check_link_incremental(self, state: ValidationState, link: LinkT, index: int) -> None:
+        link_id = link[0] if link else None
+        issues = self._collect(self._compile()['link'], link, index)
+        if issues:
+            state.link_issues.setdefault(link_id, []).extend(issues)
+    
+    def _check_reroute_incremental(self, state: ValidationState, node_id: Any) -> None:
+        state.reroute_issues.pop(node_id, None)
+        rule = self._enabled_rule('reroute_connections')
+        slot = state.node_slots.get(node_id)
+        if rule is None or slot is None:
+            return
+        if state.workflow['nodes'][slot].get('type') != 'Reroute':
+            return
+        issues = []
+        if not state.in_degree.get(node_id):
+            issues.append((rule, (node_id, 'input')))
+        if not state.out_degree.get(node_id):
+            issues.append((rule, (node_id, 'output')))
+        if issues:
+            state.reroute_issues[node_id] = issues
+    
+    def _check_link_refs_incremental(self, state: ValidationState, node_id: Any) -> None:
+        """Re-run the link reference rule for a node after links were added or removed"""
+        rule = self._enabled_rule('missing_input_links')
+        slot = state.node_slots.get(node_id)
+        if rule is None or slot is None:
+            return
+        # reindex_links() replaces the table, so pick up the current one
+        self._link_table = state.link_slots
+        issues = [issue for issue in state.node_issues.get(node_id, ()) if issue[0] is not rule]
+        issues.extend(self._collect((rule,), state.workflow['nodes'][slot], 0))
+        if issues:
+            state.node_issues[node_id] = issues
+        else:
+            state.node_issues.pop(node_id, None)
+    
+    def create_state(self, workflow: GraphT) -> ValidationState:
+        """
+        Fully validate a workflow and return the state used for incremental runs.
+        
+        The workflow is deep-copied and fixed inside the state. Call
+        `validate_incremental(state, {})` to get the report for the initial state.
+        """
+        state = ValidationState(copy.deepcopy(as_workflow(workflow)))
+        wf = state.workflow
+        
+        # Links first, so node rules can look up link references
+        for i, link in enumerate(wf.get('links', [])):
+            state.add_link(link)
+            self._check_link_incremental(state, link, i)
+        state.reindex_links()
+        self._link_table = state.link_slots
+        
+        for node in wf.get('nodes', []):
+            state.add_node_id(node.get('id'))
+            self._check_node_incremental(state, node)
+        state.reindex_nodes()
+        
+        group_rules = self._compile()['group']
+        for i, group in enumerate(wf.get('groups', [])):
+            state.group_issues.append(self._collect(group_rules, group, i))
+        
+        for node in wf.get('nodes', []):
+            if node.get('type') == 'Reroute':
+                self._check_reroute_incremental(state, node.get('id'))
+        
+        state.graph = GraphState(GraphIndex(wf))
+        self._refresh_graph_issues(state)
+        self._link_table = None
+        return state
+    
+    def _refresh_graph_issues(self, state: ValidationState) -> None:
+        """Graph rule issues from the maintained GraphState (no graph traversal)"""
+        rules = [rule for rule in self._compile()['workflow'] if rule.name in GRAPH_RULES]
+        state.graph_issues = state.graph.issues(rules, state.node_slots)
+    
+    def validate_incremental(self, state: ValidationState, diff: Dict[str, Any],
+                             include_messages: bool = True) -> Dict[str, Any]:
+        """
+        Re-validate only the parts of a workflow touched by a diff.
+        
+        Args:
+            state: State from `create_state` (updated in place)
+            diff: Changed entities, all sections optional:
+                {'nodes': {'added': [node], 'changed': [node], 'removed': [node_id]},
+                 'links': {'added': [link], 'changed': [link], 'removed': [link_id]},
+                 'groups': {'added': [group], 'changed': {index: group}, 'removed': [index]}}
+                Changed nodes and links are matched by ID.
+            include_messages: Render issue messages (see `validate_and_fix`)
+            
+        Returns:
+            Same shape as `validate_and_fix` (without 'scs_data'), plus 'state'.
+            'nodes_fixed' and 'groups_fixed' count fixes made by this diff only.
+        """
+        wf = state.workflow
+        nodes = wf.setdefault('nodes', [])
+        links = wf.setdefault('links', [])
+        groups = wf.setdefault('groups', [])
+        node_diff = diff.get('nodes') or {}
+        link_diff = diff.get('links') or {}
+        group_diff = diff.get('groups') or {}
+        
+        # Node IDs whose reroute connectivity and link references must be re-checked
+        touched: Set[Any] = set()
+        self._link_table = state.link_slots
+        nodes_fixed = 0
+        graph = state.graph
+        
+        # 1. Nodes
+        removed_nodes = set(node_diff.get('removed', ()))
+        if removed_nodes:
+            for node in nodes:
+                node_id = node.get('id')
+                if node_id in removed_nodes:
+                    state.remove_node_id(node_id)
+            for node_id in removed_nodes:
+                graph.remove_node(node_id)
+            nodes[:] = [node for node in nodes if node.get('id') not in removed_nodes]
+            for node_id in removed_nodes:
+                state.node_issues.pop(node_id, None)
+                state.reroute_issues.pop(node_id, None)
+            state.reindex_nodes()
+        
+        for node in node_diff.get('changed', ()):
+            node = copy.deepcopy(node)
+            node_id = node.get('id')
+            slot = state.node_slots.get(node_id)
+            if slot is None:
+                nodes.append(node)
+                state.node_slots[node_id] = len(nodes) - 1
+                state.add_node_id(node_id)
+            else:
+                nodes[slot] = node
+            state.node_issues.pop(node_id, None)
+            if self._check_node_incremental(state, node):
+                nodes_fixed += 1
+            # After the fixes, which may set a missing mode
+            graph.update_node(node)
+            touched.add(node_id)
+        
+        for node in node_diff.get('added', ()):
+            node = copy.deepcopy(node)
+            node_id = node.get('id')
+            nodes.append(node)
+            state.node_slots.setdefault(node_id, len(nodes) - 1)
+            state.add_node_id(node_id)
+            if self._check_node_incremental(state, node):
+                nodes_fixed += 1
+            graph.add_node(node)
+            touched.add(node_id)
+        
+        # 2. Links
+        removed_links = set(link_diff.get('removed', ()))
+        if removed_links:
+            for link in links:
+                if link and link[0] in removed_links:
+                    state.remove_link(link)
+                    if len(link) >= 4:
+                        graph.remove_edge(link[1], link[3])
+                        touched.update((link[1], link[3]))
+            links[:] = [link for link in links if not (link and link[0] in removed_links)]
+            for link_id in removed_links:
+                state.link_issues.pop(link_id, None)
+            state.reindex_links()
+        
+        for link in link_diff.get('changed', ()):
+            link = copy.deepcopy(link)
+            link_id = link[0] if link else None
+            slot = state.link_slots.get(link_id)
+            if slot is None:
+                links.append(link)
+                slot = len(links) - 1
+                state.link_slots[link_id] = slot
+            else:
+                old = links[slot]
+                state.remove_link(old)
+                if len(old) >= 4:
+                    graph.remove_edge(old[1], old[3])
+                    touched.update((old[1], old[3]))
+                links[slot] = link
+            state.link_issues.pop(link_id, None)
+            state.add_link(link)
+            if len(link) >= 4:
+                graph.add_edge(link[1], link[3])
+                touched.update((link[1], link[3]))
+            self._check_link_incremental(state, link, slot)
+        
+        for link in link_diff.get('added', ()):
+            link = copy.deepcopy(link)
+            links.append(link)
+            if link:
+                state.link_slots.setdefault(link[0], len(links) - 1)
+            state.add_link(link)
+            if len(link) >= 4:
+                graph.add_edge(link[1], link[3])
+                touched.update((link[1], link[3]))
+            self._check_link_incremental(state, link, len(links) - 1)
+        
+        # 3. Groups (identified by list index)
+        group_rules = self._compile()['group']
+        groups_fixed = 0
+        for index, group in (group_diff.get('changed') or {}).items():
+            index = int(index)
+            groups[index] = copy.deepcopy(group)
+            state.group_issues[index] = self._collect(group_rules, groups[index], index)
+            if any(rule.fix_applied for rule, _ in state.group_issues[index]):
+                groups_fixed += 1
+        
+        removed_groups = sorted({int(i) for i in group_diff.get('removed', ())}, reverse=True)
+        for index in removed_groups:
+            del groups[index]
+            del state.group_issues[index]
+        if removed_groups:
+            for index in range(removed_groups[-1], len(groups)):
+                if state.group_issues[index]:
+                    state.group_issues[index] = [(rule, (index,) + args[1:])
+                                                 for rule, args in state.group_issues[index]]
+        
+        for group in group_diff.get('added', ()):
+            groups.append(copy.deepcopy(group))
+            index = len(groups) - 1
+            state.group_issues.append(self._collect(group_rules, groups[index], index))
+            if any(rule.fix_applied for rule, _ in state.group_issues[index]):
+                groups_fixed += 1
+        
+        # 4. Reroute connectivity and link references for touched nodes only
+        for node_id in touched:
+            self._check_reroute_incremental(state, node_id)
+            if link_diff:
+                self._check_link_refs_incremental(state, node_id)
+        self._link_table = None
+        
+        # 5. Workflow-level issues: duplicates come from the maintained ID counts,
+        #    graph issues from the GraphState updated above and any other
+        #    (custom) workflow rules are global and always re-run
+        self._refresh_graph_issues(state)
+        workflow_issues: List[Issue] = []
+        for rule in self._compile()['workflow']:
+            if rule.name == 'reroute_connections' or rule.name in GRAPH_RULES:
+                continue
+            if rule.name == 'duplicate_ids':
+                if state.duplicate_ids:
+                    workflow_issues.append((rule, ()))
+                continue
+            workflow_issues.extend(self._collect((rule,), wf, 0))
+        
+        issues: List[Issue] = []
+        for node_issues in state.node_issues.values():
+            issues.extend(node_issues)
+        for group_issues in state.group_issues:
+            issues.extend(group_issues)
+        invalid_links = 0
+        for link_issues in state.link_issues.values():
+            issues.extend(link_issues)
+            invalid_links += len(link_issues)
+        for reroute_issues in state.reroute_issues.values():
+            issues.extend(reroute_issues)
+        issues.extend(workflow_issues)
+        issues.extend(state.graph_issues)
+        
+        self._issues = issues
+        errors_count, warnings_count, fixes_count = self._summarize_issues(issues)
+        is_valid = errors_count == 0
+        if include_messages:
+            self._render_issues(issues)
+        else:
+            self.errors = []
+            self.warnings = []
+            self.auto_fixes = []
+        
+        self.validation_summary = {
+            'total_nodes': len(nodes),
+            'total_links': len(links),
+            'total_groups': len(groups),
+            'errors_count': errors_count,
+            'warnings_count': warnings_count,
+            'auto_fixes_count': fixes_count,
+            'nodes_fixed': nodes_fixed,
+            'groups_fixed': groups_fixed,
+            'valid_links': len(links) - invalid_links,
+            'is_valid': is_valid
+        }
+        
+        return {
+            'success': True,
+            'validation_summary': self.validation_summary,
+            'errors': self.errors,
+            'warnings': self.warnings,
+            'auto_fixes': self.auto_fixes,
+            'is_valid': is_valid,
+            'fixed_workflow': wf,
+            'state': state
+        }
+
+
+def _replace_graph(scs_data: SCS, graph: GraphT, graph_key: str = 'current_graph') -> SCS:
+    """Deep copy of scs_data with workflow_state[graph_key] replaced (the old graph is not copied)"""
+    updated_scs = {}
+    for key, value in scs_data.items():
+        if key == 'workflow_state':
+            value = {k: v if k == graph_key else copy.deepcopy(v) for k, v in value.items()}
+            value[graph_key] = graph
+        else:
+            value = copy.deepcopy(value)
+        updated_scs[key] = value
+    return updated_scs
+
 
 def main(scs_data: SCS) -> Dict[str, Any]:
     """
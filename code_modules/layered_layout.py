@@ -0,0 +1,325 @@
+"""
+Layered Layout Module for ComfyUI Workflow Layout
+Version 2.0 - Sugiyama-style layered drawing with crossing minimization
+
+Phases:
+1. Cycle removal - DFS back edges are reversed so the graph is acyclic
+2. Layer assignment - longest path from the sources; sources are then pulled
+   right next to their first consumer to keep edges short
+3. Dummy insertion - edges spanning several layers become chains of dummies
+4. Crossing reduction - alternating barycenter / median sweeps, keeping the
+   ordering with the fewest crossings (counted in O(E log V) per layer pair)
+5. Coordinate assignment - x per layer from the widest node; y per node from
+   its neighbours' centres, made non-overlapping with isotonic regression
+"""
+
+from typing import Dict, List, Tuple, Hashable, Iterable, Optional, Sequence
+
+NodeId = Hashable
+Size = Tuple[float, float]
+
+DEFAULT_SIZE: Size = (200.0, 100.0)
+
+
+def count_crossings(upper_len: int, edges: List[Tuple[int, int]]) -> int:
+    """Crossings between two adjacent layers; edges are (upper position, lower position)"""
+    if len(edges) < 2:
+        return 0
+    edges.sort()
+    size = max(lower for _, lower in edges) + 1
+    tree = [0] * (size + 1)
+    crossings = 0
+    seen = 0
+    for _, lower in edges:
+        # Edges already inserted that end strictly below `lower` cross this one
+        i = lower + 1
+        not_greater = 0
+        while i > 0:
+            not_greater += tree[i]
+            i -= i & -i
+        crossings += seen - not_greater
+        seen += 1
+        i = lower + 1
+        while i <= size:
+            tree[i] += 1
+            i += i & -i
+    return crossings
+
+
+def _isotonic(targets: List[float]) -> List[float]:
+    """Least-squares non-decreasing fit (pool adjacent violators)"""
+    blocks: List[List[float]] = []  # [mean, count]
+    for value in targets:
+        blocks.append([value, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            mean, count = blocks.pop()
+            prev = blocks[-1]
+            total = prev[1] + count
+            prev[0] = (prev[0] * prev[1] + mean * count) / total
+            prev[1] = total
+    result: List[float] = []
+    for mean, count in blocks:
+        result.extend([mean] * count)
+    return result
+
+
+class SugiyamaLayout:
+    """Layered layout of a directed graph; positions are top-left corners relative to (0, 0)"""
+
+    def __init__(self, node_ids: Sequence[NodeId], edges: Iterable[Tuple[NodeId, NodeId]],
+                 sizes: Optional[Dict[NodeId, Size]] = None, layer_gap: float = 150,
+                 node_gap: float = 60, iterations: int = 8, method: str = 'barycenter',
+                 grid: Optional[int] = None):
+        """
+        Args:
+            node_ids: Nodes to place (their order seeds the initial ordering)
+            edges: (source, target) pairs; unknown ids and self-loops are ignored
+            sizes: (width, height) per node (default 200 x 100)
+            layer_gap: Horizontal space between layers
+            node_gap: Vertical space between nodes in a layer
+            iterations: Maximum down+up sweep pairs for crossing reduction
+            method: 'barycenter' or 'median'
+            grid: Snap final coordinates to this grid size
+        """
+        if method not in ('barycenter', 'median'):
+            raise ValueError(f"Unknown crossing reduction method: {method}")
+        self.node_ids = list(node_ids)
+        self.index = {node_id: i for i, node_id in enumerate(self.node_ids)}
+        sizes = sizes or {}
+        self.width = [float(sizes.get(node_id, DEFAULT_SIZE)[0]) for node_id in self.node_ids]
+        self.height = [float(sizes.get(node_id, DEFAULT_SIZE)[1]) for node_id in self.node_ids]
+        self.layer_gap = layer_gap
+        self.node_gap = node_gap
+        self.iterations = iterations
+        self.method = method
+        self.grid = grid
+
+        n = len(self.node_ids)
+        self.succ: List[List[int]] = [[] for _ in range(n)]
+        seen = set()
+        for source, target in edges:
+            u = self.index.get(source)
+            v = self.index.get(target)
+            if u is None or v is None or u == v or (u, v) in seen:
+                continue
+            seen.add((u, v))
+            self.succ[u].append(v)
+
+        self.layers: List[List[int]] = []
+        self.layer_of: List[int] = []
+        self.crossings = 0
+        self.reversed_edges = 0
+
+    # ---------- Phase 1: cycle removal ----------
+
+    def _acyclic_successors(self) -> List[List[int]]:
+        n = len(self.node_ids)
+        state = [0] * n  # 0 new, 1 on stack, 2 done
+        dag: List[List[int]] = [[] for _ in range(n)]
+        for root in range(n):
+            if state[root]:
+                continue
+            state[root] = 1
+            stack = [(root, 0)]
+            while stack:
+                u, i = stack[-1]
+                if i < len(self.succ[u]):
+                    stack[-1] = (u, i + 1)
+                    v = self.succ[u][i]
+                    if state[v] == 1:
+                        # Back edge: reverse it
+                        dag[v].append(u)
+                        self.reversed_edges += 1
+                        continue
+                    dag[u].append(v)
+                    if state[v] == 0:
+                        state[v] = 1
+                        stack.append((v, 0))
+                else:
+                    state[u] = 2
+                    stack.pop()
+        # A reversed edge may duplicate an existing one
+        return [list(dict.fromkeys(targets)) for targets in dag]
+
+    # ---------- Phase 2: layering ----------
+
+    def _assign_layers(self, dag: List[List[int]]) -> List[int]:
+        n = len(dag)
+        in_degree = [0] * n
+        for targets in dag:
+            for v in targets:
+                in_degree[v] += 1
+        layer = [0] * n
+        queue = [u for u in range(n) if in_degree[u] == 0]
+        order = []
+        while queue:
+            u = queue.pop()
+            order.append(u)
+            for v in dag[u]:
+                if layer[u] + 1 > layer[v]:
+                    layer[v] = layer[u] + 1
+                in_degree[v] -= 1
+                if in_degree[v] == 0:
+                    queue.append(v)
+        # Pull sources (loaders, constants) right, next to their first consumer
+        has_input = [False] * n
+        for targets in dag:
+            for v in targets:
+                has_input[v] = True
+        for u in range(n):
+            if not has_input[u] and dag[u]:
+                layer[u] = min(layer[v] for v in dag[u]) - 1
+        return layer
+
+    # ---------- Phase 3: dummies ----------
+
+    def _build_hierarchy(self, dag: List[List[int]], layer: List[int]):
+        n = len(dag)
+        layer_of = list(layer)
+        up: List[List[int]] = [[] for _ in range(n)]
+        down: List[List[int]] = [[] for _ in range(n)]
+        for u in range(n):
+            for v in dag[u]:
+                prev = u
+                for layer_index in range(layer[u] + 1, layer[v]):
+                    dummy = len(layer_of)
+                    layer_of.append(layer_index)
+                    up.append([prev])
+                    down.append([])
+                    down[prev].append(dummy)
+                    prev = dummy
+                down[prev].append(v)
+                up[v].append(prev)
+
+        layer_count = max(layer_of, default=-1) + 1
+        layers: List[List[int]] = [[] for _ in range(layer_count)]
+        for vertex, layer_index in enumerate(layer_of):
+            layers[layer_index].append(vertex)
+        return layers, layer_of, up, down
+
+    # ---------- Phase 4: crossing reduction ----------
+
+    def _total_crossings(self, layers: List[List[int]], down: List[List[int]], position: List[int]) -> int:
+        total = 0
+        for layer_index in range(len(layers) - 1):
+            edges = [(position[u], position[v]) for u in layers[layer_index] for v in down[u]]
+            total += count_crossings(len(layers[layer_index]), edges)
+        return total
+
+    def _sort_layer(self, vertices: List[int], neighbours: List[List[int]], position: List[int]) -> None:
+        keys = {}
+        for u in vertices:
+            adjacent = neighbours[u]
+            if not adjacent:
+                keys[u] = position[u]
+                continue
+            values = sorted(position[v] for v in adjacent)
+            if self.method == 'median':
+                mid = len(values) // 2
+                keys[u] = values[mid] if len(values) % 2 else (values[mid - 1] + values[mid]) / 2
+            else:
+                keys[u] = sum(values) / len(values)
+        vertices.sort(key=lambda u: (keys[u], position[u]))
+        for i, u in enumerate(vertices):
+            position[u] = i
+
+    def _reduce_crossings(self, layers: List[List[int]], up: List[List[int]], down: List[List[int]],
+                          vertex_count: int) -> List[List[int]]:
+        position = [0] * vertex_count
+        for vertices in layers:
+            for i, u in enumerate(vertices):
+                position[u] = i
+
+        best = [list(vertices) for vertices in layers]
+        best_crossings = self._total_crossings(layers, down, position)
+        stale = 0
+        for _ in range(self.iterations):
+            if best_crossings == 0:
+                break
+            for layer_index in range(1, len(layers)):
+                self._sort_layer(layers[layer_index], up, position)
+            for layer_index in range(len(layers) - 2, -1, -1):
+                self._sort_layer(layers[layer_index], down, position)
+            crossings = self._total_crossings(layers, down, position)
+            if crossings < best_crossings:
+                best_crossings = crossings
+                best = [list(vertices) for vertices in layers]
+                stale = 0
+            else:
+                stale += 1
+                if stale >= 2:
+                    break
+        self.crossings = best_crossings
+        return best
+
+    # ---------- Phase 5: coordinates ----------
+
+    def _place_layer(self, vertices: List[int], desired: List[float], heights: List[float]) -> List[float]:
+        # Centres must be at least half-heights plus a gap apart, in layer order
+        offsets = [0.0]
+        for i in range(1, len(vertices)):
+            gap = self.node_gap if heights[vertices[i]] and heights[vertices[i - 1]] else self.node_gap / 2
+            offsets.append(offsets[-1] + (heights[vertices[i - 1]] + heights[vertices[i]]) / 2 + gap)
+        fitted = _isotonic([d - o for d, o in zip(desired, offsets)])
+        return [f + o for f, o in zip(fitted, offsets)]
+
+    def _assign_y(self, layers: List[List[int]], up: List[List[int]], down: List[List[int]],
+                  heights: List[float]) -> List[float]:
+        centre = [0.0] * len(heights)
+        for vertices in layers:
+            placed = self._place_layer(vertices, [0.0] * len(vertices), heights)
+            for u, y in zip(vertices, placed):
+                centre[u] = y
+
+        sweeps = [(range(1, len(layers)), up), (range(len(layers) - 2, -1, -1), down),
+                  (range(1, len(layers)), up)]
+        for layer_range, neighbours in sweeps:
+            for layer_index in layer_range:
+                vertices = layers[layer_index]
+                desired = []
+                for u in vertices:
+                    adjacent = neighbours[u]
+                    desired.append(sum(centre[v] for v in adjacent) / len(adjacent) if adjacent else centre[u])
+                for u, y in zip(vertices, self._place_layer(vertices, desired, heights)):
+                    centre[u] = y
+        return centre
+
+    def run(self) -> Dict[NodeId, Tuple[float, float]]:
+        """Compute positions for all nodes"""
+        n = len(self.node_ids)
+        if n == 0:
+            return {}
+
+        dag = self._acyclic_successors()
+        layer = self._assign_layers(dag)
+        layers, layer_of, up, down = self._build_hierarchy(dag, layer)
+        vertex_count = len(layer_of)
+        layers = self._reduce_crossings(layers, up, down, vertex_count)
+        self.layers = [[u for u in vertices if u < n] for vertices in layers]
+        self.layer_of = layer_of[:n]
+
+        heights = self.height + [0.0] * (vertex_count - n)
+        centre = self._assign_y(layers, up, down, heights)
+
+        layer_x = []
+        x = 0.0
+        for vertices in layers:
+            layer_x.append(x)
+            x += max((self.width[u] for u in vertices if u < n), default=0.0) + self.layer_gap
+
+        top = min(centre[u] - heights[u] / 2 for u in range(n))
+        positions = {}
+        for u in range(n):
+            px = layer_x[layer_of[u]]
+            py = centre[u] - heights[u] / 2 - top
+            if self.grid:
+                px = round(px / self.grid) * self.grid
+                py = round(py / self.grid) * self.grid
+            positions[self.node_ids[u]] = (px, py)
+        return positions
+
+
+def layered_layout(node_ids: Sequence[NodeId], edges: Iterable[Tuple[NodeId, NodeId]],
+                   sizes: Optional[Dict[NodeId, Size]] = None, **options) -> Dict[NodeId, Tuple[float, float]]:
+    """Convenience wrapper around SugiyamaLayout(...).run()"""
+    return SugiyamaLayout(node_ids, edges, sizes, **options).run()
@@ -0,0 +1,357 @@
+"""
+Layout Engine Module for ComfyUI Workflow Layout
+Version 2.0 - One engine, pluggable layout strategies over a shared graph analysis
+
+Strategies:
+    engineering - staged columns by topological level, categories top to bottom
+    layered     - Sugiyama layered layout with crossing minimization
+    zigzag      - execution order in alternating down / up columns
+                  (zigzag-packed / zigzag-ffd: area-minimising or first-fit-decreasing columns)
+    wan21       - WAN2.1 semantic groups (loaders, prompts, sampling, video, output)
+
+Usage:
+    python layout_engine.py input.json -s zigzag -o output.json
+    python layout_engine.py input.json --benchmark
+"""
+
+import argparse
+import copy
+from abc import ABC, abstractmethod
+import math
+import statistics
+import time
+from typing import Dict, List, Any, Optional, Sequence, Union
+
+from graph_analysis import GraphAnalysis, snap_to_grid
+from workflow_graph import WorkflowGraph, parse_pair, DEFAULT_NODE_SIZE
+from workflow_reorganizer import WorkflowReorganizer
+from workflow_serializer import dump, load
+from zigzag_workflow_reorganizer import ZigzagWorkflowReorganizer
+
+WorkflowT = Dict[str, Any]
+
+# WAN2.1 Professional Layout Standards
+WAN21_STANDARDS = {
+    "group_horizontal_spacing": 1800,  # 1800px between major groups
+    "node_vertical_spacing": 280,      # 280px between nodes (>250px requirement)
+    "grid_size": 20,                   # 20px grid snapping
+    "group_padding": 60,               # Padding inside groups
+    "data_bus_spacing": 100,           # Spacing for data bus lanes
+}
+
+# Size assumed for nodes without a usable size
+WAN21_NODE_SIZE = (400, 100)
+
+# Color scheme from COLOR_SCHEME.md
+WAN21_GROUP_COLORS = {
+    "model_loading": "#355335",        # Dark Green - Loaders
+    "lora_stack": "#355335",           # Dark Green - Loaders
+    "prompt_processing": "#353553",    # Dark Blue - Conditioning
+    "generation_control": "#533535",   # Dark Red - Sampling
+    "video_processing": "#533545",     # Dark Pink - Custom Nodes
+    "output": "#355353",               # Dark Teal - Image I/O
+    "utilities": "#444444",            # Dark Gray - Utilities
+}
+
+# Exact node types per WAN2.1 group
+WAN21_NODE_CATEGORIES = {
+    "model_loading": {
+        "UnetLoaderGGUFDisTorchMultiGPU", "VAELoaderMultiGPU", "CLIPLoaderMultiGPU",
+        "CLIPVisionLoader", "LoadImage"
+    },
+    "lora_stack": {
+        "LoraLoaderModelOnly", "ModelSamplingSD3", "PatchModelPatcherOrder",
+        "PathchSageAttentionKJ", "WanVideoTeaCacheKJ"
+    },
+    "prompt_processing": {
+        "CLIPTextEncode", "CLIPVisionEncode"
+    },
+    "generation_control": {
+        "CFGGuider", "KSamplerSelect", "SamplerCustomAdvanced", "RandomNoise",
+        "BasicScheduler", "SplitSigmas", "Seed Everywhere"
+    },
+    "video_processing": {
+        "WanVideoEnhanceAVideoKJ", "WanImageToVideo_F2", "VHS_VideoCombine",
+        "RIFE VFI", "WanSkipEndFrameImages_F2", "VHS_GetImageCount",
+        "ImageFromBatch+", "GetImageRangeFromBatch", "JWImageExtractFromBatch",
+        "ColorMatchImage", "ImageCropByMask", "ImageResizeKJv2"
+    },
+    "output": {
+        "PreviewImage", "VAEDecode"
+    },
+    "utilities": {
+        "Note", "mxSlider", "Fast Groups Bypasser (rgthree)", "easy batchAnything",
+        "easy cleanGpuUsed", "MathExpression|pysssss"
+    }
+}
+
+# Group order: left to right workflow flow
+WAN21_GROUP_ORDER = ["model_loading", "lora_stack", "prompt_processing", "generation_control",
+                     "video_processing", "output", "utilities"]
+
+_WAN21_TYPE_CATEGORY = {node_type: category for category, node_types in WAN21_NODE_CATEGORIES.items()
+                        for node_type in node_types}
+
+
+def wan21_category(node_type: str) -> str:
+    """Categorize a node type into WAN2.1 semantic groups"""
+    return _WAN21_TYPE_CATEGORY.get(node_type, "utilities")
+
+
+class LayoutStrategy(ABC):
+    """Base class: positions the nodes of analysis.workflow and returns the workflow"""
+
+    name = ''
+    description = ''
+
+    @abstractmethod
+    def apply(self, analysis: GraphAnalysis) -> WorkflowT:
+        ...
+
+
+class EngineeringStrategy(LayoutStrategy):
+    name = 'engineering'
+    description = 'Staged columns by topological level, categories top to bottom'
+
+    def apply(self, analysis: GraphAnalysis) -> WorkflowT:
+        return WorkflowReorganizer(analysis.workflow, self.name, analysis=analysis).reorganize()
+
+
+class LayeredStrategy(EngineeringStrategy):
+    name = 'layered'
+    description = 'Sugiyama layered layout with crossing minimization'
+
+
+class ZigzagStrategy(LayoutStrategy):
+    name = 'zigzag'
+    description = 'Execution order in alternating down / up columns'
+    packing = 'greedy'
+
+    def apply(self, analysis: GraphAnalysis) -> WorkflowT:
+        return ZigzagWorkflowReorganizer(analysis.workflow, analysis=analysis, packing=self.packing).reorganize()
+
+
+class PackedZigzagStrategy(ZigzagStrategy):
+    name = 'zigzag-packed'
+    description = 'Zigzag with area-minimising column breaking'
+    packing = 'dp'
+
+
+class FFDZigzagStrategy(ZigzagStrategy):
+    name = 'zigzag-ffd'
+    description = 'Zigzag with first-fit-decreasing columns per dependency level'
+    packing = 'ffd'
+
+
+class Wan21Strategy(LayoutStrategy):
+    name = 'wan21'
+    description = 'WAN2.1 semantic groups with wide horizontal spacing'
+
+    def __init__(self, standards: Optional[Dict[str, int]] = None):
+        self.standards = dict(WAN21_STANDARDS, **(standards or {}))
+
+    def apply(self, analysis: GraphAnalysis) -> WorkflowT:
+        standards = self.standards
+        grid = standards["grid_size"]
+        padding = standards["group_padding"]
+        spacing = standards["node_vertical_spacing"]
+        categories = analysis.categorize(wan21_category)
+
+        workflow_groups = []
+        current_x = 200  # Start with padding from left edge
+        for group_name in WAN21_GROUP_ORDER:
+            nodes = [analysis.nodes[node_id] for node_id in categories.get(group_name, ())]
+            if not nodes:
+                continue
+
+            # Group dimensions
+            max_node_width = max(parse_pair(node.get('size'), WAN21_NODE_SIZE)[0] for node in nodes)
+            group_width = max_node_width + (padding * 2)
+            node_count = len(nodes)
+            group_height = (node_count * spacing) + (padding * 2)
+
+            # Position nodes within group using column-based layout (2 columns max)
+            nodes_per_column = max(1, math.ceil(node_count / 2))
+            current_y = 100
+            for i, node in enumerate(nodes):
+                column = i // nodes_per_column
+                row = i % nodes_per_column
+                node_x = current_x + padding + (column * 450)  # 450px between columns
+                node_y = current_y + padding + (row * spacing)
+                node['pos'] = [snap_to_grid(node_x, grid), snap_to_grid(node_y, grid)]
+
+            workflow_groups.append({
+                "id": len(workflow_groups) + 1,
+                "title": f"({WAN21_GROUP_ORDER.index(group_name) + 1}) {group_name.replace('_', ' ').title()}",
+                "bounding": [current_x, current_y, group_width, group_height],
+                "color": WAN21_GROUP_COLORS.get(group_name, "#444444"),
+                "font_size": 24,
+                "flags": {}
+            })
+            current_x += group_width + standards["group_horizontal_spacing"]
+
+        analysis.workflow["groups"] = workflow_groups
+
+        # Ensure all nodes have required Frontend/UI format properties
+        for node in analysis.nodes.values():
+            if not parse_pair(node.get("size"), WAN21_NODE_SIZE)[2]:
+                node["size"] = list(WAN21_NODE_SIZE)
+            node.setdefault("widgets_values", [])
+            node.setdefault("flags", {})
+            node.setdefault("mode", 0)
+            node.setdefault("properties", {})
+
+        return analysis.finish()
+
+
+STRATEGIES: Dict[str, LayoutStrategy] = {
+    strategy.name: strategy
+    for strategy in (EngineeringStrategy(), LayeredStrategy(), ZigzagStrategy(), PackedZigzagStrategy(),
+                     FFDZigzagStrategy(), Wan21Strategy())
+}
+
+
+def register_strategy(strategy: LayoutStrategy) -> None:
+    """Add (or replace) a layout strategy"""
+    STRATEGIES[strategy.name] = strategy
+
+
+def get_strategy(name: str) -> LayoutStrategy:
+    if name not in STRATEGIES:
+        raise ValueError(f"Unknown layout strategy: {name} (available: {', '.join(STRATEGIES)})")
+    return STRATEGIES[name]
+
+
+class LayoutEngine:
+    """Analyses a workflow once and lays it out with any registered strategy"""
+
+    def __init__(self, workflow_data: Union[WorkflowT, WorkflowGraph]):
+        self.analysis = GraphAnalysis(workflow_data)
+
+    def layout(self, strategy: str = 'engineering') -> WorkflowT:
+        """Apply a strategy in place; connectivity is reused, so strategies can be applied in turn"""
+        return get_strategy(strategy).apply(self.analysis)
+
+
+def layout_metrics(workflow: WorkflowT) -> Dict[str, Any]:
+    """Canvas size, link length, backward links and overlapping node pairs"""
+    boxes = {}
+    for node in workflow.get('nodes', []):
+        x, y, _ = parse_pair(node.get('pos'), (0.0, 0.0))
+        w, h, _ = parse_pair(node.get('size'), DEFAULT_NODE_SIZE)
+        boxes[node.get('id')] = (x, y, x + w, y + h)
+    if not boxes:
+        return {'width': 0, 'height': 0, 'link_length': 0, 'backward_links': 0, 'overlaps': 0}
+
+    link_length = 0.0
+    backward = 0
+    for link in workflow.get('links', []):
+        if len(link) < 4 or link[1] not in boxes or link[3] not in boxes:
+            continue
+        source, target = boxes[link[1]], boxes[link[3]]
+        link_length += abs(target[0] - source[2]) + abs(target[1] - source[1])
+        if target[0] < source[0]:
+            backward += 1
+
+    # Sweep along x; only boxes whose x ranges overlap are compared
+    overlaps = 0
+    active: List[tuple] = []
+    for box in sorted(boxes.values()):
+        active = [other for other in active if other[2] > box[0]]
+        overlaps += sum(1 for other in active if other[1] < box[3] and box[1] < other[3])
+        active.append(box)
+
+    return {
+        'width': round(max(b[2] for b in boxes.values()) - min(b[0] for b in boxes.values())),
+        'height': round(max(b[3] for b in boxes.values()) - min(b[1] for b in boxes.values())),
+        'link_length': round(link_length),
+        'backward_links': backward,
+        'overlaps': overlaps
+    }
+
+
+def benchmark(workflow_data: WorkflowT, strategies: Optional[Sequence[str]] = None,
+              repeat: int = 3) -> List[Dict[str, Any]]:
+    """Time analysis + layout for each strategy on copies of the same input
+
+    A strategy that raises gets a row with its 'error' instead of timings and metrics.
+    """
+    results = []
+    for name in strategies or list(STRATEGIES):
+        strategy = get_strategy(name)
+        analysis_times = []
+        layout_times = []
+        output = None
+        try:
+            for _ in range(max(1, repeat)):
+                workflow = copy.deepcopy(workflow_data)
+                start = time.perf_counter()
+                analysis = GraphAnalysis(workflow)
+                analysed = time.perf_counter()
+                output = strategy.apply(analysis)
+                done = time.perf_counter()
+                analysis_times.append((analysed - start) * 1000)
+                layout_times.append((done - analysed) * 1000)
+        except Exception as e:
+            results.append({'strategy': name, 'nodes': len(workflow_data.get('nodes', [])),
+                            'error': f"{type(e).__name__}: {e}"})
+            continue
+        row = {
+            'strategy': name,
+            'nodes': len(workflow_data.get('nodes', [])),
+            'analysis_ms': round(statistics.median(analysis_times), 3),
+            'layout_ms': round(statistics.median(layout_times), 3),
+            'best_ms': round(min(a + l for a, l in zip(analysis_times, layout_times)), 3)
+        }
+        row.update(layout_metrics(output))
+        results.append(row)
+    return results
+
+
+def format_benchmark(rows: List[Dict[str, Any]]) -> str:
+    """Benchmark rows as a plain-text table"""
+    columns = ['strategy', 'nodes', 'analysis_ms', 'layout_ms', 'best_ms', 'width', 'height',
+               'link_length', 'backward_links', 'overlaps']
+    timed = [row for row in rows if 'error' not in row]
+    widths = [max([len(column)] + [len(str(row[column])) for row in timed]) for column in columns]
+    lines = ['  '.join(column.rjust(width) for column, width in zip(columns, widths))]
+    lines.append('-' * len(lines[0]))
+    for row in rows:
+        if 'error' in row:
+            lines.append('  '.join([row['strategy'].rjust(widths[0]), str(row['nodes']).rjust(widths[1]),
+                                    f"failed: {row['error']}"]))
+            continue
+        lines.append('  '.join(str(row[column]).rjust(width) for column, width in zip(columns, widths)))
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Lay out a ComfyUI workflow with a chosen strategy')
+    parser.add_argument('input', nargs='?', help='Workflow JSON file')
+    parser.add_argument('-o', '--output', help='Output file (default: print metrics only)')
+    parser.add_argument('-s', '--strategy', help='Layout strategy (default: engineering)')
+    parser.add_argument('--benchmark', action='store_true', help='Compare all (or the given -s) strategies')
+    parser.add_argument('--repeat', type=int, default=3, help='Benchmark repetitions')
+    parser.add_argument('--list', action='store_true', help='List strategies')
+    args = parser.parse_args(argv)
+
+    if args.list or not args.input:
+        for strategy in STRATEGIES.values():
+            print(f"{strategy.name:<14} {strategy.description}")
+        return 0
+
+    workflow = load(args.input)
+    if args.benchmark:
+        strategies = [args.strategy] if args.strategy else None
+        print(format_benchmark(benchmark(workflow, strategies, args.repeat)))
+        return 0
+
+    result = LayoutEngine(workflow).layout(args.strategy or 'engineering')
+    if args.output:
+        dump(result, args.output)
+    print(layout_metrics(result))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,47 @@
+"""
+Node Patterns Module for ComfyUI Workflow Layout
+Version 2.0 - Compiled node-type matchers shared by the reorganizers
+
+Classification tables are ordered (substring -> value) rules where the first
+matching rule wins. Each rule is compiled to one regex and results are cached
+per distinct node type, so classifying a workflow is linear in its node count.
+"""
+
+import re
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+Rule = Tuple[Sequence[str], Any]
+
+
+class TypePatternMatcher:
+    """Maps a node type to the value of the first rule that has a matching substring"""
+
+    def __init__(self, rules: Sequence[Rule], default: Any = None, max_cache: int = 4096):
+        self._rules = [(re.compile('|'.join(re.escape(s) for s in substrings)), value)
+                       for substrings, value in rules]
+        self.default = default
+        self.max_cache = max_cache
+        self._cache: Dict[str, Any] = {}
+
+    def match(self, node_type: Optional[str]) -> Any:
+        node_type = node_type or ''
+        try:
+            return self._cache[node_type]
+        except KeyError:
+            pass
+        value = self.default
+        for pattern, rule_value in self._rules:
+            if pattern.search(node_type):
+                value = rule_value
+                break
+        if len(self._cache) >= self.max_cache:
+            self._cache.clear()
+        self._cache[node_type] = value
+        return value
+
+    __call__ = match
+
+
+def height_matcher(type_heights: Dict[str, int]) -> TypePatternMatcher:
+    """Matcher for a {type substring: height} table (first entry wins, None if no match)"""
+    return TypePatternMatcher([((type_name,), height) for type_name, height in type_heights.items()])
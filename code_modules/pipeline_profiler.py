@@ -0,0 +1,266 @@
+"""
+Pipeline Profiler Module for ComfyUI Workflow Layout
+Version 2.0 - Per-stage wall time, CPU time, allocations and graph size
+
+Usage:
+    profiler = PipelineProfiler()
+    with profiler.instrument():
+        pipeline_runner.main(scs_data)
+    print(profiler.summary_table())
+    profiler.write_chrome_trace('trace.json')   # open in chrome://tracing or Perfetto
+
+instrument() temporarily wraps the stage entry points listed in
+INSTRUMENTED_METHODS; span() can time any other block.
+"""
+
+import functools
+import importlib
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Iterator, Optional, Tuple
+
+from workflow_graph import WorkflowGraph
+from workflow_serializer import load
+
+SCS = Dict[str, Any]
+
+# (module, class, method) wrapped by PipelineProfiler.instrument()
+INSTRUMENTED_METHODS: Tuple[Tuple[str, str, str], ...] = (
+    ('collision_detection', 'AABBCollisionDetector', 'resolve_collisions'),
+    ('data_bus_router', 'DataBusRouter', 'route_connections'),
+    ('json_validator', 'JSONValidator', 'validate_and_fix'),
+    ('workflow_reorganizer', 'WorkflowReorganizer', 'reorganize'),
+    ('zigzag_workflow_reorganizer', 'ZigzagWorkflowReorganizer', 'reorganize'),
+)
+
+
+def graph_size(graph: Any) -> Tuple[int, int]:
+    """(node count, link count) of a workflow dict or WorkflowGraph"""
+    if isinstance(graph, WorkflowGraph):
+        return len(graph), len(graph.links)
+    if isinstance(graph, dict):
+        if 'nodes' in graph:
+            return len(graph.get('nodes') or ()), len(graph.get('links') or ())
+        # API format: every node is a top-level key
+        return len(graph), 0
+    return 0, 0
+
+
+def _call_graph(instance: Any, args: Tuple[Any, ...]) -> Any:
+    # Stage methods take the SCS as first argument; reorganizers hold the workflow
+    if args and isinstance(args[0], dict):
+        return args[0].get('workflow_state', {}).get('current_graph')
+    return getattr(instance, 'graph', None) or getattr(instance, 'workflow', None)
+
+
+class ProfileRecord:
+    """One timed call"""
+
+    __slots__ = ('name', 'start_us', 'wall_ms', 'cpu_ms', 'alloc_bytes', 'peak_bytes',
+                 'nodes', 'links', 'thread_id', 'depth')
+
+    def __init__(self, name: str, start_us: float, thread_id: int, depth: int):
+        self.name = name
+        self.start_us = start_us
+        self.wall_ms = 0.0
+        self.cpu_ms = 0.0
+        self.alloc_bytes = 0
+        self.peak_bytes = 0
+        self.nodes = 0
+        self.links = 0
+        self.thread_id = thread_id
+        self.depth = depth
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class PipelineProfiler:
+    """Collects ProfileRecords for the code_modules stages"""
+
+    def __init__(self, trace_memory: bool = True):
+        """
+        Args:
+            trace_memory: Measure allocations with tracemalloc (slows the profiled code down)
+        """
+        self.trace_memory = trace_memory
+        self.records: List[ProfileRecord] = []
+        self._origin = time.perf_counter()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    # ---------- Spans ----------
+
+    @contextmanager
+    def span(self, name: str, graph: Any = None) -> Iterator[ProfileRecord]:
+        """Time the enclosed block; graph (dict or WorkflowGraph) is sized on entry"""
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        record = ProfileRecord(name, (time.perf_counter() - self._origin) * 1e6,
+                               threading.get_ident(), len(stack))
+        record.nodes, record.links = graph_size(graph)
+
+        memory = self.trace_memory and tracemalloc.is_tracing()
+        mem_before = 0
+        if memory:
+            mem_before, peak = tracemalloc.get_traced_memory()
+            if stack:
+                # Keep the parent's peak so far; reset_peak() below discards it
+                parent, parent_before = stack[-1]
+                parent.peak_bytes = max(parent.peak_bytes, peak - parent_before)
+            tracemalloc.reset_peak()
+        stack.append((record, mem_before))
+        cpu_start = time.thread_time()
+        wall_start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record.wall_ms = (time.perf_counter() - wall_start) * 1000
+            record.cpu_ms = (time.thread_time() - cpu_start) * 1000
+            stack.pop()
+            if memory:
+                mem_after, peak = tracemalloc.get_traced_memory()
+                record.alloc_bytes = mem_after - mem_before
+                # Nested spans reset the peak, so they report theirs up to the parent
+                record.peak_bytes = max(record.peak_bytes, peak - mem_before)
+                if stack:
+                    parent, parent_before = stack[-1]
+                    parent.peak_bytes = max(parent.peak_bytes, peak - parent_before)
+            with self._lock:
+                self.records.append(record)
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """Return func instrumented as span `name` (method or plain function)"""
+        profiler = self
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            instance, call_args = (args[0], args[1:]) if args else (None, ())
+            with profiler.span(name, _call_graph(instance, call_args)):
+                return func(*args, **kwargs)
+
+        wrapper.__wrapped_by_profiler__ = True
+        return wrapper
+
+    @contextmanager
+    def instrument(self, methods: Optional[Tuple[Tuple[str, str, str], ...]] = None) -> Iterator['PipelineProfiler']:
+        """Wrap the stage entry points for the duration of the block"""
+        patched = []
+        started_tracing = False
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            started_tracing = True
+        try:
+            for module_name, class_name, method_name in methods or INSTRUMENTED_METHODS:
+                cls = getattr(importlib.import_module(module_name), class_name)
+                original = cls.__dict__[method_name]
+                if getattr(original, '__wrapped_by_profiler__', False):
+                    continue
+                setattr(cls, method_name, self.wrap(f'{class_name}.{method_name}', original))
+                patched.append((cls, method_name, original))
+            yield self
+        finally:
+            for cls, method_name, original in reversed(patched):
+                setattr(cls, method_name, original)
+            if started_tracing:
+                tracemalloc.stop()
+
+    # ---------- Export ----------
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Records as Chrome trace-event JSON (complete 'X' events, microseconds)"""
+        pid = os.getpid()
+        events = []
+        for record in sorted(self.records, key=lambda r: r.start_us):
+            events.append({
+                'name': record.name,
+                'cat': 'pipeline',
+                'ph': 'X',
+                'ts': round(record.start_us, 3),
+                'dur': round(record.wall_ms * 1000, 3),
+                'pid': pid,
+                'tid': record.thread_id,
+                'args': {
+                    'cpu_ms': round(record.cpu_ms, 3),
+                    'alloc_bytes': record.alloc_bytes,
+                    'peak_bytes': record.peak_bytes,
+                    'nodes': record.nodes,
+                    'links': record.links
+                }
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """Per-name totals, slowest first"""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for record in self.records:
+            entry = totals.setdefault(record.name, {
+                'name': record.name, 'calls': 0, 'wall_ms': 0.0, 'cpu_ms': 0.0,
+                'alloc_bytes': 0, 'peak_bytes': 0, 'max_nodes': 0, 'max_links': 0
+            })
+            entry['calls'] += 1
+            entry['wall_ms'] += record.wall_ms
+            entry['cpu_ms'] += record.cpu_ms
+            entry['alloc_bytes'] += record.alloc_bytes
+            entry['peak_bytes'] = max(entry['peak_bytes'], record.peak_bytes)
+            entry['max_nodes'] = max(entry['max_nodes'], record.nodes)
+            entry['max_links'] = max(entry['max_links'], record.links)
+        for entry in totals.values():
+            entry['mean_ms'] = entry['wall_ms'] / entry['calls']
+        return sorted(totals.values(), key=lambda e: e['wall_ms'], reverse=True)
+
+    def summary_table(self) -> str:
+        """Plain-text summary table"""
+        rows = self.summary()
+        grand_total = sum(r.wall_ms for r in self.records if r.depth == 0) or 1.0
+        lines = [f"{'stage':<42} {'calls':>5} {'wall ms':>10} {'mean ms':>10} {'cpu ms':>10} "
+                 f"{'%':>6} {'alloc KiB':>10} {'peak KiB':>10} {'nodes':>7} {'links':>7}"]
+        lines.append('-' * len(lines[0]))
+        for row in rows:
+            lines.append(
+                f"{row['name']:<42} {row['calls']:>5} {row['wall_ms']:>10.1f} {row['mean_ms']:>10.1f} "
+                f"{row['cpu_ms']:>10.1f} {100 * row['wall_ms'] / grand_total:>6.1f} "
+                f"{row['alloc_bytes'] / 1024:>10.1f} {row['peak_bytes'] / 1024:>10.1f} "
+                f"{row['max_nodes']:>7} {row['max_links']:>7}")
+        return '\n'.join(lines)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.records = []
+        self._origin = time.perf_counter()
+
+
+def profile_pipeline(scs_data: SCS, stages: Optional[List[str]] = None,
+                     trace_memory: bool = True) -> Tuple[Dict[str, Any], PipelineProfiler]:
+    """Run pipeline_runner with instrumentation; returns (pipeline result, profiler)"""
+    import pipeline_runner
+
+    profiler = PipelineProfiler(trace_memory=trace_memory)
+    with profiler.instrument():
+        runner = pipeline_runner.PipelineRunner(stages, profiler=profiler)
+        result = runner.run(scs_data)
+    return result, profiler
+
+
+# If run directly, profile the pipeline on a workflow file
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) >= 2:
+        data = load(sys.argv[1])
+        if 'workflow_state' not in data:
+            data = {'workflow_state': {'current_graph': data}, 'layout_parameters': {}}
+        _, pipeline_profiler = profile_pipeline(data)
+        print(pipeline_profiler.summary_table())
+        if len(sys.argv) >= 3:
+            pipeline_profiler.write_chrome_trace(sys.argv[2])
+    else:
+        print("Usage: python pipeline_profiler.py <input.json> [trace.json]")
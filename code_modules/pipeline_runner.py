@@ -0,0 +1,159 @@
+"""
+Pipeline Runner Module for ComfyUI Workflow Layout
+Version 2.0 - Runs the code_modules MCP stages in one process on one shared SCS
+
+Each stage's main(scs_data) is called directly, so the SCS is never serialized
+between stages. The workflow graph is parsed once into a WorkflowGraph that all
+stages share, and converted back to a plain workflow dict when the run ends.
+"""
+
+import time
+from typing import Dict, List, Any, Callable, Optional, Sequence
+
+import collision_detection
+import data_bus_router
+import json_validator
+from api_format_validator import is_api_format
+from workflow_graph import WorkflowGraph
+from workflow_serializer import dump, load
+
+SCS = Dict[str, Any]
+StageFn = Callable[[SCS], Dict[str, Any]]
+
+# Stage name -> MCP entry point
+STAGES: Dict[str, StageFn] = {
+    'data_bus_router': data_bus_router.main,
+    'collision_detection': collision_detection.main,
+    'json_validator': json_validator.main,
+}
+
+# Reroute-Engineer -> Layout-Refiner -> Workflow-Serializer
+DEFAULT_STAGES = ('data_bus_router', 'collision_detection', 'json_validator')
+
+
+def register_stage(name: str, entry_point: StageFn) -> None:
+    """Register an additional main(scs_data)-style stage"""
+    STAGES[name] = entry_point
+
+
+class PipelineRunner:
+    """Executes a configurable sequence of stages on a single in-memory SCS"""
+
+    def __init__(self, stages: Optional[Sequence[str]] = None, stop_on_failure: bool = True,
+                 profiler: Any = None):
+        """
+        Args:
+            stages: Stage names to run in order (default: DEFAULT_STAGES)
+            stop_on_failure: Skip remaining stages after a stage reports success=False
+            profiler: Optional pipeline_profiler.PipelineProfiler; each stage is recorded as a span
+        """
+        self.stages = list(stages or DEFAULT_STAGES)
+        unknown = [name for name in self.stages if name not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown pipeline stage(s): {', '.join(unknown)}")
+        self.stop_on_failure = stop_on_failure
+        self.profiler = profiler
+
+    def run(self, scs_data: SCS) -> Dict[str, Any]:
+        """
+        Run all stages on scs_data (mutated and replaced in place as the stages do).
+
+        Returns:
+            Per-stage results (without their scs_data copy), timings in ms and the final SCS
+        """
+        started = time.perf_counter()
+        workflow_state = scs_data.setdefault('workflow_state', {})
+        current_graph = workflow_state.get('current_graph', {})
+        if isinstance(current_graph, dict) and not is_api_format(current_graph):
+            # Parse once; every stage accepts the shared graph directly
+            workflow_state['current_graph'] = WorkflowGraph(current_graph)
+        parse_ms = (time.perf_counter() - started) * 1000
+
+        stage_results: List[Dict[str, Any]] = []
+        timings: Dict[str, float] = {'parse': round(parse_ms, 3)}
+        success = True
+        for name in self.stages:
+            stage_start = time.perf_counter()
+            try:
+                if self.profiler is not None:
+                    with self.profiler.span(name, scs_data.get('workflow_state', {}).get('current_graph')):
+                        result = STAGES[name](scs_data)
+                else:
+                    result = STAGES[name](scs_data)
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            elapsed_ms = (time.perf_counter() - stage_start) * 1000
+
+            scs_data = result.pop('scs_data', None) or scs_data
+            stage_ok = bool(result.get('success', False))
+            stage_results.append({
+                'stage': name,
+                'success': stage_ok,
+                'elapsed_ms': round(elapsed_ms, 3),
+                'result': result
+            })
+            timings[name] = round(elapsed_ms, 3)
+            if not stage_ok:
+                success = False
+                if self.stop_on_failure:
+                    break
+
+        # Hand back a plain workflow dict
+        workflow_state = scs_data.get('workflow_state', {})
+        graph = workflow_state.get('current_graph')
+        if isinstance(graph, WorkflowGraph):
+            workflow_state['current_graph'] = graph.to_json()
+
+        total_ms = (time.perf_counter() - started) * 1000
+        timings['total'] = round(total_ms, 3)
+        return {
+            'success': success,
+            'stages': stage_results,
+            'timings_ms': timings,
+            'scs_data': scs_data
+        }
+
+
+def main(scs_data: SCS, stages: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """
+    Entry point for MCP code execution.
+    Stages default to scs_data['pipeline_stages'] when present, else DEFAULT_STAGES.
+    """
+    try:
+        runner = PipelineRunner(stages or scs_data.get('pipeline_stages'))
+        return runner.run(scs_data)
+
+    except Exception as e:
+        # On failure, still return a consistent shape
+        return {
+            'success': False,
+            'error': str(e),
+            'stages': [],
+            'timings_ms': {},
+            'scs_data': scs_data
+        }
+
+
+def run_pipeline_file(input_path: str, output_path: str, stages: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    """Load an SCS (or bare workflow) JSON file, run the pipeline and save the SCS"""
+    data = load(input_path)
+    if 'workflow_state' not in data:
+        data = {'workflow_state': {'current_graph': data}, 'layout_parameters': {}}
+
+    result = main(data, stages)
+
+    dump(result['scs_data'], output_path)
+
+    return result
+
+
+# If run directly, process the file and print stage timings
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) >= 3:
+        outcome = run_pipeline_file(sys.argv[1], sys.argv[2], sys.argv[3:] or None)
+        for stage in outcome['stages']:
+            print(f"{stage['stage']:<22} {'ok' if stage['success'] else 'FAILED':<7} {stage['elapsed_ms']:>10.1f} ms")
+        print(f"{'total':<30} {outcome['timings_ms'].get('total', 0):>10.1f} ms")
+    else:
+        print("Usage: python pipeline_runner.py <input.json> <output.json> [stage ...]")
@@ -0,0 +1,76 @@
+"""
+Spatial Index Module for ComfyUI Workflow Layout
+Version 2.0 - Uniform-grid spatial hash for rectangle and point queries
+
+Rectangles are (x1, y1, x2, y2). Each one is registered in every grid cell it
+touches, so a query only looks at items in the cells it covers instead of
+scanning everything.
+"""
+
+import math
+from typing import Dict, Hashable, Iterator, List, Set, Tuple
+
+Bounds = Tuple[float, float, float, float]
+
+
+class GridIndex:
+    """Uniform grid over the canvas; cell_size should be near the typical item size"""
+
+    def __init__(self, cell_size: float = 400.0):
+        self.cell_size = float(cell_size)
+        self._cells: Dict[Tuple[int, int], List[Hashable]] = {}
+        self._bounds: Dict[Hashable, Bounds] = {}
+
+    def _cell_range(self, bounds: Bounds) -> Iterator[Tuple[int, int]]:
+        size = self.cell_size
+        x1, y1, x2, y2 = bounds
+        for cx in range(math.floor(x1 / size), math.floor(x2 / size) + 1):
+            for cy in range(math.floor(y1 / size), math.floor(y2 / size) + 1):
+                yield cx, cy
+
+    def __len__(self) -> int:
+        return len(self._bounds)
+
+    def insert(self, key: Hashable, bounds: Bounds) -> None:
+        if key in self._bounds:
+            self.remove(key)
+        self._bounds[key] = bounds
+        for cell in self._cell_range(bounds):
+            self._cells.setdefault(cell, []).append(key)
+
+    def remove(self, key: Hashable) -> None:
+        bounds = self._bounds.pop(key, None)
+        if bounds is None:
+            return
+        for cell in self._cell_range(bounds):
+            items = self._cells.get(cell)
+            if items is not None:
+                items.remove(key)
+                if not items:
+                    del self._cells[cell]
+
+    def bounds(self, key: Hashable) -> Bounds:
+        return self._bounds[key]
+
+    def query(self, bounds: Bounds) -> Set[Hashable]:
+        """Keys whose rectangles intersect bounds (touching edges do not count)"""
+        x1, y1, x2, y2 = bounds
+        found = set()
+        for cell in self._cell_range(bounds):
+            for key in self._cells.get(cell, ()):
+                if key in found:
+                    continue
+                bx1, by1, bx2, by2 = self._bounds[key]
+                if bx1 < x2 and x1 < bx2 and by1 < y2 and y1 < by2:
+                    found.add(key)
+        return found
+
+    def query_point(self, x: float, y: float) -> Set[Hashable]:
+        """Keys whose rectangles contain the point (edges inclusive)"""
+        size = self.cell_size
+        found = set()
+        for key in self._cells.get((math.floor(x / size), math.floor(y / size)), ()):
+            bx1, by1, bx2, by2 = self._bounds[key]
+            if bx1 <= x <= bx2 and by1 <= y <= by2:
+                found.add(key)
+        return found
@@ -0,0 +1,317 @@
+"""
+Workflow Graph Module for ComfyUI Workflow Layout
+Version 2.0 - Compact in-memory workflow graph shared by the code_modules stages
+
+The graph is parsed once per pipeline: node records use __slots__, positions
+and sizes live in flat arrays, and in/out adjacency is prebuilt. The original
+workflow dict is kept (not copied), so untouched data round-trips unchanged
+and only geometry that a stage actually moved is written back by `to_json()`.
+"""
+
+from array import array
+from typing import Dict, List, Any, Tuple, Optional, Union, Iterable, Iterator, Set
+
+NodeT = Dict[str, Any]
+LinkT = List[Any]  # [id, from_node, from_slot, to_node, to_slot, type]
+WorkflowT = Dict[str, Any]
+
+DEFAULT_NODE_SIZE = (200.0, 100.0)
+
+
+def parse_pair(value: Any, default: Tuple[float, float]) -> Tuple[float, float, bool]:
+    """Parse a [a, b] or {"0": a, "1": b} pair; returns (a, b, present)"""
+    if isinstance(value, (list, tuple)) and len(value) >= 2:
+        return float(value[0]), float(value[1]), True
+    if isinstance(value, dict):
+        # Some exports store as {"0": w, "1": h}
+        a = value.get("0", value.get(0, default[0]))
+        b = value.get("1", value.get(1, default[1]))
+        return float(a), float(b), True
+    return default[0], default[1], False
+
+
+def _num(value: float) -> Union[int, float]:
+    # Keep grid-snapped coordinates as ints in the written JSON
+    return int(value) if value.is_integer() else value
+
+
+class NodeRecord:
+    """One node: identity, type, the original dict and prebuilt adjacency (array indices)"""
+
+    __slots__ = ('index', 'id', 'key', 'type', 'data', 'has_pos', 'has_size',
+                 'in_nodes', 'out_nodes', 'in_links', 'out_links')
+
+    def __init__(self, index: int, node_id: Any, node: NodeT):
+        self.index = index
+        self.id = node_id
+        self.key = str(node_id)
+        self.type: str = node.get('type', '')
+        self.data = node
+        self.has_pos = False
+        self.has_size = False
+        self.in_nodes: List[int] = []
+        self.out_nodes: List[int] = []
+        self.in_links: List[int] = []
+        self.out_links: List[int] = []
+
+
+class WorkflowGraph:
+    """Typed, array-backed view of a ComfyUI UI-format workflow"""
+
+    def __init__(self, workflow: WorkflowT):
+        self.workflow = workflow
+        self.records: List[NodeRecord] = []
+        self.by_id: Dict[Any, NodeRecord] = {}
+        self.by_key: Dict[str, NodeRecord] = {}
+        self.x = array('d')
+        self.y = array('d')
+        self.w = array('d')
+        self.h = array('d')
+        self._pos_dirty: Set[int] = set()
+        self._size_dirty: Set[int] = set()
+
+        nodes = workflow.get('nodes', [])
+        if isinstance(nodes, dict):
+            for key, node in nodes.items():
+                self._append(key, node)
+        else:
+            for i, node in enumerate(nodes):
+                self._append(node.get('id', i), node)
+        self._build_adjacency()
+
+    @classmethod
+    def from_json(cls, workflow: WorkflowT) -> 'WorkflowGraph':
+        return cls(workflow)
+
+    @classmethod
+    def ensure(cls, graph: Union['WorkflowGraph', WorkflowT]) -> 'WorkflowGraph':
+        """Return `graph` unchanged if it already is a WorkflowGraph, else parse it"""
+        return graph if isinstance(graph, WorkflowGraph) else cls(graph)
+
+    # ---------- Construction ----------
+
+    def _append(self, node_id: Any, node: NodeT) -> NodeRecord:
+        record = NodeRecord(len(self.records), node_id, node)
+        x, y, record.has_pos = parse_pair(node.get('pos'), (0.0, 0.0))
+        w, h, record.has_size = parse_pair(node.get('size'), DEFAULT_NODE_SIZE)
+        self.x.append(x)
+        self.y.append(y)
+        self.w.append(w)
+        self.h.append(h)
+        self.records.append(record)
+        self.by_id.setdefault(node_id, record)
+        self.by_key.setdefault(record.key, record)
+        return record
+
+    def _build_adjacency(self) -> None:
+        for record in self.records:
+            record.in_nodes = []
+            record.out_nodes = []
+            record.in_links = []
+            record.out_links = []
+        for link_index, link in enumerate(self.links):
+            self._index_link(link_index, link)
+        for record in self.records:
+            record.in_nodes = list(dict.fromkeys(record.in_nodes))
+            record.out_nodes = list(dict.fromkeys(record.out_nodes))
+
+    def _index_link(self, link_index: int, link: LinkT) -> None:
+        if len(link) < 4:
+            return
+        source = self.node(link[1])
+        target = self.node(link[3])
+        if source is None or target is None:
+            return
+        source.out_links.append(link_index)
+        target.in_links.append(link_index)
+        source.out_nodes.append(target.index)
+        target.in_nodes.append(source.index)
+
+    # ---------- Access ----------
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __iter__(self) -> Iterator[NodeRecord]:
+        return iter(self.records)
+
+    @property
+    def links(self) -> List[LinkT]:
+        return self.workflow.get('links', [])
+
+    @property
+    def groups(self) -> List[Dict[str, Any]]:
+        return self.workflow.get('groups', [])
+
+    def node(self, node_id: Any) -> Optional[NodeRecord]:
+        """Look a node up by its id (or its string form, as used in link chains)"""
+        record = self.by_id.get(node_id)
+        if record is None:
+            record = self.by_key.get(str(node_id))
+        return record
+
+    def successors(self, index: int) -> List[int]:
+        return self.records[index].out_nodes
+
+    def predecessors(self, index: int) -> List[int]:
+        return self.records[index].in_nodes
+
+    def pos(self, index: int) -> Tuple[float, float]:
+        return self.x[index], self.y[index]
+
+    def size(self, index: int) -> Tuple[float, float]:
+        return self.w[index], self.h[index]
+
+    def bounds(self, index: int) -> Tuple[float, float, float, float]:
+        x, y = self.x[index], self.y[index]
+        return x, y, x + self.w[index], y + self.h[index]
+
+    # ---------- Mutation ----------
+
+    def set_pos(self, index: int, x: float, y: float) -> None:
+        self.x[index] = x
+        self.y[index] = y
+        self._pos_dirty.add(index)
+
+    def move(self, index: int, dx: float, dy: float) -> None:
+        self.x[index] += dx
+        self.y[index] += dy
+        self._pos_dirty.add(index)
+
+    def set_size(self, index: int, w: float, h: float) -> None:
+        self.w[index] = w
+        self.h[index] = h
+        self._size_dirty.add(index)
+
+    def add_node(self, node: NodeT) -> NodeRecord:
+        """Append a node to the workflow (and the graph)"""
+        nodes = self.workflow.setdefault('nodes', [])
+        node_id = node.get('id', len(self.records))
+        if isinstance(nodes, dict):
+            nodes[node_id] = node
+        else:
+            nodes.append(node)
+        return self._append(node_id, node)
+
+    def set_links(self, links: List[LinkT]) -> None:
+        """Replace the workflow's links and rebuild adjacency"""
+        self.workflow['links'] = links
+        self._build_adjacency()
+
+    def reload_geometry(self) -> None:
+        """Re-read positions and sizes after a stage edited the node dicts directly"""
+        for record in self.records:
+            i = record.index
+            self.x[i], self.y[i], record.has_pos = parse_pair(record.data.get('pos'), (0.0, 0.0))
+            self.w[i], self.h[i], record.has_size = parse_pair(record.data.get('size'), DEFAULT_NODE_SIZE)
+        self._pos_dirty.clear()
+        self._size_dirty.clear()
+
+    # ---------- Serialization ----------
+
+    def sync(self) -> None:
+        """Write changed geometry back into the node dicts"""
+        for i in self._pos_dirty:
+            record = self.records[i]
+            record.data['pos'] = [_num(self.x[i]), _num(self.y[i])]
+            record.has_pos = True
+        for i in self._size_dirty:
+            record = self.records[i]
+            record.data['size'] = [_num(self.w[i]), _num(self.h[i])]
+            record.has_size = True
+        self._pos_dirty.clear()
+        self._size_dirty.clear()
+
+    def to_json(self) -> WorkflowT:
+        """Return the ComfyUI workflow dict with all geometry changes applied"""
+        self.sync()
+        return self.workflow
+
+
+def as_workflow(graph: Union[WorkflowGraph, WorkflowT]) -> WorkflowT:
+    """Plain workflow dict for either a WorkflowGraph or a workflow dict"""
+    return graph.to_json() if isinstance(graph, WorkflowGraph) else graph
+
+
+def strongly_connected_components(vertices: Iterable[Any],
+                                  successors: Dict[Any, List[Any]]) -> List[List[Any]]:
+    """
+    Iterative Tarjan's algorithm (no recursion limit on long chains).
+    Components are returned in reverse topological order.
+    """
+    index_of: Dict[Any, int] = {}
+    lowlink: Dict[Any, int] = {}
+    on_stack: Set[Any] = set()
+    stack: List[Any] = []
+    components: List[List[Any]] = []
+    counter = 0
+
+    for root in vertices:
+        if root in index_of:
+            continue
+        index_of[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors.get(root, ())))]
+
+        while work:
+            v, children = work[-1]
+            descended = False
+            for w in children:
+                if w not in index_of:
+                    index_of[w] = lowlink[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack.add(w)
+                    work.append((w, iter(successors.get(w, ()))))
+                    descended = True
+                    break
+                if w in on_stack and index_of[w] < lowlink[v]:
+                    lowlink[v] = index_of[w]
+            if descended:
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if lowlink[v] < lowlink[parent]:
+                    lowlink[parent] = lowlink[v]
+            if lowlink[v] == index_of[v]:
+                component = []
+                while True:
+                    w = stack.pop()
+                    on_stack.discard(w)
+                    component.append(w)
+                    if w == v:
+                        break
+                components.append(component)
+
+    return components
+
+
+def condensation(vertices: Iterable[Any], successors: Dict[Any, Iterable[Any]]
+                 ) -> Tuple[List[List[Any]], Dict[Any, int], List[List[int]]]:
+    """
+    Collapse strongly connected components so the graph becomes a DAG.
+
+    Returns (components, component_of, component_successors). Components are
+    ordered by the first appearance of a member in `vertices`, members keep
+    that order too, and successor lists keep one entry per crossing edge, so an
+    acyclic graph condenses to exactly itself.
+    """
+    vertices = list(vertices)
+    position = {v: i for i, v in enumerate(vertices)}
+    components = [sorted(component, key=position.__getitem__)
+                  for component in strongly_connected_components(vertices, successors)]
+    components.sort(key=lambda component: position[component[0]])
+    component_of = {v: c for c, component in enumerate(components) for v in component}
+
+    component_successors: List[List[int]] = [[] for _ in components]
+    for c, component in enumerate(components):
+        for v in component:
+            for w in successors.get(v, ()):
+                target = component_of.get(w)
+                if target is not None and target != c:
+                    component_successors[c].append(target)
+    return components, component_of, component_successors
@@ -1,107 +1,93 @@
 import json
 import math
-from typing import Dict, List, Tuple, Set, Optional
+from typing import Dict, List, Tuple, Set, Optional, Union
 from collections import defaultdict
 
+from graph_analysis import GraphAnalysis, snap_to_grid, stage_levels
+from layered_layout import SugiyamaLayout
+from node_patterns import TypePatternMatcher, height_matcher
+from workflow_graph import WorkflowGraph, parse_pair, DEFAULT_NODE_SIZE
+from workflow_serializer import dump
+
+LAYOUT_MODES = ('engineering', 'layered')
+
+# Node type -> category (first matching rule wins)
+CATEGORY_MATCHER = TypePatternMatcher([
+    (('Loader', 'LoadImage'), 'loaders'),
+    (('CLIPTextEncode',), 'conditioning'),
+    (('Sampler', 'CFGGuider'), 'sampling'),
+    (('VAEDecode', 'VAEEncode'), 'vae'),
+    (('Preview', 'Save'), 'output'),
+    (('VideoCombine',), 'video'),
+    (('Note',), 'notes'),
+    (('RIFE', 'Interpolat'), 'interpolation'),
+    (('Slider', 'Seed'), 'controls'),
+], default='processing')
+
+# Known node type heights
+HEIGHT_MATCHER = height_matcher({
+    'PreviewImage': 300,
+    'VHS_VideoCombine': 800,
+    'CLIPTextEncode': 200,
+    'Note': 150,
+    'LoadImage': 360,
+    'ImageResizeKJ': 266,
+    'WanImageToVideo_F2': 206,
+    'RIFE VFI': 198
+})
+
+
 class WorkflowReorganizer:
-    def __init__(self, workflow_data: dict):
-        self.workflow = workflow_data
-        self.nodes = {node['id']: node for node in workflow_data['nodes']}
-        self.links = workflow_data['links']
+    def __init__(self, workflow_data: Union[dict, WorkflowGraph], layout_mode: str = 'engineering',
+                 analysis: Optional[GraphAnalysis] = None):
+        if layout_mode not in LAYOUT_MODES:
+            raise ValueError(f"Unknown layout mode: {layout_mode}")
+        self.layout_mode = layout_mode
+        # Connection map, staging and categories are shared with the other layout strategies
+        self.analysis = analysis if analysis is not None else GraphAnalysis(workflow_data)
+        self.graph = self.analysis.graph
+        self.workflow = self.analysis.workflow
+        self.nodes = self.analysis.nodes
+        self.links = self.analysis.links
         self.horizontal_spacing = 1700  # 1700px between stages
         self.vertical_spacing = 120     # 120px vertical spacing
         self.grid_snap = 20             # 20px grid snap
         self.y_min = -1970              # Minimum Y coordinate
         self.y_max = -940               # Maximum Y coordinate (less negative)
+        self.x_start = -1800            # Starting X position
+        self.layer_spacing = 160        # Gap between layers in layered mode
         
     def snap_to_grid(self, value: float) -> int:
         """Snap a value to the nearest grid point"""
-        return int(round(value / self.grid_snap) * self.grid_snap)
+        return snap_to_grid(value, self.grid_snap)
     
     def get_node_connections(self) -> Dict[int, Dict[str, Set[int]]]:
-        """Build a map of node connections"""
-        connections = {}
-        for node_id in self.nodes:
-            connections[node_id] = {'inputs': set(), 'outputs': set()}
-        
-        for link in self.links:
-            if len(link) >= 4:
-                source_node = link[1]
-                target_node = link[3]
-                if source_node in connections and target_node in connections:
-                    connections[source_node]['outputs'].add(target_node)
-                    connections[target_node]['inputs'].add(source_node)
-        
-        return connections
+        """Map of node connections (precomputed by the graph analysis)"""
+        return self.analysis.connections
     
     def topological_sort(self, connections: Dict[int, Dict[str, Set[int]]]) -> List[List[int]]:
-        """Perform topological sort to get proper execution order in stages"""
-        # Calculate in-degree for each node
-        in_degree = {node_id: len(conn['inputs']) for node_id, conn in connections.items()}
-        
-        # Queue for nodes with in-degree 0
-        queue = [node_id for node_id, degree in in_degree.items() if degree == 0]
-        stages = []
-        
-        while queue:
-            # Process all nodes at current depth level
-            current_stage = []
-            next_queue = []
-            
-            for node_id in queue:
-                current_stage.append(node_id)
-                
-                # Reduce in-degree for connected nodes
-                for output_node in connections[node_id]['outputs']:
-                    in_degree[output_node] -= 1
-                    if in_degree[output_node] == 0:
-                        next_queue.append(output_node)
-            
-            stages.append(current_stage)
-            queue = next_queue
-        
-        return stages
+        """Perform topological sort to get proper execution order in stages (cycles are condensed into single blocks)"""
+        if connections is self.analysis.connections:
+            return self.analysis.stages
+        return stage_levels(connections)
     
     def categorize_nodes(self) -> Dict[str, List[int]]:
         """Categorize nodes by their function"""
-        categories = defaultdict(list)
-        
-        for node_id, node in self.nodes.items():
-            node_type = node.get('type', '')
-            
-            # Categorize based on node type
-            if 'Loader' in node_type or 'LoadImage' in node_type:
-                categories['loaders'].append(node_id)
-            elif 'CLIPTextEncode' in node_type:
-                categories['conditioning'].append(node_id)
-            elif 'Sampler' in node_type or 'CFGGuider' in node_type:
-                categories['sampling'].append(node_id)
-            elif 'VAEDecode' in node_type or 'VAEEncode' in node_type:
-                categories['vae'].append(node_id)
-            elif 'Preview' in node_type or 'Save' in node_type:
-                categories['output'].append(node_id)
-            elif 'VideoCombine' in node_type:
-                categories['video'].append(node_id)
-            elif 'Note' in node_type:
-                categories['notes'].append(node_id)
-            elif 'RIFE' in node_type or 'Interpolat' in node_type:
-                categories['interpolation'].append(node_id)
-            elif 'Slider' in node_type or 'Seed' in node_type:
-                categories['controls'].append(node_id)
-            else:
-                categories['processing'].append(node_id)
-        
-        return dict(categories)
+        return self.analysis.categorize(CATEGORY_MATCHER)
     
     def reorganize(self) -> dict:
         """Main reorganization function with engineering-style layout"""
+        if self.layout_mode == 'layered':
+            return self.reorganize_layered()
+        
         connections = self.get_node_connections()
         stages = self.topological_sort(connections)
         categories = self.categorize_nodes()
+        category_of = {node_id: category for category, nodes in categories.items() for node_id in nodes}
         
         # Define stage positions
         stage_positions = {}
-        x_current = -1800  # Starting X position
+        x_current = self.x_start
         
         # Create position map for each stage
         for stage_idx, stage_nodes in enumerate(stages):
@@ -121,12 +107,7 @@ class WorkflowReorganizer:
             # Group nodes by category within the stage
             stage_by_category = defaultdict(list)
             for node_id in stage_nodes:
-                for category, nodes in categories.items():
-                    if node_id in nodes:
-                        stage_by_category[category].append(node_id)
-                        break
-                else:
-                    stage_by_category['other'].append(node_id)
+                stage_by_category[category_of.get(node_id, 'other')].append(node_id)
             
             # Define category order (top to bottom)
             category_order = ['notes', 'loaders', 'controls', 'conditioning', 
@@ -176,9 +157,24 @@ class WorkflowReorganizer:
                 node['pos'] = [self.snap_to_grid(x_current), self.snap_to_grid(self.y_min)]
         
         # Update the workflow with new positions
-        self.workflow['nodes'] = list(self.nodes.values())
+        return self.analysis.finish()
+    
+    def reorganize_layered(self) -> dict:
+        """Sugiyama layered layout: left-to-right edges with few crossings"""
+        connections = self.get_node_connections()
+        edges = [(node_id, target) for node_id, conn in connections.items() for target in conn['outputs']]
+        sizes = {node_id: (self.estimate_node_width(node), self.estimate_node_height(node))
+                 for node_id, node in self.nodes.items()}
+        
+        layout = SugiyamaLayout(list(self.nodes), edges, sizes,
+                                layer_gap=self.layer_spacing, node_gap=self.vertical_spacing)
+        positions = layout.run()
+        
+        for node_id, (x, y) in positions.items():
+            self.nodes[node_id]['pos'] = [self.snap_to_grid(self.x_start + x),
+                                          self.snap_to_grid(self.y_min + y)]
         
-        return self.workflow
+        return self.analysis.finish()
     
     def compress_stage_vertically(self, node_ids: List[int], x_pos: int):
         """Compress nodes vertically if they exceed bounds"""
@@ -211,6 +207,11 @@ class WorkflowReorganizer:
             node['pos'] = [x_pos, self.snap_to_grid(y_current)]
             y_current += self.estimate_node_height(node) + spacing
     
+    def estimate_node_width(self, node: dict) -> int:
+        """Node width from its size, or a typical default"""
+        w, _, has_size = parse_pair(node.get('size'), (315, 0))
+        return int(w) if has_size else 315
+    
     def estimate_node_height(self, node: dict) -> int:
         """Estimate node height based on type and widgets"""
         base_height = 50
@@ -220,27 +221,14 @@ class WorkflowReorganizer:
             return base_height
         
         # Get actual size if available
-        if 'size' in node and isinstance(node['size'], list) and len(node['size']) >= 2:
-            return int(node['size'][1])
+        _, h, has_size = parse_pair(node.get('size'), DEFAULT_NODE_SIZE)
+        if has_size:
+            return int(h)
         
         # Estimate based on node type
-        node_type = node.get('type', '')
-        
-        # Known node type heights
-        type_heights = {
-            'PreviewImage': 300,
-            'VHS_VideoCombine': 800,
-            'CLIPTextEncode': 200,
-            'Note': 150,
-            'LoadImage': 360,
-            'ImageResizeKJ': 266,
-            'WanImageToVideo_F2': 206,
-            'RIFE VFI': 198
-        }
-        
-        for type_name, height in type_heights.items():
-            if type_name in node_type:
-                return height
+        height = HEIGHT_MATCHER(node.get('type', ''))
+        if height is not None:
+            return height
         
         # Default estimation
         widgets = node.get('widgets_values', [])
@@ -249,15 +237,14 @@ class WorkflowReorganizer:
         return max(base_height + widget_height, 100)
 
 
-def reorganize_workflow(input_path: str, output_path: str):
+def reorganize_workflow(input_path: str, output_path: str, layout_mode: str = 'engineering'):
     """Load, reorganize, and save workflow"""
     with open(input_path, 'r', encoding='utf-8') as f:
         workflow_data = json.load(f)
     
-    reorganizer = WorkflowReorganizer(workflow_data)
+    reorganizer = WorkflowReorganizer(workflow_data, layout_mode)
     reorganized = reorganizer.reorganize()
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(reorganized, f, indent=2)
+    dump(reorganized, output_path)
     
     return reorganized
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+Workflow Serializer Module for ComfyUI Workflow Layout
+Version 2.0 - Canonical JSON output shared by pipeline outputs and downloads
+
+- compact mode (no indentation or separator spaces)
+- optional deterministic key ordering, for diffs and content hashing
+- rounding of float geometry (pos / size / bounding), e.g. 422.84503173828125 -> 422.85
+- orjson acceleration when it is installed, with an identical stdlib fallback
+- content hashes of workflows and fingerprints of module sources (cache keys)
+"""
+
+import hashlib
+import importlib
+import json
+import sys
+from typing import Any, Dict, Optional, Sequence, Union
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:  # optional speed-up
+    orjson = None
+    HAS_ORJSON = False
+
+# Keys whose numeric values are layout geometry (safe to round)
+GEOMETRY_KEYS = frozenset({'pos', 'size', 'bounding'})
+DEFAULT_PRECISION = 2
+
+
+def _round_number(value: Any, precision: int) -> Any:
+    if isinstance(value, float):
+        value = round(value, precision)
+        # Grid-snapped coordinates stay ints in the written JSON
+        if value.is_integer():
+            return int(value)
+    return value
+
+
+def round_geometry(obj: Any, precision: int = DEFAULT_PRECISION) -> Any:
+    """Copy of obj with floats under pos/size/bounding rounded; other values are shared"""
+    if hasattr(obj, 'to_json'):
+        obj = obj.to_json()
+    if isinstance(obj, dict):
+        result = {}
+        for key, value in obj.items():
+            if key in GEOMETRY_KEYS:
+                if isinstance(value, list):
+                    value = [_round_number(v, precision) for v in value]
+                elif isinstance(value, dict):
+                    value = {k: _round_number(v, precision) for k, v in value.items()}
+            elif isinstance(value, (dict, list)) or hasattr(value, 'to_json'):
+                value = round_geometry(value, precision)
+            result[key] = value
+        return result
+    if isinstance(obj, list):
+        return [round_geometry(item, precision) if isinstance(item, (dict, list)) else item for item in obj]
+    return obj
+
+
+def _default(obj: Any) -> Any:
+    # WorkflowGraph and similar wrappers serialize as their JSON form
+    to_json = getattr(obj, 'to_json', None)
+    if callable(to_json):
+        return to_json()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj: Any, compact: bool = True, sort_keys: bool = False,
+                precision: Optional[int] = DEFAULT_PRECISION, use_orjson: bool = True) -> bytes:
+    """
+    Serialize obj to UTF-8 JSON bytes.
+
+    Args:
+        obj: Workflow, SCS or any JSON-compatible value
+        compact: No whitespace; otherwise 2-space indentation
+        sort_keys: Deterministic key order (canonical form)
+        precision: Decimal places for geometry floats; None leaves them untouched
+        use_orjson: Use orjson when available
+    """
+    if precision is not None:
+        obj = round_geometry(obj, precision)
+
+    if use_orjson and HAS_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if not compact:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except TypeError:
+            # e.g. integers above 64 bits; the stdlib encoder handles them
+            pass
+
+    if compact:
+        text = json.dumps(obj, default=_default, sort_keys=sort_keys, ensure_ascii=False,
+                          separators=(',', ':'))
+    else:
+        text = json.dumps(obj, default=_default, sort_keys=sort_keys, ensure_ascii=False, indent=2)
+    return text.encode('utf-8')
+
+
+def dumps(obj: Any, compact: bool = True, sort_keys: bool = False,
+          precision: Optional[int] = DEFAULT_PRECISION, use_orjson: bool = True) -> str:
+    """Serialize obj to a JSON string (see dumps_bytes)"""
+    return dumps_bytes(obj, compact, sort_keys, precision, use_orjson).decode('utf-8')
+
+
+def canonical_bytes(obj: Any, precision: Optional[int] = DEFAULT_PRECISION) -> bytes:
+    """Compact, key-sorted form used for hashing and diffing"""
+    return dumps_bytes(obj, compact=True, sort_keys=True, precision=precision)
+
+
+def content_hash(obj: Any, precision: Optional[int] = DEFAULT_PRECISION) -> str:
+    """SHA-256 hex digest of the canonical form"""
+    return hashlib.sha256(canonical_bytes(obj, precision)).hexdigest()
+
+
+def source_fingerprint(modules: Sequence[str]) -> str:
+    """Hash of the given modules' source files (imported if not loaded yet)"""
+    digest = hashlib.sha256()
+    for name in modules:
+        module = sys.modules.get(name) or importlib.import_module(name)
+        with open(module.__file__, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def dump(obj: Any, path: str, compact: bool = True, sort_keys: bool = False,
+         precision: Optional[int] = DEFAULT_PRECISION) -> int:
+    """Write obj to path; returns the number of bytes written"""
+    data = dumps_bytes(obj, compact, sort_keys, precision)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse JSON text or bytes (orjson when available)"""
+    if HAS_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(path: str) -> Dict[str, Any]:
+    """Read a workflow / SCS JSON file"""
+    with open(path, 'rb') as f:
+        return loads(f.read())
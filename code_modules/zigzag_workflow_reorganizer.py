@@ -1,13 +1,80 @@
 import json
 import math
-from typing import Dict, List, Tuple, Set, Optional
-from collections import defaultdict
+from typing import Dict, List, Tuple, Set, Optional, Union
+
+from graph_analysis import GraphAnalysis, snap_to_grid, execution_order
+from node_patterns import TypePatternMatcher, height_matcher
+from spatial_index import GridIndex
+from workflow_graph import WorkflowGraph, parse_pair, DEFAULT_NODE_SIZE
+from workflow_serializer import dump
+
+# Node type -> category; notes are handled separately (None)
+CATEGORY_MATCHER = TypePatternMatcher([
+    (('Note',), None),
+    (('Loader', 'LoadImage', 'CLIPLoader', 'VAELoader', 'UnetLoader'), 'loaders'),
+    (('CLIPTextEncode',), 'conditioning'),
+    (('Sampler', 'CFGGuider', 'BasicScheduler', 'RandomNoise', 'SplitSigmas'), 'sampling'),
+    (('VAEDecode', 'VAEEncode'), 'vae'),
+    (('Preview', 'Save'), 'output'),
+    (('VideoCombine',), 'video'),
+    (('RIFE', 'Interpolat'), 'interpolation'),
+    (('Slider', 'Seed', 'mxSlider', 'Fast Groups Bypasser'), 'controls'),
+    (('ImageToVideo', 'VideoEnhance', 'VideoTeaCache', 'PatchModel', 'PathchSageAttention'), 'video_processing'),
+    (('ColorMatch', 'ImageResize', 'ImageCrop', 'ImageFromBatch', 'GetImageRange'), 'image_processing'),
+], default='processing')
+
+# Category -> logical stage
+CATEGORY_STAGES = {
+    'loaders': 'input',
+    'controls': 'input',
+    'conditioning': 'preprocessing',
+    'video_processing': 'preprocessing',
+    'sampling': 'generation',
+    'vae': 'generation',
+    'interpolation': 'postprocessing',
+    'image_processing': 'postprocessing',
+    'output': 'output',
+    'video': 'output'
+}
+
+# Known node type heights
+HEIGHT_MATCHER = height_matcher({
+    'PreviewImage': 300,
+    'VHS_VideoCombine': 800,
+    'CLIPTextEncode': 200,
+    'Note': 150,
+    'LoadImage': 360,
+    'ImageResizeKJ': 266,
+    'WanImageToVideo_F2': 206,
+    'RIFE VFI': 198,
+    'CFGGuider': 98,
+    'SamplerCustomAdvanced': 106,
+    'BasicScheduler': 110,
+    'RandomNoise': 82,
+    'VAEDecode': 46,
+    'KSamplerSelect': 60,
+    'ColorMatchImage': 126
+})
+
+
+# Column filling: greedy (original), first-fit-decreasing, or area-minimising column breaking
+PACKING_MODES = ('greedy', 'ffd', 'dp')
+
+Column = List[Tuple[int, int]]  # [(node_id, height)]
+
 
 class ZigzagWorkflowReorganizer:
-    def __init__(self, workflow_data: dict):
-        self.workflow = workflow_data
-        self.nodes = {node['id']: node for node in workflow_data['nodes']}
-        self.links = workflow_data['links']
+    def __init__(self, workflow_data: Union[dict, WorkflowGraph], analysis: Optional[GraphAnalysis] = None,
+                 packing: str = 'greedy'):
+        if packing not in PACKING_MODES:
+            raise ValueError(f"Unknown packing mode: {packing}")
+        self.packing = packing
+        # Connection map, staging and categories are shared with the other layout strategies
+        self.analysis = analysis if analysis is not None else GraphAnalysis(workflow_data)
+        self.graph = self.analysis.graph
+        self.workflow = self.analysis.workflow
+        self.nodes = self.analysis.nodes
+        self.links = self.analysis.links
         self.horizontal_spacing = 450   # Horizontal spacing between columns (slightly more for readability)
         self.vertical_spacing = 50      # 50px vertical spacing as requested
         self.grid_snap = 20             # 20px grid snap
@@ -15,49 +82,49 @@ class ZigzagWorkflowReorganizer:
         self.start_x = 100             # Starting X position (more centered)
         self.start_y = 100             # Starting Y position (top)
         self.max_column_height = 2000   # Maximum height before moving to next column
+        self.group_padding = 40         # Space between group edge and its nodes
+        self.group_title_height = 40    # Extra room above nodes for the group title
+        self.group_members: Dict[int, List[int]] = {}  # group index -> node ids
         
     def snap_to_grid(self, value: float) -> int:
         """Snap a value to the nearest grid point"""
-        return int(round(value / self.grid_snap) * self.grid_snap)
+        return snap_to_grid(value, self.grid_snap)
     
     def get_node_connections(self) -> Dict[int, Dict[str, Set[int]]]:
-        """Build a map of node connections"""
-        connections = {}
-        for node_id in self.nodes:
-            connections[node_id] = {'inputs': set(), 'outputs': set()}
-        
-        for link in self.links:
-            if len(link) >= 4:
-                source_node = link[1]
-                target_node = link[3]
-                if source_node in connections and target_node in connections:
-                    connections[source_node]['outputs'].add(target_node)
-                    connections[target_node]['inputs'].add(source_node)
-        
-        return connections
+        """Map of node connections (precomputed by the graph analysis)"""
+        return self.analysis.connections
     
     def topological_sort(self, connections: Dict[int, Dict[str, Set[int]]]) -> List[int]:
-        """Perform topological sort to get proper execution order"""
-        # Calculate in-degree for each node
-        in_degree = {node_id: len(conn['inputs']) for node_id, conn in connections.items()}
-        
-        # Queue for nodes with in-degree 0
-        queue = [node_id for node_id, degree in in_degree.items() if degree == 0]
-        sorted_nodes = []
-        
-        while queue:
-            # Sort queue to ensure consistent ordering
-            queue.sort()
-            node_id = queue.pop(0)
-            sorted_nodes.append(node_id)
-            
-            # Reduce in-degree for connected nodes
-            for output_node in connections[node_id]['outputs']:
-                in_degree[output_node] -= 1
-                if in_degree[output_node] == 0:
-                    queue.append(output_node)
+        """Perform topological sort to get proper execution order (cycles are condensed into single blocks)"""
+        if connections is self.analysis.connections:
+            return self.analysis.order
+        return execution_order(connections)
+    
+    def node_bounds(self, node: dict) -> Tuple[float, float, float, float]:
+        """Node rectangle (x1, y1, x2, y2) from its position and size (height estimated if missing)"""
+        x, y, _ = parse_pair(node.get('pos'), (0.0, 0.0))
+        w, h, has_size = parse_pair(node.get('size'), DEFAULT_NODE_SIZE)
+        if not has_size:
+            h = self.estimate_node_height(node)
+        return x, y, x + w, y + h
+    
+    def compute_group_membership(self) -> Dict[int, List[int]]:
+        """Map group index -> ids of nodes whose centre lies inside the group's current bounds"""
+        index = GridIndex(cell_size=self.column_width)
+        for i, group in enumerate(self.workflow.get('groups', [])):
+            bounding = group.get('bounding')
+            if isinstance(bounding, list) and len(bounding) >= 4:
+                x, y, w, h = bounding[:4]
+                index.insert(i, (x, y, x + w, y + h))
         
-        return sorted_nodes
+        members: Dict[int, List[int]] = {}
+        if not len(index):
+            return members
+        for node_id, node in self.nodes.items():
+            x1, y1, x2, y2 = self.node_bounds(node)
+            for group_index in index.query_point((x1 + x2) / 2, (y1 + y2) / 2):
+                members.setdefault(group_index, []).append(node_id)
+        return members
     
     def estimate_node_height(self, node: dict) -> int:
         """Estimate node height based on type and widgets"""
@@ -68,34 +135,14 @@ class ZigzagWorkflowReorganizer:
             return base_height
         
         # Get actual size if available
-        if 'size' in node and isinstance(node['size'], list) and len(node['size']) >= 2:
-            return int(node['size'][1])
+        _, h, has_size = parse_pair(node.get('size'), DEFAULT_NODE_SIZE)
+        if has_size:
+            return int(h)
         
         # Estimate based on node type
-        node_type = node.get('type', '')
-        
-        # Known node type heights
-        type_heights = {
-            'PreviewImage': 300,
-            'VHS_VideoCombine': 800,
-            'CLIPTextEncode': 200,
-            'Note': 150,
-            'LoadImage': 360,
-            'ImageResizeKJ': 266,
-            'WanImageToVideo_F2': 206,
-            'RIFE VFI': 198,
-            'CFGGuider': 98,
-            'SamplerCustomAdvanced': 106,
-            'BasicScheduler': 110,
-            'RandomNoise': 82,
-            'VAEDecode': 46,
-            'KSamplerSelect': 60,
-            'ColorMatchImage': 126
-        }
-        
-        for type_name, height in type_heights.items():
-            if type_name in node_type:
-                return height
+        height = HEIGHT_MATCHER(node.get('type', ''))
+        if height is not None:
+            return height
         
         # Default estimation
         widgets = node.get('widgets_values', [])
@@ -104,41 +151,8 @@ class ZigzagWorkflowReorganizer:
         return max(base_height + widget_height, 100)
     
     def categorize_nodes(self) -> Dict[str, List[int]]:
-        """Categorize nodes by their function for better grouping"""
-        categories = defaultdict(list)
-        
-        for node_id, node in self.nodes.items():
-            node_type = node.get('type', '')
-            
-            # Skip note nodes from categorization (handle separately)
-            if 'Note' in node_type:
-                continue
-                
-            # Categorize based on node type
-            if any(x in node_type for x in ['Loader', 'LoadImage', 'CLIPLoader', 'VAELoader', 'UnetLoader']):
-                categories['loaders'].append(node_id)
-            elif 'CLIPTextEncode' in node_type:
-                categories['conditioning'].append(node_id)
-            elif any(x in node_type for x in ['Sampler', 'CFGGuider', 'BasicScheduler', 'RandomNoise', 'SplitSigmas']):
-                categories['sampling'].append(node_id)
-            elif any(x in node_type for x in ['VAEDecode', 'VAEEncode']):
-                categories['vae'].append(node_id)
-            elif any(x in node_type for x in ['Preview', 'Save']):
-                categories['output'].append(node_id)
-            elif 'VideoCombine' in node_type:
-                categories['video'].append(node_id)
-            elif any(x in node_type for x in ['RIFE', 'Interpolat']):
-                categories['interpolation'].append(node_id)
-            elif any(x in node_type for x in ['Slider', 'Seed', 'mxSlider', 'Fast Groups Bypasser']):
-                categories['controls'].append(node_id)
-            elif any(x in node_type for x in ['ImageToVideo', 'VideoEnhance', 'VideoTeaCache', 'PatchModel', 'PathchSageAttention']):
-                categories['video_processing'].append(node_id)
-            elif any(x in node_type for x in ['ColorMatch', 'ImageResize', 'ImageCrop', 'ImageFromBatch', 'GetImageRange']):
-                categories['image_processing'].append(node_id)
-            else:
-                categories['processing'].append(node_id)
-        
-        return dict(categories)
+        """Categorize nodes by their function for better grouping (notes are left out)"""
+        return self.analysis.categorize(CATEGORY_MATCHER)
     
     def identify_stages(self, sorted_nodes: List[int], connections: Dict, categories: Dict) -> Dict[str, List[int]]:
         """Identify logical stages in the workflow"""
@@ -150,28 +164,20 @@ class ZigzagWorkflowReorganizer:
             'output': []
         }
         
+        category_of = {node_id: cat for cat, nodes in categories.items() for node_id in nodes}
         for node_id in sorted_nodes:
-            # Determine stage based on category and connections
-            for cat, nodes in categories.items():
-                if node_id in nodes:
-                    if cat in ['loaders', 'controls']:
-                        stages['input'].append(node_id)
-                    elif cat in ['conditioning', 'video_processing']:
-                        stages['preprocessing'].append(node_id)
-                    elif cat in ['sampling', 'vae']:
-                        stages['generation'].append(node_id)
-                    elif cat in ['interpolation', 'image_processing']:
-                        stages['postprocessing'].append(node_id)
-                    elif cat in ['output', 'video']:
-                        stages['output'].append(node_id)
-                    else:
-                        stages['generation'].append(node_id)
-                    break
+            # Determine stage based on category
+            cat = category_of.get(node_id)
+            if cat is not None:
+                stages[CATEGORY_STAGES.get(cat, 'generation')].append(node_id)
         
         return stages
     
     def reorganize(self) -> dict:
         """Main reorganization function with zigzag layout"""
+        # Group membership comes from the original layout, before anything moves
+        self.group_members = self.compute_group_membership()
+        
         connections = self.get_node_connections()
         sorted_nodes = self.topological_sort(connections)
         categories = self.categorize_nodes()
@@ -179,40 +185,23 @@ class ZigzagWorkflowReorganizer:
         # Group nodes by processing stage
         stages = self.identify_stages(sorted_nodes, connections, categories)
         
-        # Track positioned nodes and current position
-        positioned_nodes = set()
-        columns = []  # List of columns, each containing nodes
-        current_column = []
-        current_column_height = 0
-        column_index = 0
-        
-        # Position nodes in zigzag pattern
+        # Nodes to stack in columns (notes are positioned last)
+        items = []
         for node_id in sorted_nodes:
             if node_id not in self.nodes:
                 continue
-                
             node = self.nodes[node_id]
-            node_height = self.estimate_node_height(node)
-            
-            # Skip notes for now (position them last)
             if 'Note' in node.get('type', ''):
                 continue
-            
-            # Check if we need to move to next column
-            if current_column_height + node_height > self.max_column_height and current_column:
-                columns.append(current_column)
-                current_column = []
-                current_column_height = 0
-                column_index += 1
-            
-            # Add node to current column
-            current_column.append((node_id, node_height))
-            current_column_height += node_height + self.vertical_spacing
-            positioned_nodes.add(node_id)
+            items.append((node_id, self.estimate_node_height(node)))
         
-        # Add the last column
-        if current_column:
-            columns.append(current_column)
+        if self.packing == 'ffd':
+            columns = self.pack_columns_ffd(items, connections)
+        elif self.packing == 'dp':
+            columns = self.pack_columns_min_area(items)
+        else:
+            columns = self.break_columns(items, self.max_column_height)
+        positioned_nodes = {node_id for column in columns for node_id, _ in column}
         
         # Now position nodes in zigzag pattern
         for col_idx, column_nodes in enumerate(columns):
@@ -261,46 +250,122 @@ class ZigzagWorkflowReorganizer:
         
         # Update groups if they exist
         if 'groups' in self.workflow:
-            for group in self.workflow['groups']:
-                self.update_group_bounds(group)
+            for i, group in enumerate(self.workflow['groups']):
+                self.update_group_bounds(group, self.group_members.get(i, []))
         
         # Update the workflow with new positions
-        self.workflow['nodes'] = list(self.nodes.values())
+        return self.analysis.finish()
+    
+    def column_height(self, column: Column) -> int:
+        """Stacked height of a column including the spacing between nodes"""
+        return sum(h for _, h in column) + self.vertical_spacing * max(0, len(column) - 1)
+    
+    def break_columns(self, items: Column, max_height: float) -> List[Column]:
+        """Fill columns in order, starting a new one when the next node would exceed max_height"""
+        columns = []
+        current_column = []
+        current_column_height = 0
+        for node_id, node_height in items:
+            # Check if we need to move to next column
+            if current_column_height + node_height > max_height and current_column:
+                columns.append(current_column)
+                current_column = []
+                current_column_height = 0
+            current_column.append((node_id, node_height))
+            current_column_height += node_height + self.vertical_spacing
+        if current_column:
+            columns.append(current_column)
+        return columns
+    
+    def pack_columns_min_area(self, items: Column) -> List[Column]:
+        """
+        Column breaking that minimises canvas area (column span x tallest column).
         
-        return self.workflow
+        Order is kept, so dependencies still flow column to column. For a height limit the
+        in-order fill gives the fewest columns, so only limits where the partition changes
+        are tried: each next limit is the smallest one that lets a column take one more node.
+        """
+        if not items:
+            return []
+        cap = max(self.max_column_height, max(h for _, h in items))
+        limit = max(h for _, h in items)
+        best_area, best = None, None
+        while True:
+            columns = self.break_columns(items, limit)
+            heights = [self.column_height(column) for column in columns]
+            area = ((len(columns) - 1) * self.horizontal_spacing + self.column_width) * max(heights)
+            if best_area is None or area < best_area:
+                best_area, best = area, columns
+            if len(columns) == 1:
+                break
+            limit = min(heights[i] + self.vertical_spacing + columns[i + 1][0][1]
+                        for i in range(len(columns) - 1))
+            if limit > cap:
+                break
+        return best
     
-    def update_group_bounds(self, group: dict):
-        """Update group bounding box based on contained nodes"""
-        # Find all nodes that belong to this group
-        group_nodes = []
-        for node_id, node in self.nodes.items():
-            # Check if node position is within original group bounds
-            if 'bounding' in group and len(group['bounding']) >= 4:
-                orig_x, orig_y, orig_w, orig_h = group['bounding'][:4]
-                node_x, node_y = node.get('pos', [0, 0])
-                
-                # Note: This is a simplified check, you might need more sophisticated group membership detection
-                # For now, we'll just shift the group bounds
-                pass
+    def pack_columns_ffd(self, items: Column, connections: Dict[int, Dict[str, Set[int]]]) -> List[Column]:
+        """
+        First-fit-decreasing within dependency constraints.
+        
+        Topological levels are packed in order; inside a level the tallest nodes go first,
+        each into the first column that has room and is not left of any of its inputs.
+        """
+        heights = dict(items)
+        columns: List[Column] = []
+        fill: List[int] = []
+        column_of: Dict[int, int] = {}
+        for level in self.analysis.stages:
+            level_items = sorted((node_id for node_id in level if node_id in heights),
+                                 key=lambda node_id: -heights[node_id])
+            for node_id in level_items:
+                node_height = heights[node_id]
+                first = max((column_of[src] for src in connections[node_id]['inputs'] if src in column_of),
+                            default=0)
+                target = None
+                for c in range(first, len(columns)):
+                    if fill[c] + self.vertical_spacing + node_height <= self.max_column_height:
+                        target = c
+                        break
+                if target is None:
+                    columns.append([])
+                    fill.append(-self.vertical_spacing)
+                    target = len(columns) - 1
+                columns[target].append((node_id, node_height))
+                fill[target] += self.vertical_spacing + node_height
+                column_of[node_id] = target
+        return columns
+    
+    def update_group_bounds(self, group: dict, members: Optional[List[int]] = None):
+        """Fit the group's bounding box around its member nodes' new positions"""
+        if members is None:
+            # Not precomputed: use the nodes currently inside the group
+            groups = self.workflow.get('groups', [])
+            index = next((i for i, g in enumerate(groups) if g is group), None)
+            members = self.compute_group_membership().get(index, []) if index is not None else []
+        
+        boxes = [self.node_bounds(self.nodes[node_id]) for node_id in members if node_id in self.nodes]
+        if not boxes:
+            # Nothing inside: leave the group where it is
+            return
         
-        # For now, just shift groups to a reasonable position
-        if 'bounding' in group and len(group['bounding']) >= 4:
-            # Shift group to new area
-            group['bounding'][0] = self.start_x - 200  # Offset to the left
-            group['bounding'][1] = self.start_y - 100  # Offset above
-            # Keep width and height the same
+        x1 = min(b[0] for b in boxes) - self.group_padding
+        y1 = min(b[1] for b in boxes) - self.group_padding - self.group_title_height
+        x2 = max(b[2] for b in boxes) + self.group_padding
+        y2 = max(b[3] for b in boxes) + self.group_padding
+        group['bounding'] = [self.snap_to_grid(x1), self.snap_to_grid(y1),
+                             self.snap_to_grid(x2 - x1), self.snap_to_grid(y2 - y1)]
     
 
-def reorganize_workflow_zigzag(input_path: str, output_path: str):
+def reorganize_workflow_zigzag(input_path: str, output_path: str, packing: str = 'greedy'):
     """Load, reorganize with zigzag pattern, and save workflow"""
     with open(input_path, 'r', encoding='utf-8') as f:
         workflow_data = json.load(f)
     
-    reorganizer = ZigzagWorkflowReorganizer(workflow_data)
+    reorganizer = ZigzagWorkflowReorganizer(workflow_data, packing=packing)
     reorganized = reorganizer.reorganize()
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(reorganized, f, indent=2)
+    dump(reorganized, output_path)
     
     return reorganized
 
@@ -309,6 +374,6 @@ def reorganize_workflow_zigzag(input_path: str, output_path: str):
 if __name__ == "__main__":
     import sys
     if len(sys.argv) >= 3:
-        reorganize_workflow_zigzag(sys.argv[1], sys.argv[2])
+        reorganize_workflow_zigzag(sys.argv[1], sys.argv[2], *sys.argv[3:4])
     else:
-        print("Usage: python zigzag_workflow_reorganizer.py <input.json> <output.json>")
\ No newline at end of file
+        print("Usage: python zigzag_workflow_reorganizer.py <input.json> <output.json> [greedy|ffd|dp]")
\ No newline at end of file
@@ -3,72 +3,160 @@ Workflows API endpoints
 """
 
 import os
-import json
 import asyncio
 from datetime import datetime
 from typing import List, Optional
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import Response
+
+from workflow_serializer import dumps_bytes
 
 from models.workflow import (
+    ModelType,
     WorkflowRequest,
     WorkflowResponse,
     WorkflowHistory,
     WorkflowStatus,
 )
+from services.download_cache import DownloadCache, DownloadEntry, GZIP_ETAG_SUFFIX, etag_matches
+from services.idempotency import (
+    IdempotencyConflictError,
+    IdempotencyStore,
+    new_workflow_id,
+    request_fingerprint,
+)
+from services.job_queue import job_queue
 from services.workflow_generator import WorkflowGenerator
+from services.workflow_store import WorkflowStore
 from websocket.progress import manager as ws_manager
 
 router = APIRouter()
 
-# In-memory storage (replace with database in production)
-workflows_db: dict = {}
+# Persistent storage (SQLite, WAL); workflow bodies are loaded on demand
+workflow_store = WorkflowStore()
+
+# Serialized download bodies, keyed by workflow ID and ETag
+download_cache = DownloadCache()
+
+# Idempotency-Key -> workflow created for it
+idempotency_store = IdempotencyStore()
 
 
 @router.post("/generate", response_model=WorkflowResponse)
 async def generate_workflow(
-    request: WorkflowRequest, background_tasks: BackgroundTasks
+    request: WorkflowRequest,
+    response: Response,
+    priority: int = Query(0, ge=-10, le=10),
+    idempotency_key: Optional[str] = Header(None, max_length=255),
 ):
     """
     Generate a new ComfyUI workflow from natural language description
 
-    This endpoint initiates the workflow generation process using the
-    orchestrator and specialized agents.
+    This endpoint queues the workflow generation process (orchestrator and
+    specialized agents) on the job queue; higher priority runs sooner.
+    Returns 503 when the queue is full.
+
+    With an Idempotency-Key header, repeating the same request within
+    IDEMPOTENCY_TTL returns the workflow created the first time (queued,
+    running or finished) instead of generating again. Reusing a key for a
+    different request is a 422.
+
+    A request identical to an earlier one is answered from the result cache:
+    the workflow is returned already completed and nothing is queued.
     """
-    # Create workflow ID
-    workflow_id = f"wf_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    fingerprint = request_fingerprint(request) if idempotency_key else None
+    if idempotency_key:
+        try:
+            existing_id = idempotency_store.lookup(idempotency_key, fingerprint)
+        except IdempotencyConflictError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        existing = await asyncio.to_thread(workflow_store.get, existing_id) if existing_id else None
+        # A failed or cancelled attempt does not block a retry
+        if existing is not None and existing.status not in (
+            WorkflowStatus.FAILED,
+            WorkflowStatus.CANCELLED,
+        ):
+            response.headers["Idempotent-Replayed"] = "true"
+            return existing
+
+    # Create workflow ID (unique and time-ordered)
+    workflow_id = new_workflow_id()
+    metadata = {
+        "description": request.description,
+        "model_type": request.model_type,
+        "dimensions": f"{request.width}x{request.height}",
+    }
+
+    # Identical request generated before: complete immediately
+    # Disk tier read and decompression run in a worker thread
+    cached = await asyncio.to_thread(
+        WorkflowGenerator(workflow_id, ws_manager).cached_result, request
+    )
+    if cached is not None:
+        now = datetime.now()
+        workflow_response = WorkflowResponse(
+            id=workflow_id,
+            status=WorkflowStatus.COMPLETED,
+            workflow_json=cached,
+            created_at=now,
+            completed_at=now,
+            metadata=dict(metadata, cached=True),
+        )
+        await asyncio.to_thread(workflow_store.create, workflow_response)
+        if idempotency_key:
+            idempotency_store.remember(idempotency_key, fingerprint, workflow_id)
+        await ws_manager.broadcast(
+            {
+                "type": "complete",
+                "workflow_id": workflow_id,
+                "status": "completed",
+                "message": "Workflow served from result cache",
+            }
+        )
+        return workflow_response
+
+    # Admission control before anything is stored
+    if job_queue.full():
+        raise HTTPException(
+            status_code=503,
+            detail="Generation queue is full, retry later",
+            headers={"Retry-After": "5"},
+        )
 
     # Create initial response
     workflow_response = WorkflowResponse(
         id=workflow_id,
         status=WorkflowStatus.PENDING,
         created_at=datetime.now(),
-        metadata={
-            "description": request.description,
-            "model_type": request.model_type,
-            "dimensions": f"{request.width}x{request.height}",
-        },
+        metadata=metadata,
     )
 
     # Store in database
-    workflows_db[workflow_id] = workflow_response
+    await asyncio.to_thread(workflow_store.create, workflow_response)
 
-    # Start generation in background
-    background_tasks.add_task(
-        generate_workflow_task, workflow_id, request, ws_manager
+    # Queue generation for the worker pool
+    job_queue.submit(
+        workflow_id,
+        lambda: generate_workflow_task(workflow_id, request, ws_manager),
+        priority=priority,
     )
 
+    if idempotency_key:
+        idempotency_store.remember(idempotency_key, fingerprint, workflow_id)
+
     return workflow_response
 
 
 async def generate_workflow_task(
     workflow_id: str, request: WorkflowRequest, ws_manager
 ):
-    """Background task to generate workflow"""
+    """Job queue task to generate workflow"""
     try:
         # Update status
-        workflows_db[workflow_id].status = WorkflowStatus.PROCESSING
+        await asyncio.to_thread(
+            workflow_store.update, workflow_id, status=WorkflowStatus.PROCESSING
+        )
 
         # Send initial progress
         await ws_manager.broadcast(
@@ -87,9 +175,13 @@ async def generate_workflow_task(
         workflow_json = await generator.generate(request)
 
         # Update response
-        workflows_db[workflow_id].workflow_json = workflow_json
-        workflows_db[workflow_id].status = WorkflowStatus.COMPLETED
-        workflows_db[workflow_id].completed_at = datetime.now()
+        await asyncio.to_thread(
+            workflow_store.update,
+            workflow_id,
+            workflow_json=workflow_json,
+            status=WorkflowStatus.COMPLETED,
+            completed_at=datetime.now(),
+        )
 
         # Send completion message
         await ws_manager.broadcast(
@@ -103,8 +195,9 @@ async def generate_workflow_task(
 
     except Exception as e:
         # Handle error
-        workflows_db[workflow_id].status = WorkflowStatus.FAILED
-        workflows_db[workflow_id].error = str(e)
+        await asyncio.to_thread(
+            workflow_store.update, workflow_id, status=WorkflowStatus.FAILED, error=str(e)
+        )
 
         await ws_manager.broadcast(
             {
@@ -116,66 +209,174 @@ async def generate_workflow_task(
         )
 
 
+@router.get("/queue/stats")
+async def get_queue_stats():
+    """Generation queue depth, worker utilisation and totals"""
+    return job_queue.metrics()
+
+
+@router.get("/{workflow_id}/job")
+async def get_workflow_job(workflow_id: str):
+    """Queue state of a workflow's generation job"""
+    job = job_queue.get(workflow_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No generation job for this workflow")
+
+    return dict(job.to_dict(), position=job_queue.position(workflow_id))
+
+
+@router.post("/{workflow_id}/cancel")
+async def cancel_workflow(workflow_id: str):
+    """Cancel a queued or running workflow generation"""
+    if not await asyncio.to_thread(workflow_store.__contains__, workflow_id):
+        raise HTTPException(status_code=404, detail="Workflow not found")
+    if not job_queue.cancel(workflow_id):
+        raise HTTPException(status_code=409, detail="Workflow is not queued or running")
+
+    await asyncio.to_thread(
+        workflow_store.update,
+        workflow_id,
+        status=WorkflowStatus.CANCELLED,
+        completed_at=datetime.now(),
+    )
+    await ws_manager.broadcast(
+        {
+            "type": "cancelled",
+            "workflow_id": workflow_id,
+            "status": "cancelled",
+            "message": "Workflow generation cancelled",
+        }
+    )
+    return {"message": "Workflow cancelled successfully"}
+
+
+@router.post("/{workflow_id}/priority")
+async def set_workflow_priority(workflow_id: str, priority: int = Query(..., ge=-10, le=10)):
+    """Change the priority of a queued workflow generation"""
+    if not job_queue.set_priority(workflow_id, priority):
+        raise HTTPException(status_code=409, detail="Workflow is not queued")
+
+    return {
+        "id": workflow_id,
+        "priority": priority,
+        "position": job_queue.position(workflow_id),
+    }
+
+
 @router.get("/{workflow_id}", response_model=WorkflowResponse)
 async def get_workflow(workflow_id: str):
     """Get workflow by ID"""
-    if workflow_id not in workflows_db:
+    workflow = await asyncio.to_thread(workflow_store.get, workflow_id)
+    if workflow is None:
         raise HTTPException(status_code=404, detail="Workflow not found")
 
-    return workflows_db[workflow_id]
+    return workflow
+
+
+def build_download(workflow_id: str, etag: str) -> DownloadEntry:
+    """Load, serialize and cache the download body of one workflow version (runs in a worker thread)"""
+    workflow_json = workflow_store.get_json(workflow_id)
+    # Serialize in memory (compact, geometry rounded) instead of via a temp file
+    return download_cache.put(workflow_id, etag, dumps_bytes(workflow_json))
 
 
 @router.get("/{workflow_id}/download")
-async def download_workflow(workflow_id: str):
-    """Download workflow JSON file"""
-    if workflow_id not in workflows_db:
-        raise HTTPException(status_code=404, detail="Workflow not found")
+async def download_workflow(
+    workflow_id: str,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    Download workflow JSON file
 
-    workflow = workflows_db[workflow_id]
-    if not workflow.workflow_json:
+    The serialized bytes (and a gzip copy) are cached per workflow version. A
+    request whose If-None-Match names the current ETag gets 304, with the ETag
+    of the representation a 200 would have sent; the workflow is only loaded
+    and serialized when that version is not cached yet.
+    """
+    etag = await asyncio.to_thread(workflow_store.get_etag, workflow_id)
+    if etag is None:
+        if not await asyncio.to_thread(workflow_store.__contains__, workflow_id):
+            raise HTTPException(status_code=404, detail="Workflow not found")
         raise HTTPException(status_code=400, detail="Workflow not yet generated")
 
-    # Save to temp file
-    temp_file = f"/tmp/{workflow_id}.json"
-    with open(temp_file, "w") as f:
-        json.dump(workflow.workflow_json, f, indent=2)
+    use_gzip = "gzip" in (accept_encoding or "").lower()
+    headers = {
+        "Content-Disposition": f'attachment; filename="{workflow_id}.json"',
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+    }
 
-    return FileResponse(
-        temp_file,
-        media_type="application/json",
-        filename=f"{workflow_id}.json",
-    )
+    entry = download_cache.get(workflow_id, etag)
+    if entry is None:
+        # Loading, serializing and gzipping a large workflow takes a while: keep it off the event loop
+        entry = await asyncio.to_thread(build_download, workflow_id, etag)
 
+    # Small bodies are sent uncompressed, and then carry the plain ETag
+    gzipped = use_gzip and entry.gzipped is not None
+    headers["ETag"] = f'"{etag}{GZIP_ETAG_SUFFIX}"' if gzipped else f'"{etag}"'
 
-@router.get("/", response_model=List[WorkflowHistory])
-async def get_workflow_history(limit: int = 20, offset: int = 0):
-    """Get workflow generation history"""
-    # Convert workflows to history items
-    history = []
-    for wf_id, wf in workflows_db.items():
-        history.append(
-            WorkflowHistory(
-                id=wf.id,
-                description=wf.metadata.get("description", ""),
-                model_type=wf.metadata.get("model_type", "flux"),
-                status=wf.status,
-                created_at=wf.created_at,
-                preview_url=None,  # TODO: Generate previews
-            )
-        )
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if gzipped:
+        content = entry.gzipped
+        headers["Content-Encoding"] = "gzip"
+    else:
+        content = entry.body
 
-    # Sort by created_at descending
-    history.sort(key=lambda x: x.created_at, reverse=True)
+    return Response(content=content, media_type="application/json", headers=headers)
 
-    # Apply pagination
-    return history[offset : offset + limit]
+
+@router.get("/", response_model=List[WorkflowHistory])
+async def get_workflow_history(
+    response: Response,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
+    status: Optional[WorkflowStatus] = None,
+    model_type: Optional[ModelType] = None,
+):
+    """
+    Get workflow generation history, newest first
+
+    Pass the X-Next-Cursor header of a page as `cursor` to fetch the next one;
+    cursor pages are index seeks, so their cost does not grow with history size.
+    """
+    try:
+        items, next_cursor = await asyncio.to_thread(
+            workflow_store.history,
+            limit,
+            cursor=cursor,
+            offset=offset,
+            status=status,
+            model_type=model_type,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+
+    return [
+        WorkflowHistory(
+            id=item["id"],
+            description=item["description"],
+            model_type=item["model_type"] or "flux",
+            status=item["status"],
+            created_at=item["created_at"],
+            preview_url=None,  # TODO: Generate previews
+        )
+        for item in items
+    ]
 
 
 @router.delete("/{workflow_id}")
 async def delete_workflow(workflow_id: str):
     """Delete workflow by ID"""
-    if workflow_id not in workflows_db:
+    job_queue.cancel(workflow_id)
+    download_cache.invalidate(workflow_id)
+    if not await asyncio.to_thread(workflow_store.delete, workflow_id):
         raise HTTPException(status_code=404, detail="Workflow not found")
 
-    del workflows_db[workflow_id]
     return {"message": "Workflow deleted successfully"}
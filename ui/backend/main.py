@@ -26,6 +26,8 @@ from api.workflows import router as workflows_router
 from api.agents import router as agents_router
 from api.models_api import router as models_router
 from websocket.progress import manager as ws_manager
+from services.job_queue import job_queue
+from services.result_cache import result_cache
 
 # Create FastAPI app
 app = FastAPI(
@@ -44,6 +46,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Idempotent-Replayed"],
 )
 
 # Include routers
@@ -52,6 +55,19 @@ app.include_router(agents_router, prefix="/api/agents", tags=["agents"])
 app.include_router(models_router, prefix="/api/models", tags=["models"])
 
 
+@app.on_event("startup")
+async def start_job_queue():
+    """Start the generation worker pool and fingerprint the generator code"""
+    job_queue.start()
+    result_cache.warm()
+
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    """Stop workers and the layout process pool"""
+    await job_queue.stop()
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -70,17 +86,21 @@ async def health_check():
         "status": "healthy",
         "builder_path": BUILDER_PATH,
         "workspace_path": os.getenv("WORKSPACE_PATH"),
+        "queue": job_queue.metrics(),
+        "result_cache": result_cache.stats(),
     }
 
 
 @app.websocket("/ws/progress")
 async def websocket_progress(websocket: WebSocket):
-    """WebSocket endpoint for real-time progress updates"""
+    """WebSocket endpoint for real-time progress updates (see websocket.progress for topics)"""
     await ws_manager.connect(websocket)
     try:
         while True:
             # Keep connection alive and receive client messages
             data = await websocket.receive_text()
+            if await ws_manager.handle_client_message(websocket, data):
+                continue
             # Echo back for debugging
             await websocket.send_json({"type": "echo", "data": data})
     except WebSocketDisconnect:
@@ -24,6 +24,7 @@ class WorkflowStatus(str, Enum):
     PROCESSING = "processing"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
 class AgentStatus(str, Enum):
@@ -0,0 +1,92 @@
+"""
+Download Cache
+Serialized workflow downloads kept in memory, keyed by workflow ID and ETag
+"""
+
+import gzip
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Bodies smaller than this are sent uncompressed
+GZIP_MIN_SIZE = 1024
+
+# Suffix that marks the ETag of the gzip-encoded representation
+GZIP_ETAG_SUFFIX = "-gzip"
+
+
+class DownloadEntry:
+    """Serialized body of one workflow version, plus its gzip copy when worth it"""
+
+    __slots__ = ("etag", "body", "gzipped")
+
+    def __init__(self, etag: str, body: bytes):
+        self.etag = etag
+        self.body = body
+        # mtime=0 keeps the compressed bytes identical between builds
+        self.gzipped = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= GZIP_MIN_SIZE else None
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + (len(self.gzipped) if self.gzipped is not None else 0)
+
+
+class DownloadCache:
+    """LRU of DownloadEntry objects bounded by total bytes"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, DownloadEntry]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, workflow_id: str, etag: str) -> Optional[DownloadEntry]:
+        """Cached entry if it is still the current version (etag matches)"""
+        with self._lock:
+            entry = self._entries.get(workflow_id)
+            if entry is None or entry.etag != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(workflow_id)
+            self.hits += 1
+            return entry
+
+    def put(self, workflow_id: str, etag: str, body: bytes) -> DownloadEntry:
+        entry = DownloadEntry(etag, body)
+        with self._lock:
+            old = self._entries.pop(workflow_id, None)
+            if old is not None:
+                self._size -= old.size
+            self._entries[workflow_id] = entry
+            self._size += entry.size
+            # Always keep the newest entry, even if it alone exceeds the budget
+            while self._size > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+        return entry
+
+    def invalidate(self, workflow_id: str):
+        with self._lock:
+            entry = self._entries.pop(workflow_id, None)
+            if entry is not None:
+                self._size -= entry.size
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """True if an If-None-Match header value names etag (weak comparison, any encoding)"""
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag.endswith(GZIP_ETAG_SUFFIX):
+            tag = tag[: -len(GZIP_ETAG_SUFFIX)]
+        if tag == etag:
+            return True
+    return False
@@ -0,0 +1,96 @@
+"""
+Idempotency
+Unique workflow IDs and replay of retried generate requests
+
+- new_workflow_id(): time-ordered IDs at microsecond resolution that never
+  repeat or go backwards within a process, even if the clock does
+- IdempotencyStore: maps an Idempotency-Key header to the workflow it created,
+  together with a fingerprint of the request body, for IDEMPOTENCY_TTL seconds
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from workflow_serializer import content_hash
+
+from models.workflow import WorkflowRequest
+
+_EPOCH = datetime(1970, 1, 1)
+_id_lock = threading.Lock()
+_last_id_us = 0
+
+
+def new_workflow_id() -> str:
+    """wf_YYYYMMDD_HHMMSS_ffffff, strictly increasing within the process"""
+    global _last_id_us
+    with _id_lock:
+        # Clock went backwards or two calls in one microsecond: step past the last ID
+        _last_id_us = max(time.time_ns() // 1000, _last_id_us + 1)
+        stamp = _EPOCH + timedelta(microseconds=_last_id_us)
+    return f"wf_{stamp.strftime('%Y%m%d_%H%M%S_%f')}"
+
+
+def normalize_request(request: WorkflowRequest) -> Dict[str, Any]:
+    """Request fields that shape the generated workflow, in a canonical form"""
+    data = request.model_dump(mode="json")
+    data["description"] = " ".join((data.get("description") or "").split())
+    data["lora_models"] = [lora.strip() for lora in data.get("lora_models") or []]
+    data["custom_options"] = data.get("custom_options") or {}
+    return data
+
+
+def request_fingerprint(request: WorkflowRequest) -> str:
+    """SHA-256 of the normalised request"""
+    return content_hash(normalize_request(request), precision=None)
+
+
+class IdempotencyConflictError(Exception):
+    """Raised when an Idempotency-Key is reused with a different request"""
+
+
+class IdempotencyStore:
+    """Idempotency key -> (request fingerprint, workflow ID), expiring after ttl seconds"""
+
+    def __init__(self, ttl: Optional[float] = None, max_keys: int = 10000):
+        self.ttl = ttl if ttl is not None else float(os.getenv("IDEMPOTENCY_TTL", 3600))
+        self.max_keys = max_keys
+        # key -> (expires_at, fingerprint, workflow_id), oldest first
+        self._keys: "OrderedDict[str, Tuple[float, str, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: str, fingerprint: str) -> Optional[str]:
+        """
+        Workflow ID previously created under key, or None if the key is new or expired.
+        Raises IdempotencyConflictError if key was used for a different request.
+        """
+        with self._lock:
+            self._expire()
+            entry = self._keys.get(key)
+            if entry is None:
+                return None
+            _, stored_fingerprint, workflow_id = entry
+            if stored_fingerprint != fingerprint:
+                raise IdempotencyConflictError(
+                    "Idempotency-Key was already used with a different request"
+                )
+            return workflow_id
+
+    def remember(self, key: str, fingerprint: str, workflow_id: str):
+        with self._lock:
+            self._keys.pop(key, None)
+            self._keys[key] = (time.monotonic() + self.ttl, fingerprint, workflow_id)
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+
+    def _expire(self):
+        # Entries are in insertion order and share one ttl, so expiry is oldest first
+        now = time.monotonic()
+        while self._keys:
+            key, (expires_at, _, _) = next(iter(self._keys.items()))
+            if expires_at > now:
+                break
+            del self._keys[key]
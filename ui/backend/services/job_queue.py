@@ -0,0 +1,240 @@
+"""
+Job Queue
+Bounded priority queue of generation jobs served by a fixed pool of asyncio workers
+
+- admission control: submit() raises QueueFullError once max_pending jobs wait
+- priorities: higher runs sooner; queued jobs can be re-prioritised
+- cancellation of queued and running jobs
+- a shared process pool (run_cpu) for CPU-bound layout stages, so they never
+  run on the event loop
+"""
+
+import asyncio
+import itertools
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+# Finished jobs kept for status queries
+MAX_FINISHED_JOBS = 1000
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the queue is at max_pending"""
+
+
+class Job:
+    """One queued unit of work"""
+
+    __slots__ = ("id", "runner", "priority", "state", "version", "task", "error",
+                 "submitted_at", "started_at", "finished_at")
+
+    def __init__(self, job_id: str, runner: Callable[[], Awaitable[Any]], priority: int):
+        self.id = job_id
+        self.runner = runner
+        self.priority = priority
+        self.state = QUEUED
+        # Bumped on re-prioritisation; older heap entries are then skipped
+        self.version = 0
+        self.task: Optional[asyncio.Task] = None
+        self.error: Optional[str] = None
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        started = self.started_at or self.finished_at or now
+        return {
+            "id": self.id,
+            "state": self.state,
+            "priority": self.priority,
+            "wait_ms": round((started - self.submitted_at) * 1000, 1),
+            "run_ms": round(((self.finished_at or now) - self.started_at) * 1000, 1) if self.started_at else None,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    """Priority job queue with a fixed number of asyncio workers"""
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 process_workers: Optional[int] = None):
+        self.workers = workers or int(os.getenv("JOB_WORKERS", 2))
+        self.max_pending = max_pending or int(os.getenv("JOB_QUEUE_MAX", 100))
+        self.process_workers = process_workers or int(
+            os.getenv("JOB_PROCESS_WORKERS", min(4, os.cpu_count() or 1))
+        )
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._counter = itertools.count()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self.queued = 0
+        self.running = 0
+        self.counts = {DONE: 0, FAILED: 0, CANCELLED: 0, "rejected": 0}
+        self._wait_total = 0.0
+        self._run_total = 0.0
+        self._started_total = 0
+        self._ran_total = 0
+
+    # Lifecycle
+
+    def start(self):
+        """Start the workers (on the running event loop)"""
+        if self._worker_tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel running jobs and stop the workers and the process pool"""
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = ProcessPoolExecutor(max_workers=self.process_workers)
+        return self._process_pool
+
+    async def run_cpu(self, func: Callable[..., Any], *args: Any) -> Any:
+        """Run a picklable CPU-bound function in the process pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.process_pool, func, *args)
+
+    # Submission and control
+
+    def full(self) -> bool:
+        return self.queued >= self.max_pending
+
+    def submit(self, job_id: str, runner: Callable[[], Awaitable[Any]], priority: int = 0) -> Job:
+        """Queue runner() under job_id; raises QueueFullError when at max_pending"""
+        if self._queue is None:
+            self.start()
+        if self.full():
+            self.counts["rejected"] += 1
+            raise QueueFullError(f"Job queue is full ({self.max_pending} pending)")
+        job = Job(job_id, runner, priority)
+        self.jobs[job_id] = job
+        self.queued += 1
+        self._push(job)
+        return job
+
+    def _push(self, job: Job):
+        self._queue.put_nowait((-job.priority, next(self._counter), job.version, job))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def position(self, job_id: str) -> Optional[int]:
+        """0-based place in line for a queued job"""
+        job = self.jobs.get(job_id)
+        if job is None or job.state != QUEUED:
+            return None
+        ahead = [j for j in self.jobs.values() if j.state == QUEUED and j is not job
+                 and (-j.priority, j.submitted_at) < (-job.priority, job.submitted_at)]
+        return len(ahead)
+
+    def set_priority(self, job_id: str, priority: int) -> bool:
+        """Re-prioritise a queued job; False if it is not waiting"""
+        job = self.jobs.get(job_id)
+        if job is None or job.state != QUEUED:
+            return False
+        job.priority = priority
+        job.version += 1
+        self._push(job)
+        return True
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job; False if it is unknown or already finished"""
+        job = self.jobs.get(job_id)
+        if job is None or job.state in FINISHED_STATES:
+            return False
+        if job.state == QUEUED:
+            self.queued -= 1
+            self._finish(job, CANCELLED)
+        elif job.task is not None:
+            job.task.cancel()
+        return True
+
+    # Workers
+
+    async def _worker(self):
+        while True:
+            _, _, version, job = await self._queue.get()
+            if job.state != QUEUED or version != job.version:
+                continue  # cancelled, or superseded by a re-prioritised entry
+            self.queued -= 1
+            self.running += 1
+            job.state = RUNNING
+            job.started_at = time.monotonic()
+            self._wait_total += job.started_at - job.submitted_at
+            self._started_total += 1
+            job.task = asyncio.create_task(job.runner())
+            try:
+                # wait() does not raise when the job itself is cancelled
+                await asyncio.wait({job.task})
+            except asyncio.CancelledError:
+                job.task.cancel()
+                self.running -= 1
+                self._finish(job, CANCELLED)
+                raise
+            self.running -= 1
+            if job.task.cancelled():
+                self._finish(job, CANCELLED)
+            elif job.task.exception() is not None:
+                self._finish(job, FAILED, str(job.task.exception()))
+            else:
+                self._finish(job, DONE)
+
+    def _finish(self, job: Job, state: str, error: Optional[str] = None):
+        job.state = state
+        job.error = error
+        job.finished_at = time.monotonic()
+        job.runner = None
+        if job.started_at is not None:
+            self._run_total += job.finished_at - job.started_at
+            self._ran_total += 1
+        self.counts[state] += 1
+        # Forget the oldest finished jobs
+        excess = len(self.jobs) - self.queued - self.running - MAX_FINISHED_JOBS
+        if excess > 0:
+            for old_id in [i for i, j in self.jobs.items() if j.state in FINISHED_STATES][:excess]:
+                del self.jobs[old_id]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, worker utilisation and totals"""
+        return {
+            "workers": self.workers,
+            "process_workers": self.process_workers,
+            "max_pending": self.max_pending,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.counts[DONE],
+            "failed": self.counts[FAILED],
+            "cancelled": self.counts[CANCELLED],
+            "rejected": self.counts["rejected"],
+            "avg_wait_ms": round(self._wait_total / self._started_total * 1000, 1) if self._started_total else 0.0,
+            "avg_run_ms": round(self._run_total / self._ran_total * 1000, 1) if self._ran_total else 0.0,
+        }
+
+
+# Global job queue instance
+job_queue = JobQueue()
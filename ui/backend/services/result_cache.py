@@ -0,0 +1,199 @@
+"""
+Result Cache
+Generated workflows keyed by the content of the request that produced them
+
+Generation is deterministic: the same normalised WorkflowRequest always yields
+the same workflow, as long as the generator and layout code are unchanged. The
+cache key is the SHA-256 of the normalised request plus a fingerprint of that
+code, so editing any of GENERATOR_MODULES invalidates earlier results.
+
+Entries are the zlib-compressed workflow JSON (as stored by WorkflowStore).
+The most recently used RESULT_CACHE_SIZE entries stay in memory; every entry
+is also written to RESULT_CACHE_DIR, which keeps up to RESULT_CACHE_DISK_MAX
+files (least recently used are removed first) and survives restarts.
+"""
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from workflow_serializer import content_hash, source_fingerprint
+
+from models.workflow import WorkflowRequest
+from services.idempotency import normalize_request
+from services.workflow_store import compress_workflow, decompress_workflow
+
+# Modules whose code decides the generated workflow
+GENERATOR_MODULES = (
+    "services.workflow_generator",
+    "pipeline_runner",
+    "data_bus_router",
+    "collision_detection",
+    "json_validator",
+    "workflow_graph",
+    "workflow_serializer",
+)
+
+CACHE_FILE_SUFFIX = ".zlib"
+
+
+class ResultCache:
+    """Two-tier (memory LRU + directory) cache of generated workflows"""
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        directory: Optional[str] = None,
+        max_disk_entries: Optional[int] = None,
+    ):
+        self.max_entries = (
+            max_entries if max_entries is not None else int(os.getenv("RESULT_CACHE_SIZE", 256))
+        )
+        self.directory = directory or os.getenv("RESULT_CACHE_DIR", "data/result_cache")
+        self.max_disk_entries = (
+            max_disk_entries
+            if max_disk_entries is not None
+            else int(os.getenv("RESULT_CACHE_DISK_MAX", 4096))
+        )
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[str] = None
+        self._disk_count: Optional[int] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def warm(self) -> str:
+        """
+        Fingerprint of the generator code, computed once (the server calls this at
+        startup; it can't run at import time because the generator imports this module)
+        """
+        if self._fingerprint is None:
+            self._fingerprint = source_fingerprint(GENERATOR_MODULES)
+        return self._fingerprint
+
+    def key_for(self, request: WorkflowRequest) -> str:
+        """Content address of a request"""
+        return content_hash(
+            {"code": self.warm(), "request": normalize_request(request)}, precision=None
+        )
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + CACHE_FILE_SUFFIX)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A fresh copy of the cached workflow, or None"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return decompress_workflow(data)
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            workflow = decompress_workflow(data)
+        except (OSError, ValueError, zlib.error) as e:
+            if not isinstance(e, FileNotFoundError):
+                print(f"Discarding unreadable result cache entry {path}: {e}")
+                self._remove_file(path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        # Mark it recently used on disk and promote it to memory
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self._remember(key, data)
+            self.disk_hits += 1
+        return workflow
+
+    def put(self, key: str, workflow_json: Dict[str, Any]):
+        if not self.enabled:
+            return
+        data, _ = compress_workflow(workflow_json)
+        with self._lock:
+            self._remember(key, data)
+        self._write_file(key, data)
+
+    def _remember(self, key: str, data: bytes):
+        self._entries.pop(key, None)
+        self._entries[key] = data
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _write_file(self, key: str, data: bytes):
+        path = self._path(key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            existed = os.path.exists(path)
+            # Write then rename, so readers never see a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Could not write result cache entry {path}: {e}")
+            return
+        if not existed:
+            with self._lock:
+                if self._disk_count is not None:
+                    self._disk_count += 1
+            self._trim_disk()
+
+    def _cache_files(self):
+        try:
+            with os.scandir(self.directory) as entries:
+                return [e for e in entries if e.name.endswith(CACHE_FILE_SUFFIX)]
+        except FileNotFoundError:
+            return []
+
+    def _trim_disk(self):
+        with self._lock:
+            count = self._disk_count
+        if count is None:
+            count = len(self._cache_files())
+        if count > self.max_disk_entries:
+            # Drop the least recently used tenth at once, so trimming is rare
+            files = sorted(self._cache_files(), key=lambda e: e.stat().st_mtime)
+            excess = len(files) - self.max_disk_entries + max(1, self.max_disk_entries // 10)
+            for entry in files[:excess]:
+                self._remove_file(entry.path)
+            count = len(files) - len(files[:excess])
+        with self._lock:
+            self._disk_count = count
+
+    def _remove_file(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_entries": self._disk_count,
+                "max_disk_entries": self.max_disk_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+            }
+
+
+# Global result cache instance
+result_cache = ResultCache()
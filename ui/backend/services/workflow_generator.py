@@ -7,10 +7,22 @@ import os
 import json
 import asyncio
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 
+import pipeline_runner
+from json_validator import JSONValidator
+
 from models.workflow import WorkflowRequest, AgentStatus, AgentProgress
+from services.job_queue import job_queue
+from services.result_cache import result_cache
+
+# Mode 2 agent -> layout stage it runs (agents without one have no code module yet)
+ORGANIZATION_STAGES = {
+    "reroute-engineer": "data_bus_router",
+    "layout-refiner": "collision_detection",
+    "workflow-validator": "json_validator",
+}
 
 
 class WorkflowGenerator:
@@ -38,9 +50,19 @@ class WorkflowGenerator:
         """
         Generate workflow using the agent pipeline
 
-        This is a simplified version that creates a basic workflow structure.
-        In production, this would integrate with the actual Claude Code agents.
+        Mode 1 is still simulated and produces a basic workflow structure.
+        Mode 2 runs the real layout stages on it in the job queue's process pool.
+        A request seen before is answered from the result cache without either mode.
         """
+        # Disk reads, decompression and hashing stay off the event loop
+        cache_key = await asyncio.to_thread(result_cache.key_for, request)
+        cached = await asyncio.to_thread(self.cached_result, request, cache_key)
+        if cached is not None:
+            await self.send_progress(
+                "orchestrator", "completed", "Workflow served from result cache"
+            )
+            return cached
+
 
         # Mode 1: Workflow Generation Pipeline
         generation_agents = [
@@ -74,20 +96,18 @@ class WorkflowGenerator:
             await asyncio.sleep(0.5)  # Simulate work
             await self.send_progress(agent, "completed", f"{agent} completed")
 
+        # Generate workflow JSON
+        # This is a simplified example - in production, this would use the actual
+        # workflow generation modules and Claude Code agents
+        workflow_json = self.create_sample_workflow(request)
+
         # Execute Mode 2
         await self.send_progress(
             "orchestrator", "running", "Starting Mode 2: Workflow Organization"
         )
 
-        for agent in organization_agents:
-            await self.send_progress(agent, "running", f"Executing {agent}...")
-            await asyncio.sleep(0.5)  # Simulate work
-            await self.send_progress(agent, "completed", f"{agent} completed")
-
-        # Generate workflow JSON
-        # This is a simplified example - in production, this would use the actual
-        # workflow generation modules and Claude Code agents
-        workflow_json = self.create_sample_workflow(request)
+        workflow_json = await self.organize(workflow_json, organization_agents)
+        await asyncio.to_thread(result_cache.put, cache_key, workflow_json)
 
         await self.send_progress(
             "orchestrator", "completed", "Workflow generation complete!"
@@ -95,14 +115,81 @@ class WorkflowGenerator:
 
         return workflow_json
 
+    def cached_result(
+        self, request: WorkflowRequest, cache_key: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Earlier result for an identical request, re-stamped for this workflow, or None"""
+        workflow = result_cache.get(cache_key or result_cache.key_for(request))
+        if workflow is None:
+            return None
+        extra = workflow.setdefault("extra", {})
+        # Nothing was laid out for this workflow; the source run's timings don't apply
+        extra.pop("layout_timings_ms", None)
+        extra["cached_from"] = extra.get("workflow_id")
+        extra["workflow_id"] = self.workflow_id
+        extra["generated_at"] = datetime.now().isoformat()
+        return workflow
+
+    async def organize(self, workflow: Dict[str, Any], agents: List[str]) -> Dict[str, Any]:
+        """
+        Run the Mode 2 layout stages on workflow, one process-pool call per stage
+
+        The SCS is handed from stage to stage, progress is reported as each
+        stage starts and finishes, and the stage timings end up in
+        extra.layout_timings_ms. Raises RuntimeError if a stage fails or the
+        organized workflow has inputs that reference missing links.
+        """
+        scs_data = {"workflow_state": {"current_graph": workflow}, "layout_parameters": {}}
+        timings: Dict[str, float] = {}
+
+        for agent in agents:
+            stage = ORGANIZATION_STAGES.get(agent)
+            if stage is None:
+                await self.send_progress(agent, "completed", f"{agent} completed")
+                continue
+
+            await self.send_progress(agent, "running", f"Running {stage}...")
+            outcome = await job_queue.run_cpu(pipeline_runner.main, scs_data, [stage])
+            scs_data = outcome["scs_data"]
+            elapsed_ms = outcome["timings_ms"].get(stage, 0.0)
+            timings[stage] = elapsed_ms
+
+            if not outcome["success"]:
+                result = outcome["stages"][0]["result"] if outcome["stages"] else outcome
+                error = result.get("error") or "; ".join(map(str, result.get("errors", []))) or "stage failed"
+                await self.send_progress(agent, "failed", f"{stage} failed: {error}")
+                raise RuntimeError(f"{stage} failed: {error}")
+
+            await self.send_progress(agent, "completed", f"{stage} finished in {elapsed_ms:.1f} ms")
+
+        organized = scs_data["workflow_state"]["current_graph"]
+        # Stages report success on their own terms; never hand out a graph with broken wiring
+        missing = [
+            entry
+            for entry in JSONValidator().analyze_graph(organized)["dangling_inputs"]
+            if "link" in entry
+        ]
+        if missing:
+            first = missing[0]
+            error = (
+                f"{len(missing)} input(s) reference missing links, e.g. node {first['node_id']} "
+                f"input '{first['name']}' -> link {first['link']}"
+            )
+            await self.send_progress("orchestrator", "failed", error)
+            raise RuntimeError(error)
+
+        timings["total"] = round(sum(timings.values()), 3)
+        organized.setdefault("extra", {})["layout_timings_ms"] = timings
+        return organized
+
     def create_sample_workflow(self, request: WorkflowRequest) -> Dict[str, Any]:
         """
         Create a sample workflow JSON structure
         In production, this would be replaced with actual workflow generation
         """
         return {
-            "last_node_id": 10,
-            "last_link_id": 15,
+            "last_node_id": 7,
+            "last_link_id": 9,
             "nodes": [
                 {
                     "id": 1,
@@ -129,7 +216,7 @@ class WorkflowGenerator:
                     "order": 1,
                     "mode": 0,
                     "inputs": [{"name": "clip", "type": "CLIP", "link": 2}],
-                    "outputs": [{"name": "CONDITIONING", "type": "CONDITIONING", "links": [5]}],
+                    "outputs": [{"name": "CONDITIONING", "type": "CONDITIONING", "links": [5], "slot_index": 0}],
                     "properties": {"Node name for S&R": "CLIPTextEncode"},
                     "widgets_values": [request.description or "a beautiful landscape"],
                 },
@@ -141,18 +228,80 @@ class WorkflowGenerator:
                     "flags": {},
                     "order": 2,
                     "mode": 0,
-                    "outputs": [{"name": "LATENT", "type": "LATENT", "links": [6]}],
+                    "outputs": [{"name": "LATENT", "type": "LATENT", "links": [6], "slot_index": 0}],
                     "properties": {"Node name for S&R": "EmptyLatentImage"},
                     "widgets_values": [request.width, request.height, 1],
                 },
+                {
+                    "id": 4,
+                    "type": "KSampler",
+                    "pos": [880, 100],
+                    "size": [315, 262],
+                    "flags": {},
+                    "order": 4,
+                    "mode": 0,
+                    "inputs": [
+                        {"name": "model", "type": "MODEL", "link": 1},
+                        {"name": "positive", "type": "CONDITIONING", "link": 5},
+                        {"name": "negative", "type": "CONDITIONING", "link": 7},
+                        {"name": "latent_image", "type": "LATENT", "link": 6},
+                    ],
+                    "outputs": [{"name": "LATENT", "type": "LATENT", "links": [8], "slot_index": 0}],
+                    "properties": {"Node name for S&R": "KSampler"},
+                    "widgets_values": [0, "randomize", request.steps, 7, "euler", "normal", 1],
+                },
+                {
+                    "id": 5,
+                    "type": "VAEDecode",
+                    "pos": [1240, 100],
+                    "size": [210, 46],
+                    "flags": {},
+                    "order": 5,
+                    "mode": 0,
+                    "inputs": [
+                        {"name": "samples", "type": "LATENT", "link": 8},
+                        {"name": "vae", "type": "VAE", "link": 4},
+                    ],
+                    "outputs": [{"name": "IMAGE", "type": "IMAGE", "links": [9], "slot_index": 0}],
+                    "properties": {"Node name for S&R": "VAEDecode"},
+                    "widgets_values": [],
+                },
+                {
+                    "id": 6,
+                    "type": "SaveImage",
+                    "pos": [1490, 100],
+                    "size": [315, 270],
+                    "flags": {},
+                    "order": 6,
+                    "mode": 0,
+                    "inputs": [{"name": "images", "type": "IMAGE", "link": 9}],
+                    "properties": {"Node name for S&R": "SaveImage"},
+                    "widgets_values": ["ComfyUI"],
+                },
+                {
+                    "id": 7,
+                    "type": "CLIPTextEncode",
+                    "pos": [420, 300],
+                    "size": [422.84503173828125, 164.6060791015625],
+                    "flags": {},
+                    "order": 3,
+                    "mode": 0,
+                    "inputs": [{"name": "clip", "type": "CLIP", "link": 3}],
+                    "outputs": [{"name": "CONDITIONING", "type": "CONDITIONING", "links": [7], "slot_index": 0}],
+                    "properties": {"Node name for S&R": "CLIPTextEncode"},
+                    "widgets_values": ["blurry, low quality"],
+                },
             ],
             "links": [
                 [1, 1, 0, 4, 0, "MODEL"],
                 [2, 1, 1, 2, 0, "CLIP"],
-                [3, 1, 1, 3, 0, "CLIP"],
+                [3, 1, 1, 7, 0, "CLIP"],
                 [4, 1, 2, 5, 1, "VAE"],
                 [5, 2, 0, 4, 1, "CONDITIONING"],
                 [6, 3, 0, 4, 3, "LATENT"],
+                [7, 7, 0, 4, 2, "CONDITIONING"],
+                [8, 4, 0, 5, 0, "LATENT"],
+                [9, 5, 0, 6, 0, "IMAGE"],
             ],
             "groups": [],
             "config": {},
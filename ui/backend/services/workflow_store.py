@@ -0,0 +1,296 @@
+"""
+Workflow Store
+Persistent SQLite (WAL) storage for generated workflows
+
+Metadata lives in indexed columns of the `workflows` table; the workflow JSON
+is kept zlib-compressed in `workflow_blobs` and only read when a caller asks
+for it (get_workflow / download), so listing and status updates never touch
+workflow bodies.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from workflow_serializer import dumps_bytes, loads
+
+from models.workflow import WorkflowResponse, WorkflowStatus
+
+DEFAULT_DB_PATH = os.getenv("WORKFLOW_DB_PATH", "data/workflows.db")
+
+# Fixed-width timestamps so text order equals time order in the indexes
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S.%f"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS workflows (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    model_type TEXT,
+    description TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL,
+    completed_at TEXT,
+    error TEXT,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    agent_progress TEXT NOT NULL DEFAULT '[]'
+);
+CREATE INDEX IF NOT EXISTS idx_workflows_created ON workflows (created_at, id);
+CREATE INDEX IF NOT EXISTS idx_workflows_status ON workflows (status, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_workflows_model_type ON workflows (model_type, created_at, id);
+CREATE TABLE IF NOT EXISTS workflow_blobs (
+    id TEXT PRIMARY KEY REFERENCES workflows (id) ON DELETE CASCADE,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    data BLOB NOT NULL
+);
+"""
+
+# Columns update() may set directly
+METADATA_COLUMNS = ("status", "completed_at", "error", "metadata", "agent_progress")
+
+# Columns served by the history listing
+HISTORY_COLUMNS = "id, description, model_type, status, created_at"
+
+
+def format_timestamp(value: Optional[datetime]) -> Optional[str]:
+    return value.strftime(TIMESTAMP_FORMAT) if value is not None else None
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(value, TIMESTAMP_FORMAT) if value else None
+
+
+def encode_cursor(created_at: str, workflow_id: str) -> str:
+    """Opaque keyset cursor for the history position after (created_at, id)"""
+    return base64.urlsafe_b64encode(f"{created_at}|{workflow_id}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """(created_at, id) from a cursor; raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, workflow_id = raw.split("|", 1)
+        parse_timestamp(created_at)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid history cursor: {cursor}") from e
+    return created_at, workflow_id
+
+
+def _value(value: Any) -> Any:
+    # Enum members (ModelType, WorkflowStatus) are stored as their plain values
+    return getattr(value, "value", value)
+
+
+def compress_workflow(workflow_json: Dict[str, Any]) -> Tuple[bytes, str]:
+    """Compact, lossless JSON, zlib-compressed, and its content hash (the download ETag)"""
+    raw = dumps_bytes(workflow_json, precision=None)
+    return zlib.compress(raw, 6), hashlib.sha256(raw).hexdigest()[:32]
+
+
+def decompress_workflow(data: bytes) -> Dict[str, Any]:
+    return loads(zlib.decompress(data))
+
+
+class WorkflowStore:
+    """SQLite-backed workflow storage with lazily loaded workflow bodies"""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # One connection shared by the executor threads the API handlers offload to
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        # Databases created before download ETags were stored
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(workflow_blobs)")}
+        if "etag" not in columns:
+            self._conn.execute("ALTER TABLE workflow_blobs ADD COLUMN etag TEXT")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _fetchone(self, sql: str, params: tuple = ()) -> Optional[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def _fetchall(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def __contains__(self, workflow_id: str) -> bool:
+        return self._fetchone("SELECT 1 FROM workflows WHERE id = ?", (workflow_id,)) is not None
+
+    def create(self, workflow: WorkflowResponse):
+        """Insert a new workflow record (and its body, if already generated)"""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute(
+                    "INSERT INTO workflows (id, status, model_type, description, created_at,"
+                    " completed_at, error, metadata, agent_progress)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        workflow.id,
+                        WorkflowStatus(workflow.status).value,
+                        _value(workflow.metadata.get("model_type")),
+                        workflow.metadata.get("description", ""),
+                        format_timestamp(workflow.created_at),
+                        format_timestamp(workflow.completed_at),
+                        workflow.error,
+                        json.dumps(workflow.metadata, default=str),
+                        json.dumps([p.model_dump(mode="json") for p in workflow.agent_progress]),
+                    ),
+                )
+                if workflow.workflow_json is not None:
+                    self._write_blob(workflow.id, workflow.workflow_json)
+
+    def _write_blob(self, workflow_id: str, workflow_json: Dict[str, Any]):
+        data, etag = compress_workflow(workflow_json)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO workflow_blobs (id, size, etag, data) VALUES (?, ?, ?, ?)",
+            (workflow_id, len(data), etag, data),
+        )
+
+    def update(self, workflow_id: str, workflow_json: Optional[Dict[str, Any]] = None, **fields) -> bool:
+        """
+        Update metadata columns (status, completed_at, error, metadata, agent_progress)
+        and optionally the workflow body. Returns False if the workflow does not exist.
+        """
+        unknown = set(fields) - set(METADATA_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown workflow field(s): {', '.join(sorted(unknown))}")
+
+        values = {}
+        for key, value in fields.items():
+            if key == "status" and value is not None:
+                value = WorkflowStatus(value).value
+            elif key == "completed_at":
+                value = format_timestamp(value)
+            elif key == "metadata":
+                value = json.dumps(value, default=str)
+            elif key == "agent_progress":
+                value = json.dumps([p.model_dump(mode="json") if hasattr(p, "model_dump") else p for p in value])
+            values[key] = value
+
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                if values:
+                    assignments = ", ".join(f"{key} = ?" for key in values)
+                    cursor = self._conn.execute(
+                        f"UPDATE workflows SET {assignments} WHERE id = ?",
+                        (*values.values(), workflow_id),
+                    )
+                    if cursor.rowcount == 0:
+                        return False
+                elif self._conn.execute(
+                    "SELECT 1 FROM workflows WHERE id = ?", (workflow_id,)
+                ).fetchone() is None:
+                    return False
+                if workflow_json is not None:
+                    self._write_blob(workflow_id, workflow_json)
+        return True
+
+    def _to_response(self, row: sqlite3.Row, workflow_json: Optional[Dict[str, Any]] = None) -> WorkflowResponse:
+        return WorkflowResponse(
+            id=row["id"],
+            status=row["status"],
+            workflow_json=workflow_json,
+            agent_progress=json.loads(row["agent_progress"]),
+            created_at=parse_timestamp(row["created_at"]),
+            completed_at=parse_timestamp(row["completed_at"]),
+            error=row["error"],
+            metadata=json.loads(row["metadata"]),
+        )
+
+    def get(self, workflow_id: str, include_json: bool = True) -> Optional[WorkflowResponse]:
+        """Workflow record; the body is only decompressed when include_json is set"""
+        row = self._fetchone("SELECT * FROM workflows WHERE id = ?", (workflow_id,))
+        if row is None:
+            return None
+        workflow_json = self.get_json(workflow_id) if include_json else None
+        return self._to_response(row, workflow_json)
+
+    def get_json(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Decompressed workflow body, or None if not generated yet"""
+        row = self._fetchone("SELECT data FROM workflow_blobs WHERE id = ?", (workflow_id,))
+        return decompress_workflow(row["data"]) if row is not None else None
+
+    def get_etag(self, workflow_id: str) -> Optional[str]:
+        """Content hash of the stored workflow body, without reading the body"""
+        row = self._fetchone("SELECT etag FROM workflow_blobs WHERE id = ?", (workflow_id,))
+        if row is None:
+            return None
+        if row["etag"] is None:
+            # Body stored before ETags existed; hash it once
+            workflow_json = self.get_json(workflow_id)
+            _, etag = compress_workflow(workflow_json)
+            with self._lock:
+                self._conn.execute("UPDATE workflow_blobs SET etag = ? WHERE id = ?", (etag, workflow_id))
+            return etag
+        return row["etag"]
+
+    def history(
+        self,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        offset: int = 0,
+        status: Optional[str] = None,
+        model_type: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Newest-first history page (metadata only) and the cursor for the next page.
+
+        With a cursor the page is a keyset seek on (created_at, id), so it costs the
+        same however deep it is; offset is only used when no cursor is given.
+        """
+        clauses, params = [], []
+        if status is not None:
+            clauses.append("status = ?")
+            params.append(_value(status))
+        if model_type is not None:
+            clauses.append("model_type = ?")
+            params.append(_value(model_type))
+        if cursor is not None:
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+            offset = 0
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._fetchall(
+            f"SELECT {HISTORY_COLUMNS} FROM workflows {where}"
+            " ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+            (*params, limit + 1, offset),
+        )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+        items = [
+            dict(row, created_at=parse_timestamp(row["created_at"])) for row in rows
+        ]
+        return items, next_cursor
+
+    def delete(self, workflow_id: str) -> bool:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute("DELETE FROM workflow_blobs WHERE id = ?", (workflow_id,))
+                cursor = self._conn.execute("DELETE FROM workflows WHERE id = ?", (workflow_id,))
+                return cursor.rowcount > 0
+
+    def __len__(self) -> int:
+        return self._fetchone("SELECT COUNT(*) FROM workflows")[0]
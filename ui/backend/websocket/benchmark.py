@@ -0,0 +1,128 @@
+"""
+WebSocket fan-out benchmark
+
+Simulates a few hundred progress clients against ConnectionManager and
+compares the firehose (every client on "*") with per-workflow subscriptions.
+A share of the clients can be made slow to check that they do not hold up
+delivery to the others.
+
+Usage:
+    python -m websocket.benchmark [--clients 300] [--workflows 10] [--events 20]
+                                  [--latency-ms 0] [--slow 0] [--slow-latency-ms 50] [--coalesce-ms 0]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from typing import Dict, List, Optional, Sequence
+
+from websocket.progress import ConnectionManager
+
+AGENTS = ("graph-analyzer", "layout-strategist", "reroute-engineer", "layout-refiner", "workflow-validator")
+
+
+class SimulatedWebSocket:
+    """Stand-in for a client socket that records what it is sent"""
+
+    def __init__(self, topics: Optional[str] = None, latency: float = 0.0):
+        self.query_params: Dict[str, str] = {"topics": topics} if topics else {}
+        self.latency = latency
+        self.received = 0
+        self.bytes = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, data: str):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        self.bytes += len(data)
+        self.received += 1
+
+
+async def run_scenario(subscribed: bool, clients: int, workflows: int, events: int,
+                       latency: float, slow: int = 0, slow_latency: float = 0.05,
+                       coalesce_window: float = 0.0) -> Dict[str, float]:
+    """Connect clients, publish events for every workflow, report delivery cost"""
+    manager = ConnectionManager(coalesce_window)
+    sockets: List[SimulatedWebSocket] = []
+    for i in range(clients):
+        topics = f"wf_{i % workflows}" if subscribed else None
+        socket = SimulatedWebSocket(topics, slow_latency if i < slow else latency)
+        await manager.connect(socket)
+        sockets.append(socket)
+
+    start = time.perf_counter()
+    for event in range(events):
+        for w in range(workflows):
+            await manager.broadcast({
+                "type": "agent_progress",
+                "workflow_id": f"wf_{w}",
+                "agent": AGENTS[event % len(AGENTS)],
+                "status": "running",
+                "message": f"event {event}",
+            })
+        # The generator yields between progress steps
+        await asyncio.sleep(0)
+    published = time.perf_counter()
+    if coalesce_window:
+        # Let the last held updates go out
+        await asyncio.sleep(coalesce_window)
+
+    # Time until every fast client has everything queued for it
+    fast = [manager.active_connections[s] for s in sockets[slow:] if s in manager.active_connections]
+    await asyncio.gather(*(connection.idle.wait() for connection in fast))
+    delivered = time.perf_counter()
+    stats = manager.stats()
+    for socket in sockets:
+        manager.disconnect(socket)
+
+    count = events * workflows
+    return {
+        "mode": "subscribed" if subscribed else "firehose",
+        "clients": clients,
+        "slow": slow,
+        "published": count,
+        "delivered": sum(s.received for s in sockets),
+        "coalesced": stats["coalesced"],
+        "dropped": stats["dropped"],
+        "publish_ms": round((published - start) * 1000, 2),
+        "fast_done_ms": round((delivered - start) * 1000, 2),
+        "per_event_ms": round((published - start) * 1000 / count, 3),
+    }
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark progress fan-out with simulated clients")
+    parser.add_argument("--clients", type=int, default=300)
+    parser.add_argument("--workflows", type=int, default=10)
+    parser.add_argument("--events", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Simulated per-send latency")
+    parser.add_argument("--slow", type=int, default=0, help="Number of slow clients")
+    parser.add_argument("--slow-latency-ms", type=float, default=50.0, help="Per-send latency of slow clients")
+    parser.add_argument("--coalesce-ms", type=float, default=0.0, help="Progress coalescing window")
+    args = parser.parse_args(argv)
+
+    async def run_all():
+        return [
+            await run_scenario(subscribed, args.clients, args.workflows, args.events,
+                               args.latency_ms / 1000, args.slow, args.slow_latency_ms / 1000,
+                               args.coalesce_ms / 1000)
+            for subscribed in (False, True)
+        ]
+
+    # Keep connect / disconnect logging out of the output
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = asyncio.run(run_all())
+
+    columns = list(rows[0])
+    print("  ".join(f"{c:>12}" for c in columns))
+    for row in rows:
+        print("  ".join(f"{row[c]:>12}" for c in columns))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,51 +1,339 @@
 """
 WebSocket manager for real-time progress updates
+
+Clients pick the events they want by subscribing to topics over /ws/progress:
+
+    {"action": "subscribe", "topics": ["wf_20251021_143022"]}
+    {"action": "unsubscribe", "topics": ["wf_20251021_143022"]}
+
+(or with ?topics=a,b on the connection URL). A topic is a workflow ID or a
+channel: "workflows" receives the lifecycle events (status / complete / error / cancelled)
+of every workflow and "*" receives everything. A connection that never
+subscribes stays on "*", so clients that predate topics keep working.
+
+Delivery never waits on a client: each message is serialized once, then put
+on every recipient's bounded send queue, which its own writer task drains.
+When a client falls behind, queued progress updates for the same workflow and
+agent are replaced by the newest one. If the queue is still full, the oldest
+progress update is dropped. Lifecycle events are never dropped; a client whose
+queue is full of them is disconnected.
+
+Progress updates are also held for COALESCE_WINDOW seconds before fan-out, so
+a burst of updates for one agent goes out as a single message. Every workflow
+event is recorded in a ProgressBuffer (see progress_buffer), and subscribing
+to a workflow first delivers its snapshot, or the events missed since the
+"since" seq given in the subscribe request.
 """
 
+import asyncio
 import json
-from typing import List
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Hashable, Iterable, List, Optional, Set, Union
 from fastapi import WebSocket
 
+from workflow_serializer import dumps
+
+from websocket.progress_buffer import ProgressBuffer
+
+# Channels
+CHANNEL_ALL = "*"
+CHANNEL_WORKFLOWS = "workflows"
+
+# Message types delivered on the "workflows" channel
+LIFECYCLE_TYPES = frozenset({"status", "complete", "error", "cancelled"})
+
+# Upper bound on topics per connection
+MAX_TOPICS_PER_CONNECTION = 256
+
+# Per-connection send queue bound, and how long one send may take
+MAX_QUEUED_MESSAGES = 64
+SEND_TIMEOUT = 10.0
+
+# Seconds progress updates are held so rapid-fire ones merge (0 disables)
+COALESCE_WINDOW = 0.05
+
+
+def coalesce_key(message: dict) -> Optional[Hashable]:
+    """Key under which newer updates supersede queued ones (None: never coalesced or dropped)"""
+    if message.get("type") == "agent_progress":
+        return (message.get("workflow_id"), message.get("agent"))
+    return None
+
+
+class ClientConnection:
+    """Bounded send queue and writer task for one socket"""
+
+    def __init__(self, websocket: WebSocket, manager: "ConnectionManager",
+                 max_queued: int = MAX_QUEUED_MESSAGES):
+        self.websocket = websocket
+        self.manager = manager
+        self.max_queued = max_queued
+        # Entries are [coalesce key, serialized text]; pending maps key -> queued entry
+        self.queue: Deque[List[Any]] = deque()
+        self.pending: Dict[Hashable, List[Any]] = {}
+        self.topics: Set[str] = set()
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self._wakeup = asyncio.Event()
+        self.idle = asyncio.Event()
+        self.idle.set()
+        self.task = asyncio.create_task(self._writer())
+
+    def enqueue(self, text: str, key: Optional[Hashable] = None) -> bool:
+        """Queue serialized text without waiting; False if the client cannot keep up"""
+        if key is not None:
+            entry = self.pending.get(key)
+            if entry is not None:
+                # Newest state replaces the queued one in place
+                entry[1] = text
+                self.coalesced += 1
+                return True
+        if len(self.queue) >= self.max_queued and not self._drop_stale():
+            return False
+        entry = [key, text]
+        self.queue.append(entry)
+        if key is not None:
+            self.pending[key] = entry
+        self.idle.clear()
+        self._wakeup.set()
+        return True
+
+    def _drop_stale(self) -> bool:
+        for i, entry in enumerate(self.queue):
+            if entry[0] is not None:
+                del self.queue[i]
+                del self.pending[entry[0]]
+                self.dropped += 1
+                return True
+        return False
+
+    async def _writer(self):
+        try:
+            while True:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                while self.queue:
+                    key, text = self.queue.popleft()
+                    if key is not None:
+                        del self.pending[key]
+                    await asyncio.wait_for(self.websocket.send_text(text), SEND_TIMEOUT)
+                    self.sent += 1
+                self.idle.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error sending message: {e}")
+            self.manager.disconnect(self.websocket)
+
+    def close(self):
+        self.queue.clear()
+        self.pending.clear()
+        self.idle.set()
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+
 
 class ConnectionManager:
-    """Manages WebSocket connections for progress updates"""
+    """Manages WebSocket connections and their topic subscriptions"""
 
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    def __init__(self, coalesce_window: float = COALESCE_WINDOW):
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # topic -> subscribed sockets
+        self.topics: Dict[str, Set[WebSocket]] = {}
+        # Connections still on the implicit "*" subscription
+        self._implicit: Set[WebSocket] = set()
+        # Replay ring buffers and snapshots per workflow
+        self.progress = ProgressBuffer()
+        # Progress updates waiting for the coalescing window, by coalesce key
+        self.coalesce_window = coalesce_window
+        self._held: "OrderedDict[Hashable, dict]" = OrderedDict()
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
 
     async def connect(self, websocket: WebSocket):
         """Accept new WebSocket connection"""
         await websocket.accept()
-        self.active_connections.append(websocket)
+        self.active_connections[websocket] = ClientConnection(websocket, self)
+
+        requested = websocket.query_params.get("topics")
+        if requested:
+            self.subscribe(websocket, requested.split(","))
+        else:
+            self._add(websocket, CHANNEL_ALL)
+            self._implicit.add(websocket)
         print(f"New WebSocket connection. Total connections: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket):
         """Remove WebSocket connection"""
-        if websocket in self.active_connections:
-            self.active_connections.remove(websocket)
+        connection = self.active_connections.pop(websocket, None)
+        if connection is not None:
+            connection.close()
+            self._implicit.discard(websocket)
+            for topic in connection.topics:
+                self._discard(websocket, topic)
             print(f"WebSocket disconnected. Total connections: {len(self.active_connections)}")
 
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
-        """Send message to specific connection"""
+    def _add(self, websocket: WebSocket, topic: str):
+        self.topics.setdefault(topic, set()).add(websocket)
+        self.active_connections[websocket].topics.add(topic)
+
+    def _discard(self, websocket: WebSocket, topic: str):
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(websocket)
+            if not subscribers:
+                del self.topics[topic]
+
+    def subscribe(self, websocket: WebSocket, topics: Iterable[str],
+                  since: Union[int, Dict[str, int], None] = None) -> List[str]:
+        """
+        Subscribe a connection to topics; returns its current topics.
+
+        Each newly subscribed workflow is caught up first: the events after
+        `since` (one seq for all topics, or a per-topic dict) if they are still
+        buffered, otherwise the workflow's snapshot.
+        """
+        if websocket not in self.active_connections:
+            return []
+        # The first explicit subscription replaces the implicit "*"
+        if websocket in self._implicit:
+            self._implicit.discard(websocket)
+            self.active_connections[websocket].topics.discard(CHANNEL_ALL)
+            self._discard(websocket, CHANNEL_ALL)
+
+        current = self.active_connections[websocket].topics
+        for topic in topics:
+            topic = str(topic).strip()
+            if topic and topic not in current and len(current) < MAX_TOPICS_PER_CONNECTION:
+                self._add(websocket, topic)
+                seq = since.get(topic) if isinstance(since, dict) else since
+                for message in self.progress.catch_up(topic, seq if isinstance(seq, int) else None):
+                    self._deliver((websocket,), message)
+        return sorted(current)
+
+    def unsubscribe(self, websocket: WebSocket, topics: Iterable[str]) -> List[str]:
+        """Unsubscribe a connection from topics; returns its remaining topics"""
+        connection = self.active_connections.get(websocket)
+        if connection is None:
+            return []
+        current = connection.topics
+        for topic in topics:
+            if topic in current:
+                current.discard(topic)
+                self._discard(websocket, topic)
+        return sorted(current)
+
+    async def handle_client_message(self, websocket: WebSocket, data: str) -> bool:
+        """Apply a subscribe / unsubscribe request; False if data is not one"""
         try:
-            await websocket.send_json(message)
-        except Exception as e:
-            print(f"Error sending message: {e}")
+            request = json.loads(data)
+        except ValueError:
+            return False
+        if not isinstance(request, dict) or request.get("action") not in ("subscribe", "unsubscribe"):
+            return False
+
+        topics = request.get("topics") or []
+        if isinstance(topics, str):
+            topics = [topics]
+        if request["action"] == "subscribe":
+            current = self.subscribe(websocket, topics, request.get("since"))
+        else:
+            current = self.unsubscribe(websocket, topics)
+        await self.send_personal_message({"type": "subscriptions", "topics": current}, websocket)
+        return True
+
+    def recipients(self, message: dict) -> Set[WebSocket]:
+        """Connections interested in a message (routed by its workflow_id)"""
+        topic = message.get("workflow_id")
+        if topic is None:
+            # Not tied to a workflow: everyone gets it
+            return set(self.active_connections)
+        recipients = set(self.topics.get(CHANNEL_ALL, ()))
+        recipients.update(self.topics.get(topic, ()))
+        if message.get("type") in LIFECYCLE_TYPES:
+            recipients.update(self.topics.get(CHANNEL_WORKFLOWS, ()))
+        return recipients
+
+    def _deliver(self, connections: Iterable[WebSocket], message: dict):
+        # Serialize once, then only queue; slow clients never block the sender
+        text = dumps(message, precision=None)
+        key = coalesce_key(message)
+        overflowed = []
+        for websocket in connections:
+            connection = self.active_connections.get(websocket)
+            if connection is not None and not connection.enqueue(text, key):
+                overflowed.append(websocket)
+
+        # Clients too slow even for lifecycle events
+        for websocket in overflowed:
+            print("Dropping WebSocket connection: send queue full")
             self.disconnect(websocket)
 
+    async def send_personal_message(self, message: dict, websocket: WebSocket):
+        """Send message to specific connection"""
+        self._deliver((websocket,), message)
+
+    async def publish(self, topic: str, message: dict):
+        """Send message to the subscribers of a topic (and of "*")"""
+        recipients = set(self.topics.get(CHANNEL_ALL, ()))
+        recipients.update(self.topics.get(topic, ()))
+        self._deliver(recipients, message)
+
     async def broadcast(self, message: dict):
-        """Broadcast message to all connections"""
-        disconnected = []
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception as e:
-                print(f"Error broadcasting message: {e}")
-                disconnected.append(connection)
-
-        # Remove disconnected connections
-        for conn in disconnected:
-            self.disconnect(conn)
+        """Deliver message to every connection subscribed to it"""
+        workflow_id = message.get("workflow_id")
+        if workflow_id is not None:
+            message = self.progress.record(message)
+
+        key = coalesce_key(message)
+        if key is not None and self.coalesce_window > 0:
+            # Hold it; a newer update for the same agent within the window replaces it
+            self._held[key] = message
+            if self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(
+                    self.coalesce_window, self._flush_held
+                )
+            return
+
+        if workflow_id is not None and self._held:
+            # Held progress of this workflow goes out before its lifecycle event
+            self._flush_held(workflow_id)
+        self._deliver(self.recipients(message), message)
+
+    def _flush_held(self, workflow_id: Optional[str] = None):
+        if workflow_id is None:
+            self._flush_handle = None
+            held, self._held = self._held, OrderedDict()
+        else:
+            held = OrderedDict(
+                (key, message) for key, message in self._held.items() if key[0] == workflow_id
+            )
+            for key in held:
+                del self._held[key]
+        for message in held.values():
+            self._deliver(self.recipients(message), message)
+
+    async def flush(self, timeout: Optional[float] = None):
+        """Send held progress now and wait until every send queue is empty"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+        if self._held or self._flush_handle is not None:
+            self._flush_held()
+        waiters = [connection.idle.wait() for connection in self.active_connections.values()]
+        if waiters:
+            await asyncio.wait_for(asyncio.gather(*waiters), timeout)
+
+    def stats(self) -> Dict[str, int]:
+        """Queue depth and delivery counters across connections"""
+        connections = list(self.active_connections.values())
+        return {
+            "connections": len(connections),
+            "held": len(self._held),
+            "queued": sum(len(c.queue) for c in connections),
+            "sent": sum(c.sent for c in connections),
+            "coalesced": sum(c.coalesced for c in connections),
+            "dropped": sum(c.dropped for c in connections),
+        }
 
 
 # Global connection manager instance
@@ -0,0 +1,118 @@
+"""
+Progress replay buffer
+Recent progress events and a current-state snapshot per workflow
+
+Every broadcast event for a workflow gets a per-workflow sequence number and
+is kept in a small ring buffer. The snapshot folds all events seen so far into
+the workflow's overall status plus the latest state of each agent. A client
+that subscribes late gets the snapshot as one message. A reconnecting client
+that passes the last seq it saw gets the missed events replayed, as long as
+they are still in the ring.
+"""
+
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional
+
+# Events kept per workflow for replay
+HISTORY_SIZE = 64
+
+# Workflows tracked at once (least recently updated are forgotten first)
+MAX_TRACKED_WORKFLOWS = 1000
+
+# Lifecycle message type -> workflow status
+LIFECYCLE_STATUS = {"complete": "completed", "error": "failed", "cancelled": "cancelled"}
+
+
+class WorkflowProgress:
+    """Ring buffer and folded state for one workflow"""
+
+    __slots__ = ("workflow_id", "seq", "events", "status", "message", "error", "agents")
+
+    def __init__(self, workflow_id: str, history_size: int = HISTORY_SIZE):
+        self.workflow_id = workflow_id
+        self.seq = 0
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self.status = "pending"
+        self.message: Optional[str] = None
+        self.error: Optional[str] = None
+        self.agents: Dict[str, Dict[str, Any]] = {}
+
+    def record(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Fold message into the state; returns it stamped with its seq"""
+        self.seq += 1
+        message = dict(message, seq=self.seq)
+        self.events.append(message)
+
+        kind = message.get("type")
+        if kind == "agent_progress" and message.get("agent"):
+            self.agents[message["agent"]] = {
+                "status": message.get("status"),
+                "message": message.get("message"),
+                "timestamp": message.get("timestamp"),
+            }
+        elif kind in LIFECYCLE_STATUS:
+            self.status = LIFECYCLE_STATUS[kind]
+        elif kind == "status" and message.get("status"):
+            self.status = message["status"]
+        if message.get("message"):
+            self.message = message["message"]
+        if message.get("error"):
+            self.error = message["error"]
+        return message
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": "snapshot",
+            "workflow_id": self.workflow_id,
+            "seq": self.seq,
+            "status": self.status,
+            "message": self.message,
+            "error": self.error,
+            "agents": [dict(state, name=name) for name, state in self.agents.items()],
+        }
+
+    def since(self, seq: int) -> Optional[List[Dict[str, Any]]]:
+        """Events after seq, or None if some of them have left the ring"""
+        if seq >= self.seq:
+            return []
+        if not self.events or self.events[0]["seq"] > seq + 1:
+            return None
+        return [event for event in self.events if event["seq"] > seq]
+
+
+class ProgressBuffer:
+    """WorkflowProgress per workflow, bounded by MAX_TRACKED_WORKFLOWS"""
+
+    def __init__(self, history_size: int = HISTORY_SIZE, max_workflows: int = MAX_TRACKED_WORKFLOWS):
+        self.history_size = history_size
+        self.max_workflows = max_workflows
+        self._workflows: "OrderedDict[str, WorkflowProgress]" = OrderedDict()
+
+    def record(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Track a message that has a workflow_id; returns it stamped with its seq"""
+        workflow_id = message["workflow_id"]
+        progress = self._workflows.get(workflow_id)
+        if progress is None:
+            progress = self._workflows[workflow_id] = WorkflowProgress(workflow_id, self.history_size)
+            if len(self._workflows) > self.max_workflows:
+                self._workflows.popitem(last=False)
+        else:
+            self._workflows.move_to_end(workflow_id)
+        return progress.record(message)
+
+    def get(self, workflow_id: str) -> Optional[WorkflowProgress]:
+        return self._workflows.get(workflow_id)
+
+    def catch_up(self, workflow_id: str, since: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Messages that bring a new subscriber up to date: missed events, or the snapshot"""
+        progress = self._workflows.get(workflow_id)
+        if progress is None:
+            return []
+        if since is not None:
+            missed = progress.since(since)
+            if missed is not None:
+                return missed
+        return [progress.snapshot()]
+
+    def forget(self, workflow_id: str):
+        self._workflows.pop(workflow_id, None)
@@ -45,6 +45,15 @@ export default function ProgressPanel() {
           status: message.status as AgentStatus,
           message: message.message,
         })
+      } else if (message.type === 'snapshot' && message.agents) {
+        // Sent on subscribe: current state of a workflow already in progress
+        message.agents.forEach((agent) =>
+          updateAgentProgress({
+            name: agent.name,
+            status: agent.status as AgentStatus,
+            message: agent.message,
+          })
+        )
       }
     })
 
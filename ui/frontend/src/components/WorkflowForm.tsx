@@ -3,6 +3,7 @@ import { useMutation } from '@tanstack/react-query'
 import { Sparkles, Settings2 } from 'lucide-react'
 import toast from 'react-hot-toast'
 import { workflowsApi } from '../services/api'
+import { websocketService } from '../services/websocket'
 import type { WorkflowRequest, ModelType } from '../types'
 import { useWorkflowStore } from '../store/workflowStore'
 
@@ -21,6 +22,7 @@ export default function WorkflowForm() {
   const generateMutation = useMutation({
     mutationFn: (request: WorkflowRequest) => workflowsApi.generate(request),
     onSuccess: (data) => {
+      websocketService.subscribeTopics([data.id])
       setCurrentWorkflow(data)
       toast.success('Workflow generation started!')
     },
@@ -3,6 +3,7 @@ import type { WebSocketMessage } from '@/types'
 class WebSocketService {
   private ws: WebSocket | null = null
   private listeners: Set<(message: WebSocketMessage) => void> = new Set()
+  private topics: Set<string> = new Set()
   private reconnectTimeout: number | null = null
   private reconnectDelay = 1000
 
@@ -14,6 +15,10 @@ class WebSocketService {
     this.ws.onopen = () => {
       console.log('WebSocket connected')
       this.reconnectDelay = 1000
+      // Restore topic subscriptions after a reconnect
+      if (this.topics.size > 0) {
+        this.send({ action: 'subscribe', topics: Array.from(this.topics) })
+      }
     }
 
     this.ws.onmessage = (event) => {
@@ -67,6 +72,17 @@ class WebSocketService {
     }
   }
 
+  // Only receive progress for these workflow IDs / channels
+  subscribeTopics(topics: string[]) {
+    topics.forEach((topic) => this.topics.add(topic))
+    this.send({ action: 'subscribe', topics })
+  }
+
+  unsubscribeTopics(topics: string[]) {
+    topics.forEach((topic) => this.topics.delete(topic))
+    this.send({ action: 'unsubscribe', topics })
+  }
+
   send(message: any) {
     if (this.ws && this.ws.readyState === WebSocket.OPEN) {
       this.ws.send(JSON.stringify(message))
@@ -1,6 +1,6 @@
 export type ModelType = 'flux' | 'sdxl' | 'pony' | 'sd1.5'
 
-export type WorkflowStatus = 'pending' | 'processing' | 'completed' | 'failed'
+export type WorkflowStatus = 'pending' | 'processing' | 'completed' | 'failed' | 'cancelled'
 
 export type AgentStatus = 'pending' | 'running' | 'completed' | 'failed'
 
@@ -59,4 +59,7 @@ export interface WebSocketMessage {
   message?: string
   timestamp?: string
   error?: string
+  seq?: number
+  // Present on "snapshot" messages: latest state of each agent
+  agents?: { name: string; status: string; message?: string }[]
 }